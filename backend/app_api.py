@@ -1,13 +1,14 @@
 from dotenv import load_dotenv
+import json
 import os
+import queue
 import re
+import threading
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import traceback
-import tempfile
-import shutil
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
@@ -23,6 +24,20 @@ app = Flask(__name__)
 
 EXEMPT_INTERNAL_AUTH_PATHS = {"/api/health"}
 
+# Per-stage worker threads for the process-files pipeline (download → OCR →
+# metadata → verify → save) and the bound on each queue between stages.
+PIPELINE_DOWNLOAD_WORKERS = int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", "4"))
+PIPELINE_OCR_WORKERS      = int(os.getenv("PIPELINE_OCR_WORKERS", os.getenv("OCR_POOL_WORKERS", "1")))
+PIPELINE_METADATA_WORKERS = int(os.getenv("PIPELINE_METADATA_WORKERS", "4"))
+PIPELINE_VERIFY_WORKERS   = int(os.getenv("PIPELINE_VERIFY_WORKERS", "1"))
+PIPELINE_SAVE_WORKERS     = int(os.getenv("PIPELINE_SAVE_WORKERS", "4"))
+PIPELINE_QUEUE_SIZE       = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+# Summary indexes are handed to the query stage in memory. Set this to also
+# write each one (index.faiss / chunks.pkl / vectorizer.pkl) to a
+# per-request subdirectory, in the background, for debugging.
+SUMMARY_INDEX_DEBUG_DIR = os.getenv("SUMMARY_INDEX_DEBUG_DIR", "")
+
 CORS(app, resources={
     r"/api/*": {
         "origins": [
@@ -72,10 +87,32 @@ def _get_supabase_helper():
 
 
 @lru_cache(maxsize=1)
-def _get_extract_text_from_bytes():
-    from rag_pipeline.extractor_OCR import extract_text_from_bytes
+def _get_iter_ocr_results():
+    from rag_pipeline.ocr_pool import iter_ocr_results
+
+    return iter_ocr_results
+
+
+@lru_cache(maxsize=1)
+def _get_ocr_batch_files():
+    from rag_pipeline.ocr_pool import OCR_BATCH_FILES
+
+    return OCR_BATCH_FILES
+
+
+@lru_cache(maxsize=1)
+def _get_stage_pipeline():
+    from stage_pipeline import Stage, run_pipeline
+
+    return run_pipeline, Stage
+
+
+@lru_cache(maxsize=1)
+def _get_ocr_budget_helpers():
+    from rag_pipeline.ocr_backfill import is_pending, schedule_backfill
+    from rag_pipeline.ocr_pool import request_deadline
 
-    return extract_text_from_bytes
+    return request_deadline, schedule_backfill, is_pending
 
 
 @lru_cache(maxsize=1)
@@ -94,10 +131,10 @@ def _get_chunking_helpers():
 
 @lru_cache(maxsize=1)
 def _get_summary_helpers():
-    from rag_pipeline.embed_store import build_faiss_index
+    from rag_pipeline.embed_store import build_faiss_index, save_index_async
     from rag_pipeline.rag_query import ask_rag_improved
 
-    return build_faiss_index, ask_rag_improved
+    return build_faiss_index, save_index_async, ask_rag_improved
 
 
 @app.before_request
@@ -135,10 +172,12 @@ def _verify_and_build_record(
     folder_type: str,
     profile_id: str,
     user_display_name: str,
+    partial: bool = False,
 ) -> dict:
     """
     Run name verification against the profile display name and return a
     fully-populated record dict ready for database insertion.
+    partial marks text cut short by the OCR time budget (completed in the background).
     """
     file_name = file_info.get('name')
 
@@ -202,6 +241,7 @@ def _verify_and_build_record(
         hospital_name=hospital_name,
         name_match_status=name_match_status,
         name_match_confidence=name_match_confidence,
+        processing_status='partial' if partial else 'completed',
     )
 
     result_entry = dict(
@@ -214,6 +254,7 @@ def _verify_and_build_record(
         text_length=len(extracted_text),
         name_match_status=name_match_status,
         name_match_confidence=name_match_confidence,
+        partial=partial,
     )
 
     return dict(
@@ -224,305 +265,640 @@ def _verify_and_build_record(
     )
 
 
-@app.route("/api/process-files", methods=["POST"])
-def process_files():
-    """Process user files with name matching."""
+def _ignore_progress(file_name: str, phase: str, status: str = "running", **details):
+    return None
+
+
+def _run_process_files(profile_id: str, folder_type: str, progress=None) -> tuple:
+    """
+    Download, OCR, extract metadata, verify and save every new file in a folder.
+
+    Returns (payload, http_status). progress(file_name, phase, status, **details)
+    is called as each file moves through download → ocr → metadata → verify → save,
+    with details on the step just finished (bytes downloaded, OCR chars, extracted
+    metadata, name match). Background jobs and the SSE stream use it to expose
+    per-file state. It may be called from worker threads.
+    """
+    progress = progress or _ignore_progress
     print("\n" + "="*80, flush=True)
     log_step("PROCESS FILES", "start")
     print("="*80, flush=True)
 
-    try:
-        sb = _get_supabase_helper()
-        data = request.get_json()
+    sb = _get_supabase_helper()
+    log_step("Config", "info", f"Profile: {profile_id}, Folder: {folder_type}")
+
+    # Get profile info
+    log_step("Fetching profile info", "start")
+    user_info = sb.get_profile_info(profile_id)
+
+    if not user_info:
+        return {
+            "success": False,
+            "error": "Profile not found",
+            "message": "Selected profile does not exist"
+        }, 404
+
+    if not user_info.get('display_name'):
+        log_step("Profile info", "warning", "No display_name found")
+        return {
+            "success": False,
+            "error": "Profile display name not found",
+            "message": "Please set your display name in your profile first"
+        }, 400
+
+    user_display_name = user_info.get('display_name')
+    log_step("Profile info", "success", f"User: {user_display_name}")
+
+    # List files in storage
+    log_step("Fetching files", "start")
+    files = sb.list_user_files(profile_id, folder_type)
+
+    if not files:
+        log_step("Files", "warning", "No files in storage")
+        try:
+            deleted = sb.delete_orphaned_report_records(profile_id, folder_type)
+            log_step("Cleanup", "success", f"Deleted {deleted} orphaned records")
+        except Exception as e:
+            log_step("Cleanup", "error", str(e))
+        return {"success": False,
+                "error": "No files found for this profile"}, 404
+
+    log_step("Files found", "success", f"{len(files)} files")
+
+    # Check existing processed records
+    log_step("Checking processed", "start")
+    existing_records = sb.get_processed_reports(profile_id, folder_type)
+
+    storage_paths  = {f"{profile_id}/{folder_type}/{f.get('name')}" for f in files}
+    _, _, backfill_pending = _get_ocr_budget_helpers()
+    # Partial records (OCR cut short by the time budget) count as processed
+    # only while their background completion is still queued in this process.
+    existing_paths = {
+        r['file_path'] for r in existing_records
+        if r.get('processing_status') != 'partial' or backfill_pending(r['file_path'])
+    }
 
-        profile_id = resolve_profile_id(data)
-        if not profile_id:
+    # Delete orphaned records
+    orphaned = [r for r in existing_records if r['file_path'] not in storage_paths]
+    deleted_count = 0
+    if orphaned:
+        log_step("Removing orphaned", "start")
+        orphaned_ids = [record['id'] for record in orphaned]
+        try:
+            deleted_count = sb.delete_report_records_bulk(orphaned_ids)
+            log_step("Bulk deleted", "success",
+                     f"{deleted_count} orphaned records removed")
+        except Exception as e:
+            log_step("Bulk delete failed", "error", str(e))
+
+    # Partition into already-processed and new files
+    results            = []
+    skipped            = 0
+    failed             = 0
+    partial_count      = 0
+    matched_reports    = 0
+    mismatched_reports = 0
+
+    new_files = []
+    for file_info in files:
+        file_name = file_info.get('name')
+        file_path = f"{profile_id}/{folder_type}/{file_name}"
+        if file_path in existing_paths:
+            log_step("Status", "info", f"Already processed (skipping): {file_name}")
+            results.append({
+                "file_name": file_name,
+                "status": "skipped",
+                "message": "Already processed"
+            })
+            skipped += 1
+            progress(file_name, "done", "skipped")
+        else:
+            new_files.append((file_info, file_path))
+            progress(file_name, "queued", "queued")
+
+    log_step("Processing new files", "start",
+             f"{len(new_files)} new / {skipped} already skipped")
+
+    pipeline_latency = None
+    if new_files:
+        # Download → OCR → metadata → verify → save as connected bounded
+        # queues: each file moves on as soon as its stage is done with it.
+        log_step("Pipeline", "start",
+                 f"{len(new_files)} files "
+                 f"(workers: download {PIPELINE_DOWNLOAD_WORKERS}, ocr {PIPELINE_OCR_WORKERS}, "
+                 f"metadata {PIPELINE_METADATA_WORKERS}, verify {PIPELINE_VERIFY_WORKERS}, "
+                 f"save {PIPELINE_SAVE_WORKERS}; queue {PIPELINE_QUEUE_SIZE})")
+        run_pipeline, Stage = _get_stage_pipeline()
+        iter_ocr_results = _get_iter_ocr_results()
+        request_deadline, schedule_backfill, _ = _get_ocr_budget_helpers()
+        extract_metadata_batch = _get_extract_metadata_batch()
+        deadline = request_deadline()
+        extraction_stats = []
+
+        # A backfill may finish before, during or after this request saves
+        # the partial record (and a deferred file has no record at all). Both
+        # saves are upserts taken under one lock, and the save stage skips
+        # its partial record once the complete one has been written.
+        backfill_lock = threading.Lock()
+        backfilled    = set()
+
+        def _on_backfill_complete(file_info: dict, file_path: str):
+            def _complete(result):
+                file_name = file_info.get('name')
+                if len(result.text.strip()) < 50:
+                    log_step("OCR backfill", "warning",
+                             f"{file_name}: insufficient text ({len(result.text.strip())} chars), not saved")
+                    return
+                metadata = extract_metadata_batch([(result.text, file_name)])[0]
+                record = _verify_and_build_record(
+                    file_info=file_info,
+                    file_path=file_path,
+                    extracted_text=result.text,
+                    metadata=metadata,
+                    folder_type=folder_type,
+                    profile_id=profile_id,
+                    user_display_name=user_display_name,
+                )
+                with backfill_lock:
+                    sb.save_extracted_data(**record['save_kwargs'])
+                    backfilled.add(file_path)
+                log_step("OCR backfill", "success",
+                         f"{file_name}: saved complete text, name match {record['match_status']}")
+                sb.clear_user_cache(profile_id)
+            return _complete
+
+        def _download_stage(ctx: dict) -> bool:
+            progress(ctx['file_name'], "download")
+            ctx['bytes'] = sb.get_file_bytes(ctx['file_path'])
+            progress(ctx['file_name'], "ocr", bytes=len(ctx['bytes']))
+            return True
+
+        def _ocr_stage(batch: list) -> list:
+            # Uploads are handed over and dropped here; only partial results
+            # keep their bytes, for the background backfill.
+            sources = {ctx['file_path']: (ctx.pop('bytes'), ctx['ext']) for ctx in batch}
+            outcomes = {
+                key: (extraction, exc)
+                for key, extraction, exc in iter_ocr_results(
+                    [(fp, file_bytes, ext) for fp, (file_bytes, ext) in sources.items()],
+                    deadline=deadline,
+                )
+            }
+            verdicts = []
+            for ctx in batch:
+                extraction, exc = outcomes[ctx['file_path']]
+                source = sources.pop(ctx['file_path'])
+                verdicts.append(exc if exc is not None else _finish_ocr(ctx, extraction, source))
+            return verdicts
+
+        def _finish_ocr(ctx: dict, extraction, source: tuple):
+            file_name = ctx['file_name']
+            stats = extraction.to_stats()
+            extraction_stats.append(dict(stats, file_path=ctx['file_path'], file_name=file_name))
+            log_step("OCR stats", "info",
+                     f"{file_name}: {stats['engine']}, {stats['page_count']} page(s), "
+                     f"{stats['ocr_page_count']} OCR'd, "
+                     f"conf {stats['mean_confidence']}, "
+                     f"{stats['timings'].get('total_s', 0):.2f}s")
+            extracted_text = extraction.text
+            ctx['partial'] = extraction.partial
+
+            if extraction.partial:
+                queued = schedule_backfill(
+                    ctx['file_path'], *source, extraction,
+                    on_complete=_on_backfill_complete(ctx['file_info'], ctx['file_path']),
+                )
+                log_step("OCR budget", "warning",
+                         f"{file_name}: partial, "
+                         f"{len(extraction.pending_pages)} page(s) "
+                         f"{'queued for background OCR' if queued else 'left for next run'}")
+                if len(extracted_text.strip()) < 50:
+                    ctx['entry'] = {
+                        "file_name": file_name,
+                        "status": "deferred",
+                        "message": "OCR time budget exhausted; completing in background"
+                    }
+                    progress(file_name, "ocr", "deferred")
+                    return False
+
+            if not extracted_text or len(extracted_text.strip()) < 50:
+                return Exception(
+                    f"Insufficient text extracted: "
+                    f"{len(extracted_text.strip()) if extracted_text else 0} chars"
+                )
+
+            log_step("OCR", "success", f"{file_name}: {len(extracted_text)} chars")
+            ctx['text'] = extracted_text
+            progress(file_name, "metadata", chars=len(extracted_text), partial=extraction.partial)
+            return True
+
+        def _metadata_stage(ctx: dict) -> bool:
+            metadata = extract_metadata_batch([(ctx['text'], ctx['file_name'])])[0]
+            ctx['metadata'] = metadata
+            progress(ctx['file_name'], "verify",
+                     patient_name=metadata.get('patient_name'),
+                     report_type=metadata.get('report_type'),
+                     report_date=metadata.get('report_date'))
+            return True
+
+        def _verify_stage(ctx: dict) -> bool:
+            file_name = ctx['file_name']
+            record = _verify_and_build_record(
+                file_info=ctx['file_info'],
+                file_path=ctx['file_path'],
+                extracted_text=ctx.pop('text'),
+                metadata=ctx.pop('metadata'),
+                folder_type=folder_type,
+                profile_id=profile_id,
+                user_display_name=user_display_name,
+                partial=ctx['partial'],
+            )
+
+            conf   = record['match_confidence']
+            status = record['match_status']
+
+            if status == 'matched' and conf >= 0.7:
+                log_step("Name verification", "success",
+                         f"MATCH {conf:.2f} – "
+                         f"'{record['result_entry']['patient_name']}' "
+                         f"vs '{user_display_name}'")
+            elif status == 'matched':
+                log_step("Name verification", "warning",
+                         f"PARTIAL MATCH {conf:.2f} – "
+                         f"'{record['result_entry']['patient_name']}' "
+                         f"vs '{user_display_name}' (including in summary)")
+            elif status == 'mismatched':
+                log_step("Name verification", "warning",
+                         f"MISMATCH {conf:.2f} – "
+                         f"Report '{record['result_entry']['patient_name']}' "
+                         f"vs User '{user_display_name}'")
+            else:
+                log_step("Name verification", "info",
+                         f"{file_name}: patient name unclear – marked pending")
+
+            ctx['record'] = record
+            progress(file_name, "save", name_match_status=status, name_match_confidence=conf)
+            return True
+
+        def _save_stage(ctx: dict) -> bool:
+            record = ctx.pop('record')
+            ctx['entry'] = record['result_entry'].copy()
+            with backfill_lock:
+                if ctx['file_path'] in backfilled:
+                    # Background OCR already saved the complete record.
+                    log_step("Save", "info",
+                             f"{ctx['file_name']}: completed in background, partial record not saved")
+                    record_id = None
+                else:
+                    record_id = sb.save_extracted_data(**record['save_kwargs'])
+            ctx['entry']['record_id'] = record_id
+            progress(ctx['file_name'], "done", "succeeded", record_id=record_id)
+            return True
+
+        stage_errors = {
+            "download": "Download failed",
+            "ocr":      "OCR failed",
+            "metadata": "Metadata extraction failed",
+            "verify":   "Name verification failed",
+            "save":     "DB save failed",
+        }
+
+        def _on_stage_error(ctx: dict, stage: str, exc: BaseException) -> None:
+            log_step(stage_errors[stage], "error", f"{ctx['file_name']}: {exc}")
+            progress(ctx['file_name'], stage, "failed", error=stage_errors[stage])
+
+        pipeline = run_pipeline(
+            (
+                {
+                    'file_info': fi,
+                    'file_path': fp,
+                    'file_name': fi.get('name'),
+                    'ext':       os.path.splitext(fi.get('name'))[1],
+                    'partial':   False,
+                }
+                for fi, fp in new_files
+            ),
+            [
+                Stage("download", _download_stage, PIPELINE_DOWNLOAD_WORKERS),
+                Stage("ocr",      _ocr_stage,      PIPELINE_OCR_WORKERS, batch_size=_get_ocr_batch_files()),
+                Stage("metadata", _metadata_stage, PIPELINE_METADATA_WORKERS),
+                Stage("verify",   _verify_stage,   PIPELINE_VERIFY_WORKERS),
+                Stage("save",     _save_stage,     PIPELINE_SAVE_WORKERS),
+            ],
+            queue_size=PIPELINE_QUEUE_SIZE,
+            on_error=_on_stage_error,
+        )
+
+        # Results in completion order; counters are tallied here, on one thread.
+        for outcome in pipeline.outcomes:
+            ctx = outcome.item
+            partial_count += 1 if ctx['partial'] else 0
+            if outcome.error is not None:
+                failed += 1
+                label = stage_errors[outcome.stage]
+                entry = ctx.get('entry') or {"file_name": ctx['file_name']}
+                results.append(dict(entry, status="failed", error=label))
+                continue
+
+            entry = ctx['entry']
+            results.append(entry)
+            if entry.get('name_match_status') == 'matched':
+                matched_reports += 1
+            elif entry.get('name_match_status') == 'mismatched':
+                mismatched_reports += 1
+
+        pipeline_latency = pipeline.latency_stats()
+        log_step("Pipeline", "success",
+                 f"wall {pipeline_latency['wall_s']}s, end-to-end per file "
+                 f"p50 {pipeline_latency['end_to_end_s'].get('p50')}s / "
+                 f"p90 {pipeline_latency['end_to_end_s'].get('p90')}s / "
+                 f"max {pipeline_latency['end_to_end_s'].get('max')}s")
+
+        # Extraction stats are for capacity planning only: persist them in the
+        # background and never fail or delay the request on them.
+        if extraction_stats:
+            threading.Thread(
+                target=sb.save_extraction_stats,
+                args=(profile_id, folder_type, extraction_stats),
+                name="save-extraction-stats",
+                daemon=True,
+            ).start()
+
+    successful_count = sum(1 for r in results if r.get('status') == 'success')
+
+    # Clear cache if anything changed
+    if deleted_count > 0 or successful_count > 0:
+        log_step("Clearing cache", "start")
+        try:
+            cache_cleared = sb.clear_user_cache(profile_id)
+            log_step("Cache cleared", "success", f"{cache_cleared} entries")
+        except Exception as e:
+            log_step("Cache clear failed", "error", str(e))
+
+    print(f"\n{'='*80}", flush=True)
+    log_step("COMPLETE", "success")
+    print(f"{'='*80}", flush=True)
+    print(f"  User: {user_display_name}", flush=True)
+    print(f"  Total: {len(files)}", flush=True)
+    print(f"  ✅ Processed: {successful_count}", flush=True)
+    print(f"  ⏭️  Skipped: {skipped}", flush=True)
+    print(f"  🗑️  Deleted: {deleted_count}", flush=True)
+    print(f"  ❌ Failed: {failed}", flush=True)
+    print(f"  ⏳ Partial OCR: {partial_count}", flush=True)
+    print(f"  ✅ Matched: {matched_reports}", flush=True)
+    print(f"  ⚠️  Mismatched: {mismatched_reports}", flush=True)
+    print(f"{'='*80}\n", flush=True)
+
+    return {
+        "success": True,
+        "message": f"Processed {successful_count} files, skipped {skipped}",
+        "profile_id": profile_id,
+        "processed_count": successful_count,
+        "skipped_count": skipped,
+        "deleted_count": deleted_count,
+        "failed_count": failed,
+        "partial_count": partial_count,
+        "total_files": len(files),
+        "matched_reports": matched_reports,
+        "mismatched_reports": mismatched_reports,
+        "results": results,
+        "latency": pipeline_latency,
+        "user_display_name": user_display_name
+    }, 200
+
+
+def _process_files_params(data: dict):
+    profile_id = resolve_profile_id(data)
+    if not profile_id:
+        return None
+    return {"profile_id": profile_id, "folder_type": data.get("folder_type", "reports")}
+
+
+@app.route("/api/process-files", methods=["POST"])
+def process_files():
+    """Process user files with name matching (synchronous; see /api/process-files/jobs)."""
+    try:
+        params = _process_files_params(request.get_json())
+        if not params:
             return jsonify({"success": False, "error": "profile_id is required"}), 400
 
-        folder_type = data.get("folder_type", "reports")
-        log_step("Config", "info", f"Profile: {profile_id}, Folder: {folder_type}")
+        payload, status_code = _run_process_files(**params)
+        return jsonify(payload), status_code
 
-        # Get profile info
-        log_step("Fetching profile info", "start")
-        user_info = sb.get_profile_info(profile_id)
+    except Exception as e:
+        log_step("FATAL ERROR", "error", str(e))
+        traceback.print_exc()
+        return internal_error_response("Failed to process medical files")
 
-        if not user_info:
-            return jsonify({
-                "success": False,
-                "error": "Profile not found",
-                "message": "Selected profile does not exist"
-            }), 404
 
-        if not user_info.get('display_name'):
-            log_step("Profile info", "warning", "No display_name found")
-            return jsonify({
-                "success": False,
-                "error": "Profile display name not found",
-                "message": "Please set your display name in your profile first"
-            }), 400
+@app.route("/api/process-files/jobs", methods=["POST"])
+def submit_process_files_job():
+    """Queue /api/process-files work and return a job id to poll immediately."""
+    try:
+        params = _process_files_params(request.get_json())
+        if not params:
+            return jsonify({"success": False, "error": "profile_id is required"}), 400
 
-        user_display_name = user_info.get('display_name')
-        log_step("Profile info", "success", f"User: {user_display_name}")
+        from job_queue import submit_job
 
-        # List files in storage
-        log_step("Fetching files", "start")
-        files = sb.list_user_files(profile_id, folder_type)
+        job, created = submit_job(
+            "process-files",
+            owner=f"{params['profile_id']}/{params['folder_type']}",
+            params=params,
+            fn=_run_process_files,
+        )
+        log_step("Process job", "success" if created else "info",
+                 f"{job['job_id']} {'queued' if created else 'already ' + job['status']}")
 
-        if not files:
-            log_step("Files", "warning", "No files in storage")
-            try:
-                deleted = sb.delete_orphaned_report_records(profile_id, folder_type)
-                log_step("Cleanup", "success", f"Deleted {deleted} orphaned records")
-            except Exception as e:
-                log_step("Cleanup", "error", str(e))
-            return jsonify({"success": False,
-                            "error": "No files found for this profile"}), 404
-
-        log_step("Files found", "success", f"{len(files)} files")
-
-        # Check existing processed records
-        log_step("Checking processed", "start")
-        existing_records = sb.get_processed_reports(profile_id, folder_type)
-
-        storage_paths  = {f"{profile_id}/{folder_type}/{f.get('name')}" for f in files}
-        existing_paths = {r['file_path'] for r in existing_records}
-
-        # Delete orphaned records
-        orphaned = [r for r in existing_records if r['file_path'] not in storage_paths]
-        deleted_count = 0
-        if orphaned:
-            log_step("Removing orphaned", "start")
-            orphaned_ids = [record['id'] for record in orphaned]
-            try:
-                deleted_count = sb.delete_report_records_bulk(orphaned_ids)
-                log_step("Bulk deleted", "success",
-                         f"{deleted_count} orphaned records removed")
-            except Exception as e:
-                log_step("Bulk delete failed", "error", str(e))
-
-        # Partition into already-processed and new files
-        results            = []
-        skipped            = 0
-        failed             = 0
-        matched_reports    = 0
-        mismatched_reports = 0
-
-        new_files = []
-        for file_info in files:
-            file_name = file_info.get('name')
-            file_path = f"{profile_id}/{folder_type}/{file_name}"
-            if file_path in existing_paths:
-                log_step("Status", "info", f"Already processed (skipping): {file_name}")
-                results.append({
-                    "file_name": file_name,
-                    "status": "skipped",
-                    "message": "Already processed"
-                })
-                skipped += 1
-            else:
-                new_files.append((file_info, file_path))
-
-        log_step("Processing new files", "start",
-                 f"{len(new_files)} new / {skipped} already skipped")
-
-        if new_files:
-            # Phase 1: Concurrent file downloads
-            log_step("Download phase", "start",
-                     f"Fetching {len(new_files)} files concurrently (max_workers=4)")
-
-            def _download(args):
-                fi, fp = args
-                try:
-                    return (fi, fp, sb.get_file_bytes(fp), None)
-                except Exception as exc:
-                    return (fi, fp, None, exc)
-
-            with ThreadPoolExecutor(max_workers=4) as pool:
-                download_results = list(pool.map(_download, new_files))
-
-            dl_ok  = sum(1 for *_, err in download_results if err is None)
-            dl_err = len(download_results) - dl_ok
-            log_step("Download phase", "success",
-                     f"{dl_ok} succeeded, {dl_err} failed")
-
-            # Phase 2: Sequential OCR
-            log_step("OCR phase", "start")
-            ocr_results = []
-            extract_text_from_bytes = _get_extract_text_from_bytes()
-
-            for idx, (fi, fp, file_bytes, dl_exc) in enumerate(download_results, 1):
-                file_name = fi.get('name')
-                print(f"\n{'─'*80}", flush=True)
-                print(f"OCR {idx}/{len(download_results)}: {file_name}", flush=True)
-                print(f"{'─'*80}", flush=True)
-
-                if dl_exc is not None:
-                    log_step("Download failed", "error",
-                             f"{file_name}: {dl_exc}")
-                    results.append({
-                        "file_name": file_name,
-                        "status": "failed",
-                        "error": "Download failed"
-                    })
-                    failed += 1
-                    continue
-
-                try:
-                    file_ext       = os.path.splitext(file_name)[1]
-                    extracted_text = extract_text_from_bytes(file_bytes, file_ext)
-
-                    if not extracted_text or len(extracted_text.strip()) < 50:
-                        raise Exception(
-                            f"Insufficient text extracted: "
-                            f"{len(extracted_text.strip()) if extracted_text else 0} chars"
-                        )
-
-                    log_step("OCR", "success", f"{len(extracted_text)} chars")
-                    ocr_results.append((fi, fp, extracted_text))
-
-                except Exception as exc:
-                    log_step("OCR failed", "error", f"{file_name}: {exc}")
-                    results.append({
-                        "file_name": file_name,
-                        "status": "failed",
-                        "error": "OCR failed"
-                    })
-                    failed += 1
-
-            # Phase 3: Batch LLM metadata extraction
-            if ocr_results:
-                log_step("Metadata batch", "start",
-                         f"Extracting metadata for {len(ocr_results)} "
-                         f"files concurrently")
-                extract_metadata_batch = _get_extract_metadata_batch()
-
-                batch_inputs = [
-                    (text, fi.get('name'))
-                    for fi, _, text in ocr_results
-                ]
-                metadata_list = extract_metadata_batch(batch_inputs)
-
-                log_step("Metadata batch", "success",
-                         f"{len(metadata_list)} results received")
-
-                # Phase 4: Sequential name verification
-                log_step("Name verification phase", "start")
-                verified_records = []
-
-                for (fi, fp, extracted_text), metadata in zip(ocr_results, metadata_list):
-                    file_name = fi.get('name')
-                    log_step("Verifying", "info", file_name)
-
-                    record = _verify_and_build_record(
-                        file_info=fi,
-                        file_path=fp,
-                        extracted_text=extracted_text,
-                        metadata=metadata,
-                        folder_type=folder_type,
-                        profile_id=profile_id,
-                        user_display_name=user_display_name,
-                    )
+        return jsonify({
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "created": created,
+        }), 202
 
-                    conf   = record['match_confidence']
-                    status = record['match_status']
-
-                    if status == 'matched' and conf >= 0.7:
-                        matched_reports += 1
-                        log_step("Name verification", "success",
-                                 f"MATCH {conf:.2f} – "
-                                 f"'{record['result_entry']['patient_name']}' "
-                                 f"vs '{user_display_name}'")
-                    elif status == 'matched':
-                        matched_reports += 1
-                        log_step("Name verification", "warning",
-                                 f"PARTIAL MATCH {conf:.2f} – "
-                                 f"'{record['result_entry']['patient_name']}' "
-                                 f"vs '{user_display_name}' (including in summary)")
-                    elif status == 'mismatched':
-                        mismatched_reports += 1
-                        log_step("Name verification", "warning",
-                                 f"MISMATCH {conf:.2f} – "
-                                 f"Report '{record['result_entry']['patient_name']}' "
-                                 f"vs User '{user_display_name}'")
-                    else:
-                        log_step("Name verification", "info",
-                                 "Patient name unclear – marked pending")
-
-                    verified_records.append(record)
-
-                # Phase 5: Concurrent DB saves
-                log_step("DB save phase", "start",
-                         f"Saving {len(verified_records)} records concurrently "
-                         f"(max_workers=4)")
-
-                def _save(record: dict):
-                    try:
-                        record_id = sb.save_extracted_data(**record['save_kwargs'])
-                        return (record_id, None)
-                    except Exception as exc:
-                        return (None, exc)
-
-                with ThreadPoolExecutor(max_workers=4) as pool:
-                    save_outcomes = list(pool.map(_save, verified_records))
-
-                for record, (record_id, save_exc) in zip(verified_records, save_outcomes):
-                    entry = record['result_entry'].copy()
-                    if save_exc is not None:
-                        log_step("DB save failed", "error",
-                                 f"{entry['file_name']}: {save_exc}")
-                        entry['status'] = 'failed'
-                        entry['error']  = 'DB save failed'
-                        failed += 1
-                    else:
-                        entry['record_id'] = record_id
-                    results.append(entry)
-
-                log_step("DB save phase", "success",
-                         f"{sum(1 for _, e in save_outcomes if e is None)} records saved")
-
-        successful_count = sum(1 for r in results if r.get('status') == 'success')
-
-        # Clear cache if anything changed
-        if deleted_count > 0 or successful_count > 0:
-            log_step("Clearing cache", "start")
-            try:
-                cache_cleared = sb.clear_user_cache(profile_id)
-                log_step("Cache cleared", "success", f"{cache_cleared} entries")
-            except Exception as e:
-                log_step("Cache clear failed", "error", str(e))
+    except Exception as e:
+        log_step("Process job", "error", str(e))
+        traceback.print_exc()
+        return internal_error_response("Failed to queue file processing")
 
-        print(f"\n{'='*80}", flush=True)
-        log_step("COMPLETE", "success")
-        print(f"{'='*80}", flush=True)
-        print(f"  User: {user_display_name}", flush=True)
-        print(f"  Total: {len(files)}", flush=True)
-        print(f"  ✅ Processed: {successful_count}", flush=True)
-        print(f"  ⏭️  Skipped: {skipped}", flush=True)
-        print(f"  🗑️  Deleted: {deleted_count}", flush=True)
-        print(f"  ❌ Failed: {failed}", flush=True)
-        print(f"  ✅ Matched: {matched_reports}", flush=True)
-        print(f"  ⚠️  Mismatched: {mismatched_reports}", flush=True)
-        print(f"{'='*80}\n", flush=True)
 
+@app.route("/api/process-files/jobs/<job_id>", methods=["GET"])
+def get_process_files_job(job_id):
+    """Job status, the phase each file is in, and the final /api/process-files payload once finished."""
+    try:
+        from job_queue import get_job
+
+        job = get_job(job_id)
+        if not job or job["kind"] != "process-files":
+            return jsonify({"success": False, "error": "Job not found"}), 404
+
+        files = job["files"]
         return jsonify({
             "success": True,
-            "message": f"Processed {successful_count} files, skipped {skipped}",
-            "profile_id": profile_id,
-            "processed_count": successful_count,
-            "skipped_count": skipped,
-            "deleted_count": deleted_count,
-            "failed_count": failed,
-            "total_files": len(files),
-            "matched_reports": matched_reports,
-            "mismatched_reports": mismatched_reports,
-            "results": results,
-            "user_display_name": user_display_name
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "error": job["error"],
+            "profile_id": job["params"].get("profile_id"),
+            "folder_type": job["params"].get("folder_type"),
+            "files": files,
+            "progress": {
+                "total": len(files),
+                "finished": sum(1 for f in files.values() if f.get("status") not in ("queued", "running")),
+            },
+            "result": job["result"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
         }), 200
 
     except Exception as e:
-        log_step("FATAL ERROR", "error", str(e))
+        log_step("Process job status", "error", str(e))
+        return internal_error_response("Failed to fetch job status")
+
+
+# phase a running file has entered → SSE event describing the step it just finished
+_STREAM_EVENTS = {
+    "download": "downloading",
+    "ocr":      "downloaded",
+    "metadata": "ocr_done",
+    "verify":   "metadata_extracted",
+    "save":     "name_matched",
+}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.route("/api/process-files/stream", methods=["POST"])
+def process_files_stream():
+    """
+    Same work as /api/process-files, streamed as Server-Sent Events: one event
+    per file per phase (downloaded, ocr_done, metadata_extracted, name_matched,
+    saved / failed / skipped / deferred), then "complete" with the usual payload.
+    """
+    params = _process_files_params(request.get_json())
+    if not params:
+        return jsonify({"success": False, "error": "profile_id is required"}), 400
+
+    events = queue.Queue()
+
+    def progress(file_name: str, phase: str, status: str = "running", **details):
+        if status == "running":
+            event = _STREAM_EVENTS.get(phase, phase)
+        else:
+            event = "saved" if status == "succeeded" else status
+        events.put(_sse(event, dict(details, file_name=file_name, phase=phase, status=status)))
+
+    def run():
+        try:
+            payload, status_code = _run_process_files(progress=progress, **params)
+            events.put(_sse("complete", dict(payload, http_status=status_code)))
+        except Exception as e:
+            log_step("FATAL ERROR", "error", str(e))
+            traceback.print_exc()
+            events.put(_sse("error", {"success": False, "error": "Failed to process medical files"}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="process-files-stream", daemon=True).start()
+
+    def stream():
+        # Events are serialised when queued and dropped once written, so no
+        # per-file state outlives its event here.
+        while True:
+            try:
+                item = events.get(timeout=15)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            yield item
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/assistant", methods=["POST"])
+def assistant():
+    """Answer a chat message: detect intent (while prefetching profile data) and dispatch to its handler."""
+    try:
+        data = request.get_json() or {}
+        profile_id = resolve_profile_id(data)
+        message = str(data.get("message") or "").strip()
+        if not profile_id:
+            return jsonify({"success": False, "error": "profile_id is required"}), 400
+        if not message:
+            return jsonify({"success": False, "error": "message is required"}), 400
+
+        from assistant import run_assistant
+
+        result = run_assistant(profile_id, message)
+        log_step("Assistant", "success" if result["success"] else "warning",
+                 f"{result['handler']} in {result['latency']['total_s']}s")
+        return jsonify(result), 200
+
+    except Exception as e:
+        log_step("Assistant", "error", str(e))
         traceback.print_exc()
-        return internal_error_response("Failed to process medical files")
+        return internal_error_response("Failed to answer the message")
+
+
+@app.route("/api/assistant/stream", methods=["POST"])
+def assistant_stream():
+    """
+    Same as /api/assistant, streamed as Server-Sent Events: "intent" once the
+    message is routed, "delta" for each piece of the answer as the LLM
+    generates it, then "done" with the full response (message and latency).
+    """
+    data = request.get_json() or {}
+    profile_id = resolve_profile_id(data)
+    message = str(data.get("message") or "").strip()
+    if not profile_id:
+        return jsonify({"success": False, "error": "profile_id is required"}), 400
+    if not message:
+        return jsonify({"success": False, "error": "message is required"}), 400
+
+    events = queue.Queue()
+
+    def run():
+        try:
+            from assistant import run_assistant
+
+            result = run_assistant(
+                profile_id, message, emit=lambda event, payload: events.put(_sse(event, payload))
+            )
+            events.put(_sse("done", result))
+        except Exception as e:
+            log_step("Assistant", "error", str(e))
+            traceback.print_exc()
+            events.put(_sse("error", {"success": False, "error": "Failed to answer the message"}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="assistant-stream", daemon=True).start()
+
+    def stream():
+        while True:
+            try:
+                item = events.get(timeout=15)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            yield item
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/api/generate-summary", methods=["POST"])
@@ -532,8 +908,6 @@ def generate_summary():
     log_step("GENERATE SUMMARY (SMART FILTERING)", "start")
     print("="*80, flush=True)
 
-    temp_dir = tempfile.mkdtemp(prefix="rag_")
-
     try:
         sb = _get_supabase_helper()
         data = request.get_json()
@@ -550,7 +924,6 @@ def generate_summary():
         folder_type      = 'reports'
 
         log_step("Config", "info", f"Profile: {profile_id}, Folder: {folder_type}")
-        log_step("Temp dir", "info", temp_dir)
 
         # Get profile info
         log_step("Fetching profile info", "start")
@@ -766,10 +1139,15 @@ def generate_summary():
 
         # Build FAISS index
         log_step("Building index", "start")
-        build_faiss_index, ask_rag_improved = _get_summary_helpers()
+        build_faiss_index, save_index_async, ask_rag_improved = _get_summary_helpers()
         try:
-            index, chunks, vectorizer = build_faiss_index(all_chunks, temp_dir)
-            log_step("Index", "success", "FAISS index ready")
+            index, chunks, vectorizer = build_faiss_index(all_chunks)
+            log_step("Index", "success", "FAISS index ready (in memory)")
+            if SUMMARY_INDEX_DEBUG_DIR:
+                save_index_async(index, chunks, vectorizer, os.path.join(
+                    SUMMARY_INDEX_DEBUG_DIR,
+                    f"{profile_id}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
+                ))
         except Exception as e:
             log_step("Index", "error", str(e))
             traceback.print_exc()
@@ -791,10 +1169,12 @@ def generate_summary():
                     f"Analyze all medical test reports for {user_display_name} "
                     f"and provide a comprehensive summary with trends"
                 ),
-                temp_dir=temp_dir,
                 folder_type='reports',
                 num_reports=len(reports),
-                patient_metadata=patient_metadata
+                patient_metadata=patient_metadata,
+                index=index,
+                chunks=chunks,
+                vectorizer=vectorizer,
             )
 
             if summary.startswith("❌"):
@@ -857,14 +1237,6 @@ def generate_summary():
         traceback.print_exc()
         return internal_error_response("Failed to generate medical summary")
 
-    finally:
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                log_step("Cleanup", "success", f"Removed {temp_dir}")
-        except Exception as e:
-            log_step("Cleanup", "warning", f"Failed to clean temp dir: {e}")
-
 
 def build_mismatch_warning(mismatched_reports: list, user_display_name: str) -> str:
     """Build a user-friendly warning string about mismatched reports."""
@@ -941,6 +1313,37 @@ def health_check():
         }), 500
 
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Per-process runtime metrics (OCR engine pool, load times, memory, OCR backfill queue, LLM connections, response cache, vault index cache, intent classifier and fast path, chat TTFT)."""
+    try:
+        from assistant import assistant_stats
+        from intent_classifier import classifier_stats
+        from intent_fastpath import fastpath_stats
+        from rag_pipeline.llm_gateway import gateway_stats
+        from rag_pipeline.ocr_backfill import backfill_stats
+        from rag_pipeline.ocr_engines import get_engine_manager
+        from rag_pipeline.response_cache import response_cache_stats
+        from rag_pipeline.vault_index import index_cache_stats
+
+        return jsonify({
+            "success": True,
+            "ocr_engines": get_engine_manager().metrics(),
+            "ocr_backfill": backfill_stats(),
+            "llm_gateway": gateway_stats(),
+            "response_cache": response_cache_stats(),
+            "vault_index_cache": index_cache_stats(),
+            "intent_classifier": classifier_stats(),
+            "intent_fastpath": fastpath_stats(),
+            "assistant": assistant_stats(),
+            "timestamp": datetime.now().isoformat()
+        }), 200
+
+    except Exception as e:
+        log_step("Metrics", "error", str(e))
+        return internal_error_response("Failed to collect metrics")
+
+
 @app.route("/api/reports/<profile_id>", methods=["GET"])
 def get_reports(profile_id):
     """Get list of processed reports with name match status."""
@@ -1013,6 +1416,9 @@ def clear_cache(profile_id):
         deleted = sb.clear_user_cache(profile_id)
         log_step("Cache cleared", "success", f"{deleted} entries")
 
+        from rag_pipeline.response_cache import invalidate_responses
+        invalidate_responses(profile_id)
+
         return jsonify({
             "success": True,
             "message": f"Cache cleared for profile {profile_id}",
@@ -1034,6 +1440,9 @@ def clear_user_data(profile_id):
         deleted = sb.clear_user_data(profile_id)
         log_step("Data cleared", "success", f"{deleted} records")
 
+        from rag_pipeline.response_cache import invalidate_responses
+        invalidate_responses(profile_id)
+
         return jsonify({
             "success": True,
             "message": f"Cleared data for profile {profile_id}",
@@ -1101,17 +1510,23 @@ if __name__ == "__main__":
     print("="*80, flush=True)
     print("\n📡 Endpoints:", flush=True)
     print("  GET    /api/health", flush=True)
+    print("  GET    /api/metrics", flush=True)
     print("  POST   /api/process-files", flush=True)
+    print("  POST   /api/process-files/stream", flush=True)
+    print("  POST   /api/process-files/jobs", flush=True)
+    print("  GET    /api/process-files/jobs/<job_id>", flush=True)
+    print("  POST   /api/assistant", flush=True)
+    print("  POST   /api/assistant/stream", flush=True)
     print("  POST   /api/generate-summary", flush=True)
     print("  GET    /api/reports/<profile_id>", flush=True)
     print("  DELETE /api/clear-cache/<profile_id>", flush=True)
     print("  DELETE /api/clear/<profile_id>", flush=True)
     print("\n💡 How It Works:", flush=True)
-    print("  1️⃣  Concurrent download of all new files (ThreadPoolExecutor)", flush=True)
-    print("  2️⃣  Sequential OCR (PaddleOCR → EasyOCR fallback)", flush=True)
-    print("  3️⃣  Batch LLM metadata extraction (asyncio.gather)", flush=True)
+    print("  1️⃣  Files stream through download → OCR → metadata → verify → save stages", flush=True)
+    print("  2️⃣  Multi-process OCR (PaddleOCR → EasyOCR fallback)", flush=True)
+    print("  3️⃣  LLM metadata extraction as soon as each file's OCR finishes", flush=True)
     print("  4️⃣  Name matching against profiles.display_name", flush=True)
-    print("  5️⃣  Concurrent DB saves (ThreadPoolExecutor)", flush=True)
+    print("  5️⃣  Concurrent DB saves; per-file latency percentiles in the response", flush=True)
     print("  6️⃣  Summary generated ONLY from matched reports", flush=True)
     print("  7️⃣  Mismatched reports shown as warnings in the summary", flush=True)
     print("\n✅ User Experience:", flush=True)
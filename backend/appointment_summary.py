@@ -12,10 +12,11 @@ from __future__ import annotations
 
 import re
 from datetime import date, datetime
-from typing import Optional
+from typing import Callable, Optional
 
 from supabase_helper import get_appointments
 from rag_pipeline.rag_query import call_llm
+from rag_pipeline.response_cache import context_hash, lookup_response, store_response
 
 _MAX_LLM_TOKENS: int = 1024
 
@@ -122,33 +123,51 @@ def _build_prompts(user_query: str, formatted_context: str) -> tuple[str, str]:
     return system_prompt, user_prompt
 
 
-def answer_appointment_query(profile_id: str, user_query: str) -> str:
+def answer_appointment_query(
+    profile_id: str,
+    user_query: str,
+    appointments: Optional[list] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> dict:
     """
     Full appointment query pipeline.
 
     Fetches appointments for the given profile, formats them into a structured
     context document, constructs prompts, and returns the LLM-generated answer.
-    Always returns a string — never raises — so the orchestrator can pass the
-    result through without additional error handling.
+    Always returns ``{"success": bool, "message": str}`` — never raises on an
+    LLM failure — so the orchestrator can pass the result through; failures
+    carry a user-safe message with success=False.
 
     Args:
         profile_id: UUID of the profile whose appointments are queried.
         user_query:  The user's natural-language question.
+        appointments: Already-fetched appointment rows (e.g. prefetched by the
+                      /api/assistant orchestrator); fetched here when None.
+        on_delta:    Optional callback; when set the answer is streamed and
+                     each text delta is passed to it as it is generated.
 
     Returns:
-        LLM-generated answer in the same language as the user's query.
+        {"success", "message"}; the message is the LLM-generated answer in the
+        same language as the user's query.
     """
     if not profile_id or not str(profile_id).strip():
-        return "Unable to retrieve appointments: profile ID is missing."
+        return {"success": False, "message": "Unable to retrieve appointments: profile ID is missing."}
 
     if not user_query or not user_query.strip():
-        return "Please provide a question about your appointments."
+        return {"success": False, "message": "Please provide a question about your appointments."}
 
     print(f"\n📅 Appointment query pipeline — profile: {profile_id}", flush=True)
 
-    appointments = get_appointments(str(profile_id).strip())
+    profile_id = str(profile_id).strip()
+    if appointments is None:
+        appointments = get_appointments(profile_id)
     print(f"   Retrieved {len(appointments)} appointment(s)", flush=True)
 
+    ctx_hash = context_hash(appointments, date.today())
+    cached = lookup_response("appointments", profile_id, ctx_hash, user_query)
+    if cached is not None:
+        return {"success": True, "message": cached}
+
     formatted_context = _format_appointments(appointments)
     system_prompt, user_prompt = _build_prompts(user_query, formatted_context)
 
@@ -157,12 +176,17 @@ def answer_appointment_query(profile_id: str, user_query: str) -> str:
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             max_tokens=_MAX_LLM_TOKENS,
+            on_delta=on_delta,
         )
         print(f"   ✅ Answer generated ({len(answer)} chars)", flush=True)
-        return answer
+        store_response("appointments", profile_id, ctx_hash, user_query, answer)
+        return {"success": True, "message": answer}
     except Exception as exc:
         print(f"   ❌ LLM call failed: {exc}", flush=True)
-        return "Sorry, I was unable to answer your appointment question right now. Please try again."
+        return {
+            "success": False,
+            "message": "Sorry, I was unable to answer your appointment question right now. Please try again.",
+        }
     
 if __name__ == "__main__":
     print(answer_appointment_query(user_query='get me details about my upcoming appointments',profile_id='e18af8f2-9c0e-4a92-b6b5-84e8ad019186'))
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+Chat orchestration behind /api/assistant.
+
+One message in, one answer out: detect the intent, then dispatch to the
+matching handler (appointments, medications, user card, lab reports,
+insurance, medical bills, platform help). When the intent fast path (rule
+table / recent-message cache) already knows the intent, detection takes
+microseconds and the handler fetches what it needs itself. Otherwise, while
+the classifier (or LLM) runs, the cheap per-profile reads that three of
+those handlers need (appointments, medication rows, card fields) are fetched
+speculatively on a shared thread pool; the one the resolved intent needs is
+handed to its handler, the others are discarded. Either way the answer no
+longer waits for slow intent detection and the database reads back to back.
+
+Handlers return {"success", "message"}; an answer that reports a failure is
+returned with success=False and is not counted in the TTFT statistics.
+
+Medical bills have no intent label of their own; an insurance or report
+question that mentions bills / invoices / receipts is routed to the bills
+handler.
+
+Every response carries per-stage latency (seconds): intent detection, each
+prefetch, the wait for the prefetch that was used, the handler, time to first
+token and the total. Time to first token — when the first piece of the answer
+reached the client — is the user-facing latency; it is logged per handler and
+summarised by ``assistant_stats()``. For the non-streaming endpoint it equals
+the total.
+
+Configuration (environment):
+  ASSISTANT_PREFETCH_WORKERS  prefetch threads shared by all requests (default 8)
+  ASSISTANT_TTFT_WINDOW       recent requests per handler kept for TTFT stats (default 500)
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional
+
+ASSISTANT_PREFETCH_WORKERS: int = int(os.getenv("ASSISTANT_PREFETCH_WORKERS", "8"))
+ASSISTANT_TTFT_WINDOW: int      = int(os.getenv("ASSISTANT_TTFT_WINDOW", "500"))
+
+UNKNOWN_ANSWER = (
+    "Sorry, I can only assist with platform-related queries. "
+    "Please ask something relevant."
+)
+ERROR_ANSWER = "Something went wrong. Please try again."
+
+_BILLS_RE = re.compile(
+    r"\b(?:bills?|billing|invoices?|receipts?|charges|paid|payments?|kitna paisa)\b|बिल",
+    re.IGNORECASE,
+)
+
+_ttft: dict = {}
+_ttft_lock = threading.Lock()
+
+# intent -> prefetched source its handler consumes
+_INTENT_PREFETCH = {
+    "user_appointment": "appointments",
+    "user_medication":  "medications",
+    "profile_card":     "card",
+}
+
+
+@lru_cache(maxsize=1)
+def _prefetch_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=ASSISTANT_PREFETCH_WORKERS, thread_name_prefix="assistant-prefetch"
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_prefetchers() -> dict:
+    from supabase_helper import get_appointments, get_user_card_data
+    from medication_summary import fetch_medication_data
+
+    return {
+        "appointments": get_appointments,
+        "medications":  fetch_medication_data,
+        "card":         get_user_card_data,
+    }
+
+
+@lru_cache(maxsize=1)
+def _get_handlers() -> dict:
+    platform_dir = str(Path(__file__).resolve().parent / "platform_related")
+    if platform_dir not in sys.path:
+        sys.path.insert(0, platform_dir)   # platform_handler imports its sibling flat
+
+    from appointment_summary import answer_appointment_query
+    from insurance_summary.insurance_handler import handle_insurance_query
+    from labreport_summary.lab_report_handler import handle_lab_report_query
+    from medical_bills.medicalbill_handler import handle_medical_bills_query
+    from medication_summary import query_medications
+    from platform_handler import handle_platform_query
+    from user_card_summary import answer_user_card_query
+
+    return {
+        "user_appointment": lambda pid, msg, data, cb: answer_appointment_query(pid, msg, appointments=data, on_delta=cb),
+        "user_medication":  lambda pid, msg, data, cb: query_medications(msg, pid, data=data, on_delta=cb),
+        "profile_card":     lambda pid, msg, data, cb: answer_user_card_query(pid, msg, card=data, on_delta=cb),
+        "summary":          lambda pid, msg, data, cb: handle_lab_report_query(pid, msg, on_delta=cb),
+        "user_insurance":   lambda pid, msg, data, cb: handle_insurance_query(pid, msg, on_delta=cb),
+        "medical_bills":    lambda pid, msg, data, cb: handle_medical_bills_query(pid, msg, on_delta=cb),
+        # Platform answers come from Groq in one piece; they are sent as a single delta.
+        "platform":         lambda pid, msg, data, cb: handle_platform_query(msg),
+    }
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+def _route(intent: str, message: str) -> str:
+    if intent in ("user_insurance", "summary") and _BILLS_RE.search(message):
+        return "medical_bills"
+    return intent
+
+
+def _record_ttft(handler: str, ttft_s: float) -> None:
+    with _ttft_lock:
+        _ttft.setdefault(handler, deque(maxlen=ASSISTANT_TTFT_WINDOW)).append(ttft_s)
+
+
+def assistant_stats() -> dict:
+    """Time-to-first-token percentiles per handler over the recent window."""
+    from stage_pipeline import latency_summary
+
+    with _ttft_lock:
+        samples = {handler: list(values) for handler, values in _ttft.items()}
+    return {"ttft_s": {handler: latency_summary(values) for handler, values in samples.items()}}
+
+
+def run_assistant(
+    profile_id: str,
+    message: str,
+    emit: Optional[Callable[[str, dict], None]] = None,
+) -> dict:
+    """
+    Answer one chat message; always returns a response dict, never raises.
+
+    With *emit*, progress is pushed as it happens: ("intent", {intent,
+    handler}) once routing is decided, then ("delta", {text}) for each piece
+    of the answer — streamed from the LLM where the handler calls it, or the
+    whole answer as one delta (greetings, cached or canned answers).
+    """
+    started = time.perf_counter()
+    latency = {"prefetch_s": {}}
+    first_delta = []
+
+    def on_delta(text: str) -> None:
+        if not first_delta:
+            first_delta.append(time.perf_counter())
+        if emit is not None:
+            emit("delta", {"text": text})
+
+    futures = {}
+    try:
+        from intent_fastpath import peek_intent
+
+        if peek_intent(message) is None:
+            # Slow detection ahead: overlap the cheap reads with it.
+            pool = _prefetch_pool()
+            futures = {
+                name: pool.submit(_timed, fn, profile_id)
+                for name, fn in _get_prefetchers().items()
+            }
+    except Exception as e:
+        # Handlers fetch for themselves when given None.
+        print(f"⚠️ Assistant prefetch not started: {e}", flush=True)
+
+    detect_started = time.perf_counter()
+    try:
+        from intent_detector import detect_intent, get_greeting_response
+
+        intent = detect_intent(message)
+        route  = _route(intent, message)
+    except Exception as e:
+        print(f"❌ Assistant intent detection failed: {e}", flush=True)
+        intent, route = None, "error"
+    latency["intent_s"] = round(time.perf_counter() - detect_started, 3)
+    if emit is not None:
+        emit("intent", {"intent": intent, "handler": route})
+
+    needed = _INTENT_PREFETCH.get(route)
+    data = None
+    for name, future in futures.items():
+        if name != needed:
+            future.cancel()
+    if needed in futures:
+        waited = time.perf_counter()
+        try:
+            data, elapsed = futures[needed].result()
+            latency["prefetch_s"][needed] = round(elapsed, 3)
+        except Exception as e:
+            # The handler fetches for itself when given None.
+            print(f"⚠️ Assistant prefetch '{needed}' failed: {e}", flush=True)
+        latency["prefetch_wait_s"] = round(time.perf_counter() - waited, 3)
+    for name, future in futures.items():
+        if name != needed and future.done() and not future.cancelled() and future.exception() is None:
+            latency["prefetch_s"][name] = round(future.result()[1], 3)
+
+    handler_started = time.perf_counter()
+    success = True
+    if route == "greeting":
+        answer = get_greeting_response()
+    elif route == "unknown":
+        answer = UNKNOWN_ANSWER
+    elif route == "error":
+        success, answer = False, ERROR_ANSWER
+    else:
+        try:
+            result = _get_handlers()[route](
+                profile_id, message, data, on_delta if emit is not None else None
+            )
+        except Exception as e:
+            print(f"❌ Assistant handler '{route}' failed: {e}", flush=True)
+            result = {"success": False, "message": ERROR_ANSWER}
+        if isinstance(result, dict):
+            success, answer = bool(result.get("success")), result.get("message", "")
+        else:
+            answer = result
+    if not first_delta:
+        # Nothing was streamed (non-streaming call, cache hit, canned answer):
+        # the whole answer is the first and only piece.
+        on_delta(answer or "")
+    latency["handler_s"] = round(time.perf_counter() - handler_started, 3)
+    latency["ttft_s"]    = round(first_delta[0] - started, 3)
+    latency["total_s"]   = round(time.perf_counter() - started, 3)
+    if success:
+        _record_ttft(route, latency["ttft_s"])
+    print(
+        f"⏱️ Assistant [{route}] TTFT {latency['ttft_s']:.3f}s, total {latency['total_s']:.3f}s",
+        flush=True,
+    )
+
+    return {
+        "success": success,
+        "intent":  intent,
+        "handler": route,
+        "message": answer,
+        "latency": latency,
+    }
@@ -0,0 +1,109 @@
+"""
+Compare the chunk store (``rag_pipeline.chunk_store``) with the pickled
+``chunks_dict.pkl`` it replaced, on synthetic vault chunks.
+
+For each layout: bytes on disk, time to open, Python heap allocated by
+opening (tracemalloc; mapped pages are page cache, not heap) and the time to
+fetch one search's worth of chunks by id.
+
+Usage (from backend/):
+  python bench_chunk_store.py                      # 20k chunks of ~250 words
+  python bench_chunk_store.py --chunks 100000 --words 150 --lookups 2000
+"""
+
+import argparse
+import gc
+import os
+import pickle
+import random
+import tempfile
+import time
+import tracemalloc
+
+from rag_pipeline.chunk_store import FILES, ChunkStore, write_chunk_store
+
+_WORDS = (
+    "haemoglobin glucose fasting cholesterol triglycerides creatinine urea "
+    "platelets policy premium claim hospital invoice amount paid tax mg/dl "
+    "reference range normal high low sample report date patient doctor"
+).split()
+
+
+def _chunks(n: int, words: int, docs: int) -> dict:
+    rng = random.Random(7)
+    return {
+        cid: {
+            "text": " ".join(rng.choice(_WORDS) for _ in range(words)),
+            "doc_id": f"{cid % docs}/reports/report_{cid % docs}.pdf",
+        }
+        for cid in range(n)
+    }
+
+
+def _measure_open(open_fn):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = open_fn()
+    elapsed = time.perf_counter() - started
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, elapsed, heap
+
+
+def _measure_lookups(chunks, ids: list, top_k: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(ids), top_k):
+        hits = [dict(chunks.get(cid)) for cid in ids[i:i + top_k]]
+        assert all(hit["text"] for hit in hits)
+    return (time.perf_counter() - started) / max(1, len(ids) // top_k)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the chunk store against chunks_dict.pkl.")
+    parser.add_argument("--chunks", type=int, default=20000, help="chunks per profile (default 20000)")
+    parser.add_argument("--words", type=int, default=250, help="words per chunk (default 250)")
+    parser.add_argument("--docs", type=int, default=200, help="distinct documents (default 200)")
+    parser.add_argument("--lookups", type=int, default=6000, help="chunk ids fetched (default 6000)")
+    parser.add_argument("--top-k", type=int, default=6, help="chunks per simulated search (default 6)")
+    args = parser.parse_args(argv)
+
+    print(f"🔧 Building {args.chunks} chunk(s) of {args.words} word(s) over {args.docs} doc(s)...")
+    chunks_dict = _chunks(args.chunks, args.words, args.docs)
+    ids = [random.Random(11).randrange(args.chunks) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_path = os.path.join(tmp, "chunks_dict.pkl")
+        with open(pkl_path, "wb") as fh:
+            pickle.dump(chunks_dict, fh)
+        write_chunk_store(tmp, chunks_dict)
+        del chunks_dict
+
+        def load_pickle():
+            with open(pkl_path, "rb") as fh:
+                return pickle.load(fh)
+
+        rows = []
+        for name, open_fn, files in (
+            ("chunks_dict.pkl", load_pickle, ("chunks_dict.pkl",)),
+            ("chunk store", lambda: ChunkStore(tmp), FILES),
+        ):
+            chunks, open_s, heap = _measure_open(open_fn)
+            lookup_s = _measure_lookups(chunks, ids, args.top_k)
+            disk = sum(os.path.getsize(os.path.join(tmp, f)) for f in files)
+            rows.append((name, disk, open_s, heap, lookup_s))
+            del chunks
+
+    print(f"\n{'layout':<16} {'disk MB':>9} {'open ms':>9} {'heap MB':>9} {'search µs':>10}")
+    for name, disk, open_s, heap, lookup_s in rows:
+        print(f"{name:<16} {disk / 2**20:>9.2f} {open_s * 1e3:>9.1f} {heap / 2**20:>9.2f} {lookup_s * 1e6:>10.1f}")
+    (_, _, pkl_open, pkl_heap, _), (_, _, store_open, store_heap, _) = rows
+    print(
+        f"\n✅ Chunk store: {pkl_heap / max(store_heap, 1):.0f}x less heap, "
+        f"{pkl_open / max(store_open, 1e-9):.0f}x faster to open."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings picked up automatically from the working directory.
+
+With OCR_PRELOAD=1 the OCR engines are built once in the master process
+before workers are forked, so every worker shares the model weights
+copy-on-write instead of loading its own copy on the first upload.
+"""
+
+import os
+
+
+def on_starting(server):
+    if os.getenv("OCR_PRELOAD", "0") != "1":
+        return
+    from rag_pipeline.ocr_engines import get_engine_manager
+
+    ready = get_engine_manager().preload()
+    server.log.info("OCR engines preloaded before fork: %d", ready)
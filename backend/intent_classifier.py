@@ -0,0 +1,151 @@
+"""
+On-box intent classifier for detect_intent.
+
+A logistic-regression head over all-MiniLM-L6-v2 sentence embeddings (the
+model ``rag_pipeline.embed_store`` already keeps loaded). It is trained once
+per process, on first use, from the labelled examples quoted in
+``intent_detector.SYSTEM_PROMPT`` plus the dataset file INTENT_EXAMPLES_PATH
+(JSON lines: {"text": ..., "intent": ...}). Training takes about a second.
+
+``classify`` returns (intent, confidence). detect_intent only falls back to
+the Groq LLM when confidence is below INTENT_MIN_CONFIDENCE; the fallback
+rate is reported by ``classifier_stats()`` (see /api/metrics).
+
+Configuration (environment):
+  INTENT_CLASSIFIER_ENABLED  "1" (default) or "0" to always use the LLM
+  INTENT_EXAMPLES_PATH       labelled examples (default "intent_examples.jsonl" next to this file)
+  INTENT_MIN_CONFIDENCE      minimum top-class probability to skip the LLM (default 0.6)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+INTENT_CLASSIFIER_ENABLED: bool = os.getenv("INTENT_CLASSIFIER_ENABLED", "1") == "1"
+INTENT_EXAMPLES_PATH: str       = os.getenv(
+    "INTENT_EXAMPLES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.jsonl"),
+)
+INTENT_MIN_CONFIDENCE: float    = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.6"))
+
+_SECTION_RE = re.compile(r"^\s*\d+\.\s+([a-z_]+)\s*$")
+_QUOTED_RE  = re.compile(r'"([^"]+)"')
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "classified": 0, "fallbacks": 0, "fallback_errors": 0, "total_ms": 0.0}
+
+
+def prompt_examples(system_prompt: str, labels: list) -> list:
+    """(text, intent) pairs quoted under each "N. <intent>" section of the prompt."""
+    examples, current = [], None
+    for line in system_prompt.splitlines():
+        if "STRICT DECISION LOGIC" in line:
+            break
+        header = _SECTION_RE.match(line)
+        if header:
+            current = header.group(1) if header.group(1) in labels else None
+            continue
+        if current and "→" not in line:
+            examples.extend((text.strip(), current) for text in _QUOTED_RE.findall(line))
+    return examples
+
+
+def file_examples(path: str, labels: list) -> list:
+    if not os.path.exists(path):
+        print(f"⚠️ Intent examples file not found: {path}", flush=True)
+        return []
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("intent") in labels and row.get("text"):
+                examples.append((row["text"].strip(), row["intent"]))
+    return examples
+
+
+class IntentClassifier:
+    def __init__(self, examples: list):
+        from sklearn.linear_model import LogisticRegression
+        from rag_pipeline.embed_store import create_vectorizer
+
+        started = time.perf_counter()
+        self._vectorizer = create_vectorizer()
+        texts  = [text for text, _ in examples]
+        labels = [intent for _, intent in examples]
+        self._model = LogisticRegression(C=10.0, max_iter=2000, class_weight="balanced")
+        self._model.fit(self._embed(texts), labels)
+        print(
+            f"✅ Intent classifier trained on {len(texts)} examples / "
+            f"{len(set(labels))} intents ({time.perf_counter() - started:.2f}s)",
+            flush=True,
+        )
+
+    def _embed(self, texts: list):
+        from sklearn.preprocessing import normalize
+        return normalize(self._vectorizer.transform(texts).toarray())
+
+    def predict(self, message: str) -> tuple:
+        probs = self._model.predict_proba(self._embed([message]))[0]
+        best = int(probs.argmax())
+        return str(self._model.classes_[best]), float(probs[best])
+
+
+@lru_cache(maxsize=1)
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """Train once per process; None if the classifier is disabled or cannot be built."""
+    if not INTENT_CLASSIFIER_ENABLED:
+        return None
+    try:
+        from intent_detector import SYSTEM_PROMPT, VALID_INTENTS
+
+        examples = prompt_examples(SYSTEM_PROMPT, VALID_INTENTS)
+        examples += file_examples(INTENT_EXAMPLES_PATH, VALID_INTENTS)
+        return IntentClassifier(list(dict.fromkeys(examples)))
+    except Exception as e:
+        print(f"⚠️ Intent classifier unavailable, using LLM only: {e}", flush=True)
+        return None
+
+
+def classify(message: str) -> Optional[tuple]:
+    """(intent, confidence) from the local model, or None if it is unavailable."""
+    with _stats_lock:
+        _stats["requests"] += 1
+    classifier = get_intent_classifier()
+    if classifier is None:
+        return None
+    started = time.perf_counter()
+    intent, confidence = classifier.predict(message)
+    with _stats_lock:
+        _stats["classified"] += 1
+        _stats["total_ms"] += 1000 * (time.perf_counter() - started)
+    return intent, confidence
+
+
+def record_fallback(failed: bool = False) -> None:
+    """Count a message that went to the LLM (low confidence or no local model)."""
+    with _stats_lock:
+        _stats["fallbacks"] += 1
+        if failed:
+            _stats["fallback_errors"] += 1
+
+
+def classifier_stats() -> dict:
+    with _stats_lock:
+        s = dict(_stats)
+    return {
+        "enabled":         INTENT_CLASSIFIER_ENABLED,
+        "min_confidence":  INTENT_MIN_CONFIDENCE,
+        "requests":        s["requests"],
+        "classified":      s["classified"],
+        "fallbacks":       s["fallbacks"],
+        "fallback_errors": s["fallback_errors"],
+        "fallback_rate":   round(s["fallbacks"] / s["requests"], 3) if s["requests"] else None,
+        "avg_classify_ms": round(s["total_ms"] / s["classified"], 1) if s["classified"] else None,
+    }
@@ -5,9 +5,13 @@
 import os
 import re
 import random
+from functools import lru_cache
 from groq import Groq
 from dotenv import load_dotenv
 
+from intent_classifier import INTENT_MIN_CONFIDENCE, classify, record_fallback
+from intent_fastpath import fast_intent, remember_intent
+
 
 load_dotenv()
 
@@ -159,6 +163,7 @@ Return ONLY one word from VALID INTENTS.
 No explanation. No extra text."""
 
 
+@lru_cache(maxsize=1)
 def _get_client() -> Groq:
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
@@ -186,32 +191,60 @@ def normalize_intent(raw: str) -> str:
         return "unknown"
 
 
+def _detect_intent_llm(message: str) -> str:
+    client = _get_client()
+    response = client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": message},
+        ],
+        temperature=0,
+        max_tokens=10,
+    )
+
+    raw = response.choices[0].message.content.strip().lower()
+    raw = re.sub(r"[^a-z_]", "", raw)   # keep only a-z and underscore
+    return normalize_intent(raw)
+
+
 def detect_intent(message: str) -> str:
+    """
+    Rule table and recent-message cache first (intent_fastpath), then the
+    local classifier; the Groq LLM only when the classifier's confidence is
+    below INTENT_MIN_CONFIDENCE (or it is unavailable). If that LLM call
+    fails, the classifier's best guess is used and not cached.
+    """
     if not message or not message.strip():
         return "unknown"
 
+    intent, normalized = fast_intent(message)
+    if intent is not None:
+        return intent
+
+    prediction = None
     try:
-        client = _get_client()
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": message},
-            ],
-            temperature=0,
-            max_tokens=10,
-        )
-
-        raw = response.choices[0].message.content.strip().lower()
-        raw = re.sub(r"[^a-z_]", "", raw)   # keep only a-z and underscore
-        return normalize_intent(raw)
+        prediction = classify(message)
+    except Exception as e:
+        print(f"[IntentDetector CLASSIFIER ERROR] {e}")
+
+    if prediction is not None and prediction[1] >= INTENT_MIN_CONFIDENCE:
+        remember_intent(normalized, prediction[0])
+        return prediction[0]
+
+    try:
+        intent = _detect_intent_llm(message)
+        record_fallback()
+        remember_intent(normalized, intent)
+        return intent
 
     except EnvironmentError as e:
+        record_fallback(failed=True)
         print(f"[IntentDetector CONFIG ERROR] {e}")
-        return "unknown"
     except Exception as e:
+        record_fallback(failed=True)
         print(f"[IntentDetector ERROR] {e}")
-        return "unknown"
+    return prediction[0] if prediction is not None else "unknown"
 
 
 def detect_intent_with_response(message: str):
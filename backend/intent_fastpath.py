@@ -0,0 +1,145 @@
+"""
+Fast path in front of the intent classifier.
+
+Two tiers, both answered in microseconds:
+
+  1. A compiled keyword / regex rule table (English, Hindi, Hinglish). A rule
+     fires only when exactly one intent matches, so ambiguous messages ("how
+     do I see my reports?" matches both how-to and reports) fall through to
+     the model instead of being guessed.
+  2. A bounded LRU of normalised message → intent, filled with the decisions
+     the classifier (confident) or the LLM made for earlier messages.
+
+Only messages that miss both tiers reach model inference.
+
+Configuration (environment):
+  INTENT_CACHE_SIZE  normalised messages remembered per process (default 5000)
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+INTENT_CACHE_SIZE: int = int(os.getenv("INTENT_CACHE_SIZE", "5000"))
+
+# Devanagari vowel signs are not \w, so the block is kept explicitly.
+_PUNCT_RE = re.compile(r"[^\w\s\u0900-\u097F]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _words(alternatives: str) -> str:
+    # Whole-word match on a normalised (single-space separated) message; \b
+    # does not work inside Devanagari words.
+    return rf"(?:^| )(?:{alternatives})(?= |$)"
+
+
+# Personal-data intents need a first-person marker so that "what is WBC" or
+# "insurance kya hota hai" are not mistaken for questions about the user's data.
+_SELF = _words(r"my|mine|me|i|am i|do i|mera|meri|mere|mujhe|maine|hamara|मेरा|मेरी|मेरे|मुझे")
+
+
+def _personal(keywords: str) -> re.Pattern:
+    return re.compile(rf"(?=.*{_SELF})(?=.*{_words(keywords)})", re.UNICODE)
+
+
+# (intent, pattern) — matched against the normalised message.
+RULES = [
+    ("greeting", re.compile(
+        r"^(?:hi+|hello+|hey+|hola|namaste|namaskar|namaskaar|"
+        r"good (?:morning|afternoon|evening)|नमस्ते|नमस्कार|हैलो|हाय)"
+        r"(?: there| ji| assistant| bot)?$",
+        re.UNICODE,
+    )),
+    ("platform", re.compile(
+        r"^(?:how (?:to|do|can|does|should)|kaise)(?= |$)|"
+        + _words(r"kya hota hai|kya hoti hai|kya hote hain?|ka matlab|meaning of|कैसे|क्या होता है"),
+        re.UNICODE,
+    )),
+    ("user_appointment", _personal(
+        r"appointments?|booking|bookings|doctor visits?|consultations?|checkups?|"
+        r"अपॉइंटमेंट"
+    )),
+    ("user_medication", _personal(
+        r"medicines?|medications?|meds|dawai|dawaiyan|dawa|dava|goli|golis|tablets?|pills?|"
+        r"doses?|prescriptions?|दवा|दवाई|दवाइयां|गोली"
+    )),
+    ("user_insurance", _personal(
+        r"insurance|policy|policies|claims?|premium|insurer|bima|बीमा|पॉलिसी"
+    )),
+    ("summary", _personal(
+        r"reports?|lab|labs|test results?|blood tests?|haemoglobin|hemoglobin|wbc|rbc|"
+        r"platelets?|cholesterol|sugar|glucose|thyroid|hba1c|vitamin|रिपोर्ट|जांच"
+    )),
+    ("profile_card", _personal(
+        r"profile|phone number|mobile number|blood group|date of birth|dob|address|"
+        r"bmi|age|height|weight|email|naam|emergency contact|प्रोफाइल|पता"
+    )),
+]
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_stats = {"rule_hits": 0, "cache_hits": 0, "misses": 0, "ambiguous": 0, "evictions": 0}
+
+
+def normalize_message(message: str) -> str:
+    text = _PUNCT_RE.sub(" ", (message or "").lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def match_rules(normalized: str, count: bool = True) -> Optional[str]:
+    """The single intent whose rule matches, or None (no match or ambiguous)."""
+    matched = {intent for intent, pattern in RULES if pattern.search(normalized)}
+    if len(matched) == 1:
+        return matched.pop()
+    if len(matched) > 1 and count:
+        with _lock:
+            _stats["ambiguous"] += 1
+    return None
+
+
+def fast_intent(message: str) -> tuple:
+    """(intent or None, normalised message). Counts a rule hit, cache hit or miss."""
+    normalized = normalize_message(message)
+    intent = match_rules(normalized)
+    with _lock:
+        if intent is not None:
+            _stats["rule_hits"] += 1
+            return intent, normalized
+        intent = _cache.get(normalized)
+        if intent is not None:
+            _cache.move_to_end(normalized)
+            _stats["cache_hits"] += 1
+        else:
+            _stats["misses"] += 1
+    return intent, normalized
+
+
+def peek_intent(message: str) -> Optional[str]:
+    """fast_intent's answer without counting it or touching the LRU order."""
+    normalized = normalize_message(message)
+    intent = match_rules(normalized, count=False)
+    if intent is not None:
+        return intent
+    with _lock:
+        return _cache.get(normalized)
+
+
+def remember_intent(normalized: str, intent: str) -> None:
+    if not normalized:
+        return
+    with _lock:
+        _cache[normalized] = intent
+        _cache.move_to_end(normalized)
+        while len(_cache) > INTENT_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def fastpath_stats() -> dict:
+    with _lock:
+        s = dict(_stats, cached=len(_cache), max_cached=INTENT_CACHE_SIZE)
+    lookups = s["rule_hits"] + s["cache_hits"] + s["misses"]
+    s["hit_rate"] = round((s["rule_hits"] + s["cache_hits"]) / lookups, 3) if lookups else None
+    return s
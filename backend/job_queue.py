@@ -0,0 +1,352 @@
+"""
+Background jobs for long-running API work (currently /api/process-files).
+
+Submitting a job returns its id at once; a small thread pool in the process
+that accepted the submission runs it, and the job function reports progress
+per file (which phase each file is in) through a callback. Job state lives in
+a pluggable store so the status endpoint can be polled from any worker:
+
+  * "memory"  — a dict in this process. Fine for a single gunicorn worker
+                and for local testing; state is lost on restart.
+  * "sqlite"  — one row per job in a local SQLite file, shared by every
+                worker on the host (default).
+
+Every process refreshes updated_at for the jobs it has accepted (queued or
+running) every JOB_HEARTBEAT_S, independent of per-file progress, so a long
+OCR phase that reports nothing is still seen as alive. A job whose process
+died (restart, OOM kill) stops heartbeating; once it has been silent for
+JOB_STALE_S it is reported as failed instead of running forever.
+
+Configuration (environment):
+  JOB_STORE_BACKEND  "sqlite" (default) or "memory"
+  JOB_STORE_PATH     SQLite file for the sqlite backend (default "jobs.sqlite3")
+  JOB_WORKERS        concurrent jobs per process (default 1)
+  JOB_STALE_S        seconds without a heartbeat before an active job is failed (default 900)
+  JOB_RETENTION_S    finished jobs older than this are purged (default 86400)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Optional
+
+JOB_STORE_BACKEND: str = os.getenv("JOB_STORE_BACKEND", "sqlite").lower()
+JOB_STORE_PATH: str    = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_WORKERS: int       = max(1, int(os.getenv("JOB_WORKERS", "1")))
+JOB_STALE_S: float     = float(os.getenv("JOB_STALE_S", "900"))
+JOB_RETENTION_S: float = float(os.getenv("JOB_RETENTION_S", "86400"))
+JOB_HEARTBEAT_S: float = max(1.0, min(60.0, JOB_STALE_S / 3))
+
+ACTIVE_STATUSES   = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def _new_job(kind: str, owner: str, params: dict) -> dict:
+    now = time.time()
+    return {
+        "job_id":      uuid.uuid4().hex,
+        "kind":        kind,
+        "owner":       owner,
+        "params":      params,
+        "status":      "queued",
+        "files":       {},
+        "result":      None,
+        "error":       None,
+        "created_at":  now,
+        "started_at":  None,
+        "finished_at": None,
+        "updated_at":  now,
+    }
+
+
+def _present(job: dict) -> dict:
+    """Copy of a job for API responses, with stale running jobs reported as failed."""
+    job = dict(job, files={k: dict(v) for k, v in job["files"].items()})
+    if job["status"] in ACTIVE_STATUSES and time.time() - job["updated_at"] > JOB_STALE_S:
+        job["status"] = "failed"
+        job["error"]  = job["error"] or "Job stopped heartbeating (worker restarted?)"
+    return job
+
+
+# --- Memory backend ---
+
+class MemoryJobStore:
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict) -> Optional[dict]:
+        """Insert *job* unless one of its kind/owner is active; that job is returned instead."""
+        with self._lock:
+            active = self._find_active(job["kind"], job["owner"])
+            if active is not None:
+                return active
+            self._jobs[job["job_id"]] = job
+            self._purge()
+        return None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _present(job) if job else None
+
+    def find_active(self, kind: str, owner: str) -> Optional[dict]:
+        with self._lock:
+            return self._find_active(kind, owner)
+
+    def _find_active(self, kind: str, owner: str) -> Optional[dict]:
+        for job in self._jobs.values():
+            if job["kind"] == kind and job["owner"] == owner:
+                job = _present(job)
+                if job["status"] in ACTIVE_STATUSES:
+                    return job
+        return None
+
+    def update(self, job_id: str, files: Optional[dict] = None, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, state in (files or {}).items():
+                job["files"].setdefault(name, {}).update(state)
+            job.update(fields, updated_at=time.time())
+
+    def _purge(self) -> None:
+        cutoff = time.time() - JOB_RETENTION_S
+        for job_id in [
+            k for k, j in self._jobs.items()
+            if j["status"] in FINISHED_STATUSES and (j["finished_at"] or 0) < cutoff
+        ]:
+            del self._jobs[job_id]
+
+
+# --- SQLite backend ---
+
+class SQLiteJobStore:
+    """One row per job; JSON columns for params / per-file state / result."""
+
+    _COLUMNS = (
+        "job_id", "kind", "owner", "params", "status", "files", "result", "error",
+        "created_at", "started_at", "finished_at", "updated_at",
+    )
+    _JSON_COLUMNS = ("params", "files", "result")
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("""
+                create table if not exists jobs (
+                    job_id      text primary key,
+                    kind        text not null,
+                    owner       text not null,
+                    params      text not null,
+                    status      text not null,
+                    files       text not null,
+                    result      text,
+                    error       text,
+                    created_at  real not null,
+                    started_at  real,
+                    finished_at real,
+                    updated_at  real not null
+                )
+            """)
+            conn.execute(
+                "create index if not exists jobs_owner_idx on jobs (kind, owner, status)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _row_to_job(self, row) -> dict:
+        job = dict(zip(self._COLUMNS, row))
+        for col in self._JSON_COLUMNS:
+            job[col] = json.loads(job[col]) if job[col] is not None else None
+        return job
+
+    def _select(self, conn, where: str, args: tuple) -> list[dict]:
+        rows = conn.execute(
+            f"select {', '.join(self._COLUMNS)} from jobs where {where}", args
+        ).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def create(self, job: dict) -> Optional[dict]:
+        """
+        Insert *job* unless one of its kind/owner is active; that job is
+        returned instead. Check and insert share one write transaction, so
+        two workers racing on the same submission cannot both insert.
+        """
+        values = [
+            json.dumps(job[c]) if c in self._JSON_COLUMNS else job[c]
+            for c in self._COLUMNS
+        ]
+        with self._lock, self._connect() as conn:
+            conn.execute("begin immediate")
+            active = self._find_active(conn, job["kind"], job["owner"])
+            if active is not None:
+                return active
+            conn.execute(
+                f"insert into jobs ({', '.join(self._COLUMNS)}) "
+                f"values ({', '.join('?' for _ in self._COLUMNS)})",
+                values,
+            )
+            conn.execute(
+                "delete from jobs where status in (?, ?) and finished_at < ?",
+                (*FINISHED_STATUSES, time.time() - JOB_RETENTION_S),
+            )
+        return None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            jobs = self._select(conn, "job_id = ?", (job_id,))
+        return _present(jobs[0]) if jobs else None
+
+    def find_active(self, kind: str, owner: str) -> Optional[dict]:
+        with self._connect() as conn:
+            return self._find_active(conn, kind, owner)
+
+    def _find_active(self, conn, kind: str, owner: str) -> Optional[dict]:
+        jobs = self._select(
+            conn, "kind = ? and owner = ? and status in (?, ?)",
+            (kind, owner, *ACTIVE_STATUSES),
+        )
+        for job in map(_present, jobs):
+            if job["status"] in ACTIVE_STATUSES:
+                return job
+        return None
+
+    def update(self, job_id: str, files: Optional[dict] = None, **fields) -> None:
+        # Read-modify-write of the files column; serialised per process by the
+        # lock and across processes by SQLite's write lock (begin immediate).
+        with self._lock, self._connect() as conn:
+            conn.execute("begin immediate")
+            if files:
+                row = conn.execute(
+                    "select files from jobs where job_id = ?", (job_id,)
+                ).fetchone()
+                if row is None:
+                    return
+                merged = json.loads(row[0])
+                for name, state in files.items():
+                    merged.setdefault(name, {}).update(state)
+                fields["files"] = merged
+            fields["updated_at"] = time.time()
+            assignments = ", ".join(f"{k} = ?" for k in fields)
+            values = [
+                json.dumps(v) if k in self._JSON_COLUMNS else v
+                for k, v in fields.items()
+            ]
+            conn.execute(f"update jobs set {assignments} where job_id = ?", (*values, job_id))
+
+
+# --- Public API ---
+
+@lru_cache(maxsize=1)
+def get_job_store():
+    if JOB_STORE_BACKEND == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(JOB_STORE_PATH)
+
+
+@lru_cache(maxsize=1)
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+
+# Jobs accepted by this process and not yet finished; the heartbeat keeps them fresh.
+_live_jobs: set = set()
+_live_lock = threading.Lock()
+
+
+def _heartbeat_loop(store) -> None:
+    while True:
+        time.sleep(JOB_HEARTBEAT_S)
+        with _live_lock:
+            job_ids = list(_live_jobs)
+        for job_id in job_ids:
+            try:
+                store.update(job_id)
+            except Exception as e:
+                print(f"⚠️ Job {job_id}: heartbeat failed: {e}", flush=True)
+
+
+@lru_cache(maxsize=1)
+def _start_heartbeat() -> threading.Thread:
+    thread = threading.Thread(
+        target=_heartbeat_loop, args=(get_job_store(),), name="job-heartbeat", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def submit_job(
+    kind: str,
+    owner: str,
+    params: dict,
+    fn: Callable[..., tuple],
+) -> tuple[dict, bool]:
+    """
+    Queue fn(progress=..., **params) and return (job, created).
+
+    fn must return (payload, http_status); a status >= 400 or a payload with
+    success=False marks the job failed. If a job of the same kind for the same
+    owner is still queued or running it is returned instead (created=False),
+    so double-clicks do not process the same folder twice.
+    """
+    store  = get_job_store()
+    job    = _new_job(kind, owner, params)
+    active = store.create(job)
+    if active is not None:
+        return active, False
+
+    with _live_lock:
+        _live_jobs.add(job["job_id"])
+    _start_heartbeat()
+    _executor().submit(_run_job, store, job["job_id"], params, fn)
+    return _present(job), True
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return get_job_store().get(job_id)
+
+
+def _run_job(store, job_id: str, params: dict, fn: Callable[..., tuple]) -> None:
+    def progress(file_name: str, phase: str, status: str = "running", **details) -> None:
+        try:
+            store.update(job_id, files={file_name: dict(details, phase=phase, status=status)})
+        except Exception as e:
+            print(f"⚠️ Job {job_id}: progress update failed: {e}", flush=True)
+
+    try:
+        store.update(job_id, status="running", started_at=time.time())
+        payload, status_code = fn(progress=progress, **params)
+        ok = status_code < 400 and payload.get("success", True)
+        store.update(
+            job_id,
+            status="succeeded" if ok else "failed",
+            result=payload,
+            error=None if ok else payload.get("error"),
+            finished_at=time.time(),
+        )
+    except Exception as e:
+        # Details go to the log only; the API reports a generic failure.
+        print(f"❌ Job {job_id} failed: {e}", flush=True)
+        traceback.print_exc()
+        store.update(job_id, status="failed", error="Job failed unexpectedly", finished_at=time.time())
+    finally:
+        with _live_lock:
+            _live_jobs.discard(job_id)
@@ -11,7 +11,7 @@ from __future__ import annotations
 
 from collections import defaultdict
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from supabase_helper import (
     get_medications,
@@ -20,6 +20,7 @@ from supabase_helper import (
     get_health_medication_data,
 )
 from rag_pipeline.rag_query import call_llm
+from rag_pipeline.response_cache import context_hash, lookup_response, store_response
 
 _MAX_RECENT_LOGS: int = 10
 _LLM_MAX_TOKENS: int = 1500
@@ -275,23 +276,51 @@ def _build_prompts(context: str, question: str) -> tuple[str, str]:
 # Public interface
 # ---------------------------------------------------------------------------
 
-def query_medications(question: str, profile_id: str) -> str:
-    if not profile_id:
-        return "❌ A valid profile_id is required."
+def fetch_medication_data(profile_id: str) -> dict[str, Any]:
+    """All rows query_medications needs; lets callers prefetch them."""
+    return {
+        "medications": get_medications(profile_id),
+        "logs":        get_medication_logs(profile_id),
+        "doctors":     get_medical_team(profile_id),
+        "health":      get_health_medication_data(profile_id),
+    }
 
-    medications      = get_medications(profile_id)
-    standalone_logs  = get_medication_logs(profile_id)
-    doctors          = get_medical_team(profile_id)
-    health           = get_health_medication_data(profile_id)
+
+def query_medications(
+    question: str,
+    profile_id: str,
+    data: Optional[dict[str, Any]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """Answer a medication question: {"success": bool, "message": str}."""
+    if not profile_id:
+        return {"success": False, "message": "❌ A valid profile_id is required."}
+
+    data = data if data is not None else fetch_medication_data(profile_id)
+    medications      = data["medications"]
+    standalone_logs  = data["logs"]
+    doctors          = data["doctors"]
+    health           = data["health"]
+
+    # Answers depend on the rows and on "today" (missed / upcoming doses).
+    ctx_hash = context_hash(
+        medications, standalone_logs, doctors, health,
+        datetime.now(timezone.utc).date(),
+    )
+    cached = lookup_response("medications", profile_id, ctx_hash, question)
+    if cached is not None:
+        return {"success": True, "message": cached}
 
     log_map = _merge_logs(medications, standalone_logs)
     context = _build_context(medications, log_map, doctors, health)
     system, user = _build_prompts(context, question)
 
     try:
-        return call_llm(system, user, max_tokens=_LLM_MAX_TOKENS)
+        answer = call_llm(system, user, max_tokens=_LLM_MAX_TOKENS, on_delta=on_delta)
     except Exception as exc:
-        return f"❌ Failed to generate medication answer: {exc}"
+        return {"success": False, "message": f"❌ Failed to generate medication answer: {exc}"}
+    store_response("medications", profile_id, ctx_hash, question, answer)
+    return {"success": True, "message": answer}
     
 if __name__ == "__main__":
     print(query_medications('what was my most recent medication and when is it scheduled','e18af8f2-9c0e-4a92-b6b5-84e8ad019186'))
\ No newline at end of file
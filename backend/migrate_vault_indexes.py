@@ -0,0 +1,72 @@
+"""
+Convert the per-profile vault indexes (lab reports, insurance, medical bills)
+to the current on-disk format: one ``gen-N`` generation directory behind a
+CURRENT pointer, the embedding model recorded in ``manifest.json``, chunks
+in the memory-mapped chunk store, and no pickled ``vectorizer.pkl`` or
+``chunks_dict.pkl``.
+
+Converting is optional — older indexes are still read and are rewritten on
+their next update — but it removes the last pickles from disk, and the first
+question per profile no longer unpickles every chunk.
+Each profile is converted under its writer lock, so this can run while the
+API is serving.
+
+Usage (from backend/, with the same *_VECTOR_DIR environment as the API):
+  python migrate_vault_indexes.py              # convert every profile
+  python migrate_vault_indexes.py --dry-run    # only list what would change
+  python migrate_vault_indexes.py --domain insurance
+"""
+
+import argparse
+import sys
+
+
+def _indexes() -> dict:
+    from insurance_summary.insurance_rag_query import INSURANCE_INDEX
+    from labreport_summary.lab_report_rag import LAB_REPORT_INDEX
+    from medical_bills.medical_bills_rag_query import MEDICAL_BILLS_INDEX
+
+    return {
+        LAB_REPORT_INDEX.domain:    LAB_REPORT_INDEX,
+        INSURANCE_INDEX.domain:     INSURANCE_INDEX,
+        MEDICAL_BILLS_INDEX.domain: MEDICAL_BILLS_INDEX,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert vault indexes to the current on-disk format.")
+    parser.add_argument("--dry-run", action="store_true", help="list profiles that need converting, change nothing")
+    parser.add_argument("--domain", choices=["lab_report", "insurance", "medical_bills"],
+                        help="only this domain (default: all)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for domain, vault in _indexes().items():
+        if args.domain and domain != args.domain:
+            continue
+        converted = skipped = 0
+        print(f"\n📂 {domain}: {vault.vector_dir}", flush=True)
+        for profile_id in vault.profile_ids():
+            try:
+                if args.dry_run:
+                    if vault.needs_migration(profile_id):
+                        print(f"   • would convert {profile_id}", flush=True)
+                        converted += 1
+                    else:
+                        skipped += 1
+                elif vault.migrate(profile_id):
+                    print(f"   ✅ converted {profile_id}", flush=True)
+                    converted += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                print(f"   ❌ {profile_id}: {e}", flush=True)
+                failures += 1
+        verb = "to convert" if args.dry_run else "converted"
+        print(f"   {converted} {verb}, {skipped} already current", flush=True)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
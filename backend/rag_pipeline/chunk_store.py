@@ -0,0 +1,123 @@
+"""
+Columnar, memory-mapped chunk store for the vault indexes.
+
+Replaces the pickled ``dict[int, {"text", "doc_id"}]`` (chunks_dict.pkl),
+which had to be unpickled into one Python dict and string per chunk just to
+read the handful of chunks a search returns. Three files per generation:
+
+  chunks.idx.npy    structured array sorted by chunk id:
+                    id (int64), offset (int64), length (uint32), doc (uint32)
+  chunks.blob       UTF-8 chunk texts, concatenated
+  chunks.docs.json  doc_id table; ``doc`` above indexes into it
+
+The id array and the blob are memory-mapped, so opening a store reads only
+the doc table. ``get`` binary-searches the id column and copies out just the
+requested chunk; everything else stays in the (shared, reclaimable) page
+cache instead of the Python heap.
+
+Stores are written once into a generation directory and never modified;
+updates materialise ``to_dict()``, edit it and write a new store.
+"""
+
+import json
+import mmap
+import os
+from typing import Iterator, Mapping, Optional
+
+import numpy as np
+
+IDX_FILE  = "chunks.idx.npy"
+BLOB_FILE = "chunks.blob"
+DOCS_FILE = "chunks.docs.json"
+FILES     = (IDX_FILE, BLOB_FILE, DOCS_FILE)
+
+_ROW = np.dtype([("id", "<i8"), ("offset", "<i8"), ("length", "<u4"), ("doc", "<u4")])
+
+
+def write_chunk_store(directory: str, chunks: Mapping[int, dict]) -> None:
+    """Write *chunks* (id -> {"text", "doc_id"}) as a store in *directory*."""
+    ids  = sorted(int(cid) for cid in chunks)
+    rows = np.empty(len(ids), dtype=_ROW)
+    docs: list = []
+    doc_index: dict = {}
+
+    offset = 0
+    with open(os.path.join(directory, BLOB_FILE), "wb") as fh:
+        for i, cid in enumerate(ids):
+            chunk = chunks[cid]
+            data  = (chunk.get("text") or "").encode("utf-8")
+            fh.write(data)
+            doc_id = str(chunk.get("doc_id", ""))
+            doc = doc_index.get(doc_id)
+            if doc is None:
+                doc = doc_index[doc_id] = len(docs)
+                docs.append(doc_id)
+            rows[i] = (cid, offset, len(data), doc)
+            offset += len(data)
+
+    np.save(os.path.join(directory, IDX_FILE), rows, allow_pickle=False)
+    with open(os.path.join(directory, DOCS_FILE), "w", encoding="utf-8") as fh:
+        json.dump(docs, fh, ensure_ascii=False)
+
+
+def has_chunk_store(directory: str) -> bool:
+    return all(os.path.exists(os.path.join(directory, fname)) for fname in FILES)
+
+
+class ChunkStore:
+    """Read-only view of a written store; ``get`` mirrors ``dict.get``."""
+
+    def __init__(self, directory: str):
+        idx_path = os.path.join(directory, IDX_FILE)
+        try:
+            self._rows = np.load(idx_path, mmap_mode="r", allow_pickle=False)
+        except ValueError:
+            # numpy cannot map a zero-length array
+            self._rows = np.load(idx_path, allow_pickle=False)
+        self._ids = self._rows["id"]
+
+        with open(os.path.join(directory, BLOB_FILE), "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            self._blob = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        with open(os.path.join(directory, DOCS_FILE), "r", encoding="utf-8") as fh:
+            self._docs: list = json.load(fh)
+
+    def _position(self, cid: int) -> Optional[int]:
+        pos = int(np.searchsorted(self._ids, cid))
+        if pos < len(self._ids) and int(self._ids[pos]) == cid:
+            return pos
+        return None
+
+    def _chunk(self, pos: int) -> dict:
+        _, start, length, doc = self._rows[pos].item()
+        return {"text": self._blob[start:start + length].decode("utf-8"), "doc_id": self._docs[doc]}
+
+    def get(self, cid: int, default=None) -> Optional[dict]:
+        pos = self._position(int(cid))
+        return default if pos is None else self._chunk(pos)
+
+    def __getitem__(self, cid: int) -> dict:
+        pos = self._position(int(cid))
+        if pos is None:
+            raise KeyError(cid)
+        return self._chunk(pos)
+
+    def __contains__(self, cid) -> bool:
+        return self._position(int(cid)) is not None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return (int(cid) for cid in self._ids)
+
+    def to_dict(self) -> dict:
+        """Every chunk as the historical dict (for building the next generation)."""
+        return {int(self._ids[pos]): self._chunk(pos) for pos in range(len(self._ids))}
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident cost: the id/offset columns and the doc table.
+        The text blob is mapped and read on demand, so it is not counted."""
+        return int(self._rows.nbytes) + sum(len(d) + 50 for d in self._docs)
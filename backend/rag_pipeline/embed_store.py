@@ -1,10 +1,15 @@
 """
 Embedding and FAISS index layer for the medical RAG pipeline.
 Uses sentence-transformers (all-MiniLM-L6-v2) for dense 384-d embeddings.
+
+``build_faiss_index`` returns the index, chunks and vectorizer for direct use
+by the query stage; writing them to disk is optional (``save_index`` /
+``save_index_async``, for debugging).
 """
 
 import os
 import pickle
+import threading
 import numpy as np
 import faiss
 from typing import List
@@ -66,6 +71,16 @@ class SentenceTransformerVectorizer:
 def create_vectorizer() -> SentenceTransformerVectorizer:
     return SentenceTransformerVectorizer(_MODEL_NAME)
 
+@lru_cache(maxsize=8)
+def get_vectorizer(model_name: str = _MODEL_NAME) -> SentenceTransformerVectorizer:
+    """Shared vectorizer for a model name; the model itself is loaded once per process."""
+    return SentenceTransformerVectorizer(model_name)
+
+def embedding_identity(vectorizer=None) -> dict:
+    """Model name, dimension and normalisation of stored vectors, recorded in index manifests."""
+    model_name = getattr(vectorizer, "model_name", None) or _MODEL_NAME
+    return {"model": model_name, "dim": EMBEDDING_DIM, "normalize": "l2"}
+
 def embed_texts(texts: List[str], vectorizer=None) -> tuple:
     """Embed a list of text chunks into 384-d float32 vectors."""
     print(f"\n📊 Embedding {len(texts)} chunks...", flush=True)
@@ -100,8 +115,13 @@ def embed_texts(texts: List[str], vectorizer=None) -> tuple:
         print(f"   ❌ Embedding failed: {e}", flush=True)
         raise
 
-def build_faiss_index(chunks: List[dict], temp_dir: str) -> tuple:
-    """Build a FAISS IndexFlatIP from metadata-aware chunks and persist to temp_dir."""
+def build_faiss_index(chunks: List[dict], temp_dir: str = None) -> tuple:
+    """
+    Build a FAISS IndexFlatIP from metadata-aware chunks.
+
+    Returns (index, chunks, vectorizer) in memory; only persisted when
+    temp_dir is given.
+    """
     if not chunks:
         raise ValueError("No chunks provided to index")
 
@@ -129,22 +149,36 @@ def build_faiss_index(chunks: List[dict], temp_dir: str) -> tuple:
     index.add(embedding_matrix)
     print(f"   ✅ Index created: {index.ntotal} vectors", flush=True)
 
-    index_path      = os.path.join(temp_dir, "index.faiss")
-    chunks_path     = os.path.join(temp_dir, "chunks.pkl")
-    vectorizer_path = os.path.join(temp_dir, "vectorizer.pkl")
+    if temp_dir:
+        save_index(index, chunks, vectorizer, temp_dir)
+    print("✅ FAISS index built successfully!", flush=True)
+
+    return index, chunks, vectorizer
 
-    faiss.write_index(index, index_path)
+def save_index(index, chunks: List[dict], vectorizer, directory: str) -> None:
+    """Write index.faiss / chunks.pkl / vectorizer.pkl (load_index_and_chunks layout)."""
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(index, os.path.join(directory, "index.faiss"))
 
-    with open(chunks_path, "wb") as f:
+    with open(os.path.join(directory, "chunks.pkl"), "wb") as f:
         pickle.dump(chunks, f)
 
-    with open(vectorizer_path, "wb") as f:
+    with open(os.path.join(directory, "vectorizer.pkl"), "wb") as f:
         pickle.dump(vectorizer, f)
 
-    print(f"   ✅ Saved to temp: {temp_dir}", flush=True)
-    print("✅ FAISS index built successfully!", flush=True)
+    print(f"   ✅ Saved to: {directory}", flush=True)
 
-    return index, chunks, vectorizer
+def save_index_async(index, chunks: List[dict], vectorizer, directory: str) -> threading.Thread:
+    """save_index on a daemon thread, off the request path. Failures are only logged."""
+    def _save():
+        try:
+            save_index(index, chunks, vectorizer, directory)
+        except Exception as e:
+            print(f"   ⚠️ Index save to {directory} failed: {e}", flush=True)
+
+    thread = threading.Thread(target=_save, name="index-save", daemon=True)
+    thread.start()
+    return thread
 
 def load_index_and_chunks(temp_dir: str):
     """Load FAISS index, chunks and vectorizer from temp_dir."""
@@ -12,7 +12,8 @@ from dateutil import parser as _dateutil_parser
 from dateutil.parser import ParserError
 
 from pydantic import BaseModel, field_validator
-from openai import AsyncOpenAI
+
+from rag_pipeline.llm_gateway import get_llm_gateway
 
 # --- Configuration ---
 
@@ -21,10 +22,9 @@ MODEL_NAME: str = "gpt-4.1-nano"
 _MAX_CONCURRENT: int = int(os.getenv("METADATA_MAX_CONCURRENT", "8"))
 
 
-def _make_client() -> AsyncOpenAI:
-    """Creates a new AsyncOpenAI client bound to the active event loop."""
-    return AsyncOpenAI(
-        api_key=OPENAI_API_KEY,
+def _make_client():
+    """Shared gateway client with the metadata call's timeout / retry policy."""
+    return get_llm_gateway().client.with_options(
         timeout=25.0,
         max_retries=2,
     )
@@ -200,7 +200,7 @@ async def _async_extract_single(
     text: str,
     file_name: str,
     semaphore: asyncio.Semaphore,
-    client: AsyncOpenAI,
+    client,
 ) -> dict:
     """Worker handling single-document extraction via LLM with fallback handling."""
     text_sample = text[:800]
@@ -220,7 +220,7 @@ async def _async_extract_single(
                 max_tokens=300,
             )
 
-            parsed: Optional[MedicalMetadata] = response.choices.message.parsed
+            parsed: Optional[MedicalMetadata] = response.choices[0].message.parsed
 
             if parsed is None:
                 print(f"   ⚠️  Parsed result is None for {file_name} — using fallback")
@@ -244,12 +244,8 @@ async def _async_extract_single(
 
 
 async def _run_single(text: str, file_name: str) -> dict:
-    client = _make_client()
     semaphore = asyncio.Semaphore(_MAX_CONCURRENT)
-    try:
-        return await _async_extract_single(text, file_name, semaphore, client)
-    finally:
-        await client.close()
+    return await _async_extract_single(text, file_name, semaphore, _make_client())
 
 
 async def _run_batch(items: List[Tuple[str, str]]) -> List[dict]:
@@ -259,10 +255,7 @@ async def _run_batch(items: List[Tuple[str, str]]) -> List[dict]:
         _async_extract_single(text, fname, semaphore, client)
         for text, fname in items
     ]
-    try:
-        return await asyncio.gather(*tasks)
-    finally:
-        await client.close()
+    return await asyncio.gather(*tasks)
 
 
 # --- Public API Sync Wrappers ---
@@ -280,7 +273,7 @@ def extract_metadata_with_llm(
         return extract_metadata_fallback(text)
 
     try:
-        return asyncio.run(
+        return get_llm_gateway().run(
             _run_single(text, file_name or "unknown")
         )
 
@@ -308,7 +301,7 @@ def extract_metadata_batch(
         return [extract_metadata_fallback(t) for t, _ in items]
 
     try:
-        return asyncio.run(_run_batch(items))
+        return get_llm_gateway().run(_run_batch(items))
 
     except RuntimeError as exc:
         print(f"   ⚠️  Active event loop ({exc}) — sequential fallback")
@@ -2,62 +2,50 @@ import gc
 import io
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Optional
 import cv2
 import numpy as np
 from PIL import Image
 import pdfplumber
 
-os.environ.setdefault("GLOG_minloglevel", "3")
-os.environ.setdefault("PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK", "True")
-
-PADDLE_AVAILABLE = False
-paddle_ocr = None
-try:
-    from paddleocr import PaddleOCR
-
-    # Use mobile_det to prevent OOM issues on limited RAM environments
-    _new_kwargs = {
-        "use_textline_orientation": True,
-        "lang": "en",
-        "text_det_thresh": 0.3,
-        "text_det_box_thresh": 0.5,
-        "text_det_unclip_ratio": 2.0,
-        "text_recognition_batch_size": 6,
-        "enable_mkldnn": False,
-        "text_detection_model_name": "PP-OCRv5_mobile_det",
-    }
-    _legacy_kwargs = {
-        "use_angle_cls": True,
-        "lang": "en",
-        "det_db_thresh": 0.3,
-        "det_db_box_thresh": 0.5,
-        "det_db_unclip_ratio": 2.0,
-        "rec_batch_num": 6,
-    }
+from rag_pipeline.ocr_cache import cache_get, cache_key, cache_put
+from rag_pipeline.ocr_engines import get_engine_manager
 
-    for _kwargs in [_new_kwargs, _legacy_kwargs]:
-        try:
-            paddle_ocr = PaddleOCR(**_kwargs)
-            PADDLE_AVAILABLE = True
-            print("✅ PaddleOCR initialized (primary engine)")
-            break
-        except TypeError:
-            continue
-    else:
-        raise RuntimeError(
-            "No compatible PaddleOCR API signature found. "
-            "Try: pip install --upgrade paddleocr"
-        )
+_OCR_MAX_DIM = 1600
 
-except Exception as e:
-    PADDLE_AVAILABLE = False
-    paddle_ocr = None
-    print(f"⚠️ PaddleOCR not available: {e}")
+# Bump whenever a change alters extracted text (engine, thresholds, page
+# routing) so content-addressed OCR cache entries from older builds are ignored.
+EXTRACTOR_VERSION = "7"
 
-_easyocr_reader  = None
-_easyocr_checked = False
+# Pages of one PDF rasterized + recognised concurrently (1 = strictly sequential).
+# In-flight page images are bounded by this number, which caps peak memory.
+_OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", "1"))
 
-_OCR_MAX_DIM = 1600
+# A PDF page whose text layer has fewer characters than this is treated as a
+# scan and sent to OCR; pages at or above it use the embedded text directly.
+_PDF_TEXT_PAGE_MIN_CHARS = int(os.getenv("PDF_TEXT_PAGE_MIN_CHARS", "25"))
+
+# Batched path: text-line crops recognised per model call, and page images
+# held in memory before a batch is flushed through detection + recognition.
+_OCR_REC_BATCH_SIZE  = int(os.getenv("OCR_REC_BATCH_SIZE", "32"))
+_OCR_BATCH_MAX_PAGES = int(os.getenv("OCR_BATCH_MAX_PAGES", "16"))
+
+# Wall-clock budget per file in seconds (default 10, 0 = unlimited). When it
+# runs out no further pages are rendered; the result is marked partial and
+# lists the pages still pending so they can be completed in the background.
+# Keeps one long scan from using up the whole OCR_REQUEST_BUDGET_S (ocr_pool).
+OCR_FILE_BUDGET_S = float(os.getenv("OCR_FILE_BUDGET_S", "10"))
+
+# Quality triage before the EasyOCR fallback: denoise / CLAHE only run when the
+# measured noise / contrast calls for them (0 = always run the full pipeline).
+_OCR_ADAPTIVE_PREPROCESS = os.getenv("OCR_ADAPTIVE_PREPROCESS", "1") == "1"
+_TRIAGE_NOISE_SIGMA      = float(os.getenv("OCR_TRIAGE_NOISE_SIGMA", "4.0"))
+_TRIAGE_MIN_CONTRAST     = float(os.getenv("OCR_TRIAGE_MIN_CONTRAST", "45.0"))
+_TRIAGE_THUMB_DIM        = 400
 
 
 # --- Image Helpers ---
@@ -93,6 +81,102 @@ def preprocess_image(img_array: np.ndarray, verbose: bool = False) -> np.ndarray
     return binary
 
 
+# Running estimate of fastNlMeansDenoising cost, refined each time it actually runs;
+# used to report how much time a skipped denoise saved.
+_denoise_s_per_mp = 1.5
+_denoise_lock     = threading.Lock()
+
+
+def _to_gray(img_array: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY) if len(img_array.shape) == 3 else img_array
+
+
+def assess_image_quality(img_array: np.ndarray) -> dict:
+    """
+    Cheap scan-quality estimate (a few ms even for large pages).
+
+    sharpness  — variance of the Laplacian on a ~400px thumbnail
+    contrast   — grey-level standard deviation on the thumbnail
+    noise_sigma — Immerkær's fast noise estimate on a full-resolution centre
+                  crop (downsampling would average the noise away)
+    """
+    gray = _to_gray(img_array)
+    h, w = gray.shape[:2]
+
+    scale = min(1.0, _TRIAGE_THUMB_DIM / max(h, w))
+    thumb = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))),
+                       interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+    ch, cw = min(h, 512), min(w, 512)
+    y0, x0 = (h - ch) // 2, (w - cw) // 2
+    crop   = gray[y0:y0 + ch, x0:x0 + cw].astype(np.float32)
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    resp   = np.abs(cv2.filter2D(crop, -1, kernel)[1:-1, 1:-1])
+    noise  = float(resp.sum() * np.sqrt(np.pi / 2) / (6 * max(1, resp.size))) if resp.size else 0.0
+
+    return {
+        "sharpness":   round(float(cv2.Laplacian(thumb, cv2.CV_64F).var()), 1),
+        "contrast":    round(float(thumb.std()), 1),
+        "noise_sigma": round(noise, 2),
+    }
+
+
+def plan_preprocessing(quality: dict) -> list[str]:
+    """Pick preprocessing steps from a quality estimate; binarization is always kept (it is cheap)."""
+    steps = ["grayscale"]
+    if quality["noise_sigma"] >= _TRIAGE_NOISE_SIGMA:
+        steps.append("denoise")
+    if quality["contrast"] < _TRIAGE_MIN_CONTRAST:
+        steps.append("clahe")
+    steps.append("threshold")
+    return steps
+
+
+def preprocess_adaptive(img_array: np.ndarray, verbose: bool = False):
+    """
+    Triage the image and run only the preprocessing it needs.
+    Returns (processed image, info) where info records quality, the steps run,
+    and the estimated seconds saved by any skipped denoise.
+    """
+    global _denoise_s_per_mp
+    if img_array is None or img_array.size == 0:
+        return img_array, None
+
+    t0      = time.perf_counter()
+    quality = assess_image_quality(img_array)
+    steps   = plan_preprocessing(quality) if _OCR_ADAPTIVE_PREPROCESS else \
+        ["grayscale", "denoise", "clahe", "threshold"]
+    triage_ms = round(1000 * (time.perf_counter() - t0), 1)
+
+    img = _to_gray(img_array)
+    mp  = img.shape[0] * img.shape[1] / 1e6
+    if "denoise" in steps:
+        t1  = time.perf_counter()
+        img = cv2.fastNlMeansDenoising(img, h=10)
+        if mp > 0:
+            with _denoise_lock:
+                _denoise_s_per_mp = 0.8 * _denoise_s_per_mp + 0.2 * (time.perf_counter() - t1) / mp
+    if "clahe" in steps:
+        img = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(img)
+    img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                cv2.THRESH_BINARY, 11, 2)
+
+    info = {
+        "quality":     quality,
+        "steps":       steps,
+        "triage_ms":   triage_ms,
+        "saved_s_est": 0.0 if "denoise" in steps else round(_denoise_s_per_mp * mp, 2),
+    }
+    if verbose:
+        print(
+            f"  🔧 Adaptive preprocessing: {' → '.join(steps)} "
+            f"(noise σ {quality['noise_sigma']}, contrast {quality['contrast']}, "
+            f"sharpness {quality['sharpness']}; ~{info['saved_s_est']}s saved)",
+            flush=True,
+        )
+    return img, info
+
+
 def ensure_color(img_array: np.ndarray) -> np.ndarray:
     """Ensure image is uint8 3-channel BGR for PaddleOCR compatibility."""
     if img_array is None or img_array.size == 0:
@@ -108,12 +192,106 @@ def ensure_color(img_array: np.ndarray) -> np.ndarray:
     return img_array
 
 
+# --- Extraction Results ---
+
+@dataclass
+class PageResult:
+    page:       int
+    text:       str
+    source:     str                      # "text_layer" | "paddle" | "easyocr" | "none"
+    confidence: Optional[float] = None   # mean recognition confidence of the kept lines
+    render_s:   float = 0.0
+    ocr_s:      float = 0.0
+    preprocess: Optional[dict] = None    # quality triage + steps (EasyOCR fallback only)
+
+    def to_stats(self) -> dict:
+        stats = asdict(self)
+        stats["chars"] = len(stats.pop("text"))
+        return stats
+
+
+@dataclass
+class ExtractionResult:
+    """Text plus enough diagnostics to see which path ran and what it cost."""
+    text:      str
+    file_type: str                                    # "pdf" | "image"
+    pages:     list = field(default_factory=list)     # list[PageResult], page order
+    timings:   dict = field(default_factory=dict)     # text_layer_s / render_s / ocr_s / total_s
+    cache_hit: bool = False
+    error:     Optional[str] = None
+    partial:   bool = False                           # budget ran out before every page was read
+    pending_pages: list = field(default_factory=list) # 1-based pages still to OCR when partial
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @property
+    def ocr_page_count(self) -> int:
+        return sum(1 for p in self.pages if p.source != "text_layer")
+
+    @property
+    def engine(self) -> str:
+        """Path taken: a single source name, "mixed", "cache" or "none"."""
+        if self.cache_hit:
+            return "cache"
+        sources = {p.source for p in self.pages if p.text}
+        if not sources:
+            return "none"
+        return sources.pop() if len(sources) == 1 else "mixed"
+
+    @property
+    def mean_confidence(self) -> Optional[float]:
+        scores = [p.confidence for p in self.pages if p.confidence is not None]
+        return round(sum(scores) / len(scores), 4) if scores else None
+
+    def to_stats(self) -> dict:
+        """JSON-safe summary without the extracted text. A cache hit does not
+        know its pages, so its page counts are None rather than 0."""
+        return {
+            "file_type":         self.file_type,
+            "engine":            self.engine,
+            "page_count":        None if self.cache_hit else self.page_count,
+            "ocr_page_count":    None if self.cache_hit else self.ocr_page_count,
+            "text_chars":        len(self.text),
+            "mean_confidence":   self.mean_confidence,
+            "cache_hit":         self.cache_hit,
+            "error":             self.error,
+            "partial":           self.partial,
+            "pending_pages":     list(self.pending_pages),
+            "timings":           {k: round(v, 3) for k, v in self.timings.items()},
+            "pages":             [p.to_stats() for p in self.pages],
+            "extractor_version": EXTRACTOR_VERSION,
+        }
+
+
+def _cached_result(text: str, ext: str) -> ExtractionResult:
+    return ExtractionResult(text=text, file_type="pdf" if ext == '.pdf' else "image", cache_hit=True)
+
+
+def _file_deadline(deadline: Optional[float]) -> Optional[float]:
+    """Combine a caller deadline (time.time() epoch) with OCR_FILE_BUDGET_S from now."""
+    if OCR_FILE_BUDGET_S > 0:
+        own = time.time() + OCR_FILE_BUDGET_S
+        return own if deadline is None else min(deadline, own)
+    return deadline
+
+
+def _expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.time() >= deadline
+
+
+def _mean(scores) -> Optional[float]:
+    scores = list(scores)
+    return round(sum(scores) / len(scores), 4) if scores else None
+
+
 # --- PaddleOCR Result Parser ---
 
-def _parse_paddle_result(result_raw, conf_threshold: float = 0.3) -> list[str]:
-    texts = []
+def _parse_paddle_lines(result_raw, conf_threshold: float = 0.3) -> list[tuple[str, float]]:
+    lines = []
     if not result_raw:
-        return texts
+        return lines
     for page in result_raw:
         if page is None:
             continue
@@ -122,38 +300,44 @@ def _parse_paddle_result(result_raw, conf_threshold: float = 0.3) -> list[str]:
             rec_scores = getattr(page, "rec_scores", None) or [1.0] * len(rec_texts)
             for text, conf in zip(rec_texts, rec_scores):
                 if text and str(text).strip() and float(conf) >= conf_threshold:
-                    texts.append(str(text).strip())
+                    lines.append((str(text).strip(), float(conf)))
             continue
         if isinstance(page, dict):
             rec_texts  = page.get("rec_texts") or page.get("rec_text") or []
             rec_scores = page.get("rec_scores") or page.get("rec_score") or [1.0] * len(rec_texts)
             for text, conf in zip(rec_texts, rec_scores):
                 if text and str(text).strip() and float(conf) >= conf_threshold:
-                    texts.append(str(text).strip())
+                    lines.append((str(text).strip(), float(conf)))
             continue
         if isinstance(page, (list, tuple)):
+            # Legacy 2.x layout: [[box, (text, conf)], ...]
             for item in page:
                 try:
                     if not isinstance(item, (list, tuple)) or len(item) < 2:
                         continue
-                    text_info = item
+                    text_info = item[1]
                     if not isinstance(text_info, (list, tuple)) or len(text_info) < 2:
                         continue
-                    text = str(text_info)
-                    conf = float(text_info)
+                    text = str(text_info[0])
+                    conf = float(text_info[1])
                     if text.strip() and conf >= conf_threshold:
-                        texts.append(text.strip())
+                        lines.append((text.strip(), conf))
                 except (IndexError, TypeError, ValueError):
                     continue
             continue
-    return texts
+    return lines
+
+
+def _parse_paddle_result(result_raw, conf_threshold: float = 0.3) -> list[str]:
+    return [text for text, _ in _parse_paddle_lines(result_raw, conf_threshold)]
 
 
 # --- OCR Engines ---
 
-def extract_with_paddle(img_array: np.ndarray, verbose: bool = False) -> str:
-    if not PADDLE_AVAILABLE:
-        return ""
+def _paddle_lines(img_array: np.ndarray, verbose: bool = False) -> list[tuple[str, float]]:
+    engines = get_engine_manager()
+    if not engines.paddle_available:
+        return []
     if verbose:
         print("    → PaddleOCR (primary)...", flush=True)
 
@@ -164,70 +348,167 @@ def extract_with_paddle(img_array: np.ndarray, verbose: bool = False) -> str:
         print(f"      shape fed to PaddleOCR: {color_img.shape}", flush=True)
 
     result_raw = None
-    try:
-        result_raw = list(paddle_ocr.predict(color_img))
-    except TypeError:
-        result_raw = None
-    except Exception as e:
-        if verbose:
-            print(f"      ✗ .predict() failed: {type(e).__name__}: {e}", flush=True)
-        result_raw = None
-
-    if result_raw is None:
+    with engines.paddle() as paddle_ocr:
+        if paddle_ocr is None:
+            return []
         try:
-            result_raw = paddle_ocr.ocr(color_img)
+            result_raw = list(paddle_ocr.predict(color_img))
+        except TypeError:
+            result_raw = None
         except Exception as e:
             if verbose:
-                print(f"      ✗ .ocr() failed: {type(e).__name__}: {e}", flush=True)
-            return ""
+                print(f"      ✗ .predict() failed: {type(e).__name__}: {e}", flush=True)
+            result_raw = None
+
+        if result_raw is None:
+            try:
+                result_raw = paddle_ocr.ocr(color_img)
+            except Exception as e:
+                if verbose:
+                    print(f"      ✗ .ocr() failed: {type(e).__name__}: {e}", flush=True)
+                return []
 
     try:
-        texts = _parse_paddle_result(result_raw, conf_threshold=0.3)
+        lines = _parse_paddle_lines(result_raw, conf_threshold=0.3)
     except Exception as e:
         if verbose:
             print(f"      ✗ parsing failed: {type(e).__name__}: {e}", flush=True)
-        return ""
+        return []
 
-    extracted = "\n".join(texts)
     if verbose:
-        print(f"      {'✓' if extracted else '✗'} {len(extracted)} chars extracted", flush=True)
-    return extracted
+        chars = sum(len(t) for t, _ in lines)
+        print(f"      {'✓' if lines else '✗'} {chars} chars extracted", flush=True)
+    return lines
 
 
-def _get_easyocr_reader():
-    global _easyocr_reader, _easyocr_checked
-    if _easyocr_checked:
-        return _easyocr_reader
-    _easyocr_checked = True
-    try:
-        import easyocr
-        print("🔄 Initializing EasyOCR fallback...", flush=True)
-        _easyocr_reader = easyocr.Reader(['en'], gpu=False)
-        print("✅ EasyOCR initialized", flush=True)
-    except Exception as e:
-        _easyocr_reader = None
-        print(f"⚠️ EasyOCR not available: {e}", flush=True)
-    return _easyocr_reader
+def extract_with_paddle(img_array: np.ndarray, verbose: bool = False) -> str:
+    return "\n".join(text for text, _ in _paddle_lines(img_array, verbose))
 
 
-def extract_with_easyocr(img_array: np.ndarray, verbose: bool = False) -> str:
-    reader = _get_easyocr_reader()
+def _sort_text_boxes(polys) -> list:
+    """Reading order: top-to-bottom, then left-to-right for boxes on the same line."""
+    boxes = sorted((np.asarray(p, dtype=np.float32) for p in polys), key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def _crop_text_line(img: np.ndarray, poly: np.ndarray):
+    """Perspective-crop one detected quadrilateral; tall crops are rotated upright."""
+    width  = int(max(np.linalg.norm(poly[0] - poly[1]), np.linalg.norm(poly[2] - poly[3])))
+    height = int(max(np.linalg.norm(poly[0] - poly[3]), np.linalg.norm(poly[1] - poly[2])))
+    if width < 2 or height < 2:
+        return None
+    dst  = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    crop = cv2.warpPerspective(
+        img, cv2.getPerspectiveTransform(poly[:4], dst), (width, height),
+        borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC,
+    )
+    if crop.shape[0] / crop.shape[1] >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def _det_rec_batch(models, images: list, verbose: bool = False) -> list[list[tuple[str, float]]]:
+    det, rec = models
+    crops, owners = [], []
+    for idx, (img, res) in enumerate(zip(images, det.predict(images, batch_size=1))):
+        for poly in _sort_text_boxes(res["dt_polys"]):
+            crop = _crop_text_line(img, poly)
+            if crop is not None:
+                crops.append(crop)
+                owners.append(idx)
+
+    lines = [[] for _ in images]
+    if crops:
+        for owner, res in zip(owners, rec.predict(crops, batch_size=_OCR_REC_BATCH_SIZE)):
+            text = str(res["rec_text"] or "").strip()
+            conf = float(res["rec_score"])
+            if text and conf >= 0.3:
+                lines[owner].append((text, conf))
+
+    if verbose:
+        print(
+            f"      batched recognition: {len(crops)} lines from {len(images)} images "
+            f"(batch size {_OCR_REC_BATCH_SIZE})",
+            flush=True,
+        )
+    return lines
+
+
+def _paddle_lines_batch(img_arrays: list, verbose: bool = False) -> list[list[tuple[str, float]]]:
+    engines = get_engine_manager()
+    if not img_arrays or not engines.paddle_available:
+        return [[] for _ in img_arrays]
+    if verbose:
+        print(f"    → PaddleOCR batch ({len(img_arrays)} images)...", flush=True)
+
+    images = [ensure_color(_cap_image_size(a)) for a in img_arrays]
+
+    with engines.det_rec() as models:
+        if models is not None:
+            try:
+                return _det_rec_batch(models, images, verbose)
+            except Exception as e:
+                if verbose:
+                    print(f"      ✗ batched det/rec failed: {type(e).__name__}: {e}", flush=True)
+
+    with engines.paddle() as paddle_ocr:
+        if paddle_ocr is None:
+            return [[] for _ in images]
+        try:
+            results = list(paddle_ocr.predict(images))
+            if len(results) == len(images):
+                return [_parse_paddle_lines([r], conf_threshold=0.3) for r in results]
+        except Exception as e:
+            if verbose:
+                print(f"      ✗ .predict(list) failed: {type(e).__name__}: {e}", flush=True)
+
+    return [_paddle_lines(img, verbose=verbose) for img in images]
+
+
+def extract_with_paddle_batch(img_arrays: list, verbose: bool = False) -> list[str]:
+    """
+    OCR several page images together, returning one text per image in input order.
+
+    Detection runs per image; the text-line crops from all images are then
+    recognised together in batches of OCR_REC_BATCH_SIZE, so batches span pages
+    and files. Textline-orientation classification is skipped on this path.
+    Without the standalone det/rec modules, PaddleOCR.predict(list) is used.
+    """
+    return [
+        "\n".join(text for text, _ in lines)
+        for lines in _paddle_lines_batch(img_arrays, verbose)
+    ]
+
+
+def _easyocr_lines(img_array: np.ndarray, verbose: bool = False) -> list[tuple[str, float]]:
+    engines = get_engine_manager()
+    reader  = engines.easyocr()
     if reader is None:
-        return ""
+        return []
     try:
         if verbose:
             print("    → EasyOCR (fallback)...", flush=True)
         img_array = _cap_image_size(img_array)
-        result    = reader.readtext(img_array)
-        texts     = [item for item in result if item > 0.3]
-        extracted = "\n".join(texts)
-        if verbose and extracted:
-            print(f"      ✓ {len(extracted)} chars extracted", flush=True)
-        return extracted
+        with engines.easyocr_lock():
+            result = reader.readtext(img_array)
+        lines = [(str(item[1]), float(item[2])) for item in result if item[2] > 0.3]
+        if verbose and lines:
+            print(f"      ✓ {sum(len(t) for t, _ in lines)} chars extracted", flush=True)
+        return lines
     except Exception as e:
         if verbose:
             print(f"      ✗ EasyOCR failed: {e}", flush=True)
-        return ""
+        return []
+
+
+def extract_with_easyocr(img_array: np.ndarray, verbose: bool = False) -> str:
+    return "\n".join(text for text, _ in _easyocr_lines(img_array, verbose))
 
 
 # --- Post-processing ---
@@ -254,230 +535,508 @@ def postprocess_text(text: str) -> str:
 # --- Shared Internal Helpers ---
 
 def _prepare_for_easyocr_array(img_array, use_preprocessing=True, verbose=False):
+    """Returns (image for EasyOCR, preprocessing info or None)."""
     if use_preprocessing:
-        return preprocess_image(img_array, verbose=verbose)
-    if len(img_array.shape) == 3:
-        return cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-    return img_array
+        return preprocess_adaptive(img_array, verbose=verbose)
+    return _to_gray(img_array), None
+
 
+def _ocr_page(page_no, img_array, render_s=0.0, use_preprocessing=True, verbose=False,
+              paddle_lines=None) -> PageResult:
+    """
+    OCR one page image: PaddleOCR first, EasyOCR on the preprocessed image if
+    PaddleOCR finds nothing. paddle_lines, when given, are results already
+    produced by the batched path, so only the fallback runs here.
+    """
+    t0 = time.perf_counter()
+    if paddle_lines is None:
+        paddle_lines = _paddle_lines(img_array, verbose=verbose)
 
-def _ocr_best_from_array(raw_img, use_preprocessing=True, verbose=False):
-    """Attempts OCR with PaddleOCR first, falling back to EasyOCR on failure."""
-    paddle_text = extract_with_paddle(raw_img, verbose=verbose)
-    if paddle_text:
+    source, lines, pre = "paddle", paddle_lines, None
+    if lines:
         if verbose:
-            print(f"\n  ✅ Best result: PaddleOCR ({len(paddle_text)} chars)", flush=True)
-        return paddle_text
+            print(f"\n  ✅ Best result: PaddleOCR ({len(lines)} lines)", flush=True)
+    else:
+        if verbose:
+            print("  ⚠️ PaddleOCR returned empty — trying EasyOCR fallback...", flush=True)
+        processed, pre = _prepare_for_easyocr_array(img_array, use_preprocessing=use_preprocessing, verbose=verbose)
+        lines  = _easyocr_lines(processed, verbose=verbose)
+        source = "easyocr" if lines else "none"
+        if verbose and lines:
+            print(f"\n  ✅ Best result: EasyOCR fallback ({len(lines)} lines)", flush=True)
+
+    text = "\n".join(t for t, _ in lines)
+    return PageResult(
+        page=page_no,
+        text=postprocess_text(text) if text else "",
+        source=source,
+        confidence=_mean(c for _, c in lines),
+        render_s=render_s,
+        ocr_s=time.perf_counter() - t0,
+        preprocess=pre,
+    )
+
+
+# --- PDF Rasterization ---
+
+def _pdf_page_count(file_bytes) -> int:
+    """Page count from the document catalog — nothing is rendered."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        from pdf2image import pdfinfo_from_bytes
+        return pdfinfo_from_bytes(file_bytes)["Pages"]
+    pdf = pdfium.PdfDocument(file_bytes)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _iter_pdf_pages(file_bytes, page_numbers=None, dpi=150):
+    """
+    Yield (page_no, RGB ndarray, render_s) one page at a time, for every page
+    or only the 1-based page_numbers given.
+
+    pypdfium2 parses the document once and renders pages lazily in-process;
+    without it, pdf2image is used one page per pdftoppm call. Not thread-safe —
+    drive from a single thread.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+
+    if pdfium is None:
+        from pdf2image import convert_from_bytes
+        for page_no in page_numbers or range(1, _pdf_page_count(file_bytes) + 1):
+            t0    = time.perf_counter()
+            pages = convert_from_bytes(file_bytes, dpi=dpi, first_page=page_no, last_page=page_no)
+            if not pages:
+                continue
+            img_array = np.array(pages[0].convert("RGB"))
+            del pages
+            yield page_no, img_array, time.perf_counter() - t0
+        return
+
+    pdf = pdfium.PdfDocument(file_bytes)
+    try:
+        for page_no in page_numbers or range(1, len(pdf) + 1):
+            t0   = time.perf_counter()
+            page = pdf[page_no - 1]
+            try:
+                pil_img = page.render(scale=dpi / 72).to_pil()
+            finally:
+                page.close()
+            img_array = np.array(pil_img.convert("RGB"))
+            del pil_img
+            yield page_no, img_array, time.perf_counter() - t0
+    finally:
+        pdf.close()
+
+
+def _ocr_pdf_pages(file_bytes, page_numbers, use_preprocessing=True, verbose=False,
+                   page_workers=None, deadline=None) -> list[PageResult]:
+    """
+    OCR the given 1-based PDF pages with up to page_workers pages in flight.
+
+    Pages are rendered on the calling thread (the PDF is parsed once) and
+    handed to OCR threads; a page is only rendered once a slot is free, so
+    at most page_workers page images exist at a time. Results come back in
+    page order regardless of completion order. Once the deadline (time.time()
+    epoch) passes no further page is started; pages already in flight finish.
+    """
+    num_pages = len(page_numbers)
+    workers   = max(1, min(page_workers or _OCR_PAGE_WORKERS, num_pages or 1))
+    pages     = _iter_pdf_pages(file_bytes, page_numbers)
+
+    if workers == 1:
+        results = []
+        while not _expired(deadline):   # checked before rendering the next page
+            item = next(pages, None)
+            if item is None:
+                break
+            page_no, img_array, render_s = item
+            del item
+            if verbose:
+                print(f"\n  📄 Page {page_no} ({len(results) + 1}/{num_pages} to OCR)...", flush=True)
+                print(f"     page {page_no} raw shape: {img_array.shape}", flush=True)
+            results.append(_ocr_page(page_no, img_array, render_s, use_preprocessing, verbose))
+            del img_array
+            gc.collect()
+        pages.close()
+    else:
+        if verbose:
+            print(f"  ⚡ Page-parallel OCR: {workers} pages in flight", flush=True)
+        slots = threading.BoundedSemaphore(workers)
+
+        def _run(page_no, img_array, render_s):
+            try:
+                return _ocr_page(page_no, img_array, render_s, use_preprocessing, verbose)
+            finally:
+                slots.release()
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-page") as pool:
+            while True:
+                slots.acquire()
+                item = None if _expired(deadline) else next(pages, None)
+                if item is None:
+                    slots.release()
+                    break
+                futures.append(pool.submit(_run, *item))
+                del item
+        results = [f.result() for f in futures]
+        pages.close()
+        gc.collect()
 
     if verbose:
-        print("  ⚠️ PaddleOCR returned empty — trying EasyOCR fallback...", flush=True)
-    processed    = _prepare_for_easyocr_array(raw_img, use_preprocessing=use_preprocessing, verbose=verbose)
-    easyocr_text = extract_with_easyocr(processed, verbose=verbose)
-    if easyocr_text:
+        for r in results:
+            pre = r.preprocess
+            print(
+                f"     ⏱️  page {r.page}: render {r.render_s:.2f}s, ocr {r.ocr_s:.2f}s, "
+                f"{len(r.text)} chars via {r.source}"
+                + (f", preprocess {'+'.join(pre['steps'])} (~{pre['saved_s_est']}s saved)" if pre else ""),
+                flush=True,
+            )
+    return results
+
+
+def _pdf_text_layer(file_bytes):
+    """Embedded text per page via pdfplumber, or None if the PDF cannot be parsed."""
+    try:
+        texts = []
+        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+            for page in pdf.pages:
+                texts.append((page.extract_text() or "").strip())
+                page.close()
+        return texts
+    except Exception:
+        return None
+
+
+def _classify_pdf_pages(file_bytes, verbose=False):
+    """
+    Split pages by text layer. Pages with at least _PDF_TEXT_PAGE_MIN_CHARS of
+    embedded text are taken as-is; the rest (scans, photos of lab sheets) need
+    OCR. Returns (text-layer PageResults, page numbers to OCR).
+    """
+    if verbose:
+        print("  → Reading text layer (pdfplumber)...", flush=True)
+    layer = _pdf_text_layer(file_bytes)
+    if layer is None:
         if verbose:
-            print(f"\n  ✅ Best result: EasyOCR fallback ({len(easyocr_text)} chars)", flush=True)
-        return easyocr_text
-    return ""
+            print("  ⚠️ pdfplumber failed — OCR on every page", flush=True)
+        layer = [""] * _pdf_page_count(file_bytes)
 
+    text_pages = [
+        PageResult(page=i, text=t, source="text_layer")
+        for i, t in enumerate(layer, 1) if len(t) >= _PDF_TEXT_PAGE_MIN_CHARS
+    ]
+    done      = {p.page for p in text_pages}
+    ocr_pages = [i for i in range(1, len(layer) + 1) if i not in done]
 
-# --- Main Extraction Entry Points ---
+    if verbose:
+        print(
+            f"     {len(layer)} page(s): text layer {sorted(done) or '—'}, "
+            f"OCR {ocr_pages or '—'}",
+            flush=True,
+        )
+    return text_pages, ocr_pages
 
-def extract_text_universal(file_path, use_preprocessing=True, verbose=False):
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
 
+def _finish(result: ExtractionResult, started: float, verbose=False) -> ExtractionResult:
+    """Assemble text in page order and fill in aggregate timings."""
+    result.pages.sort(key=lambda p: p.page)
+    result.text = "\n\n".join(p.text for p in result.pages if p.text)
+    result.timings.setdefault("text_layer_s", 0.0)
+    result.timings["render_s"] = sum(p.render_s for p in result.pages)
+    result.timings["ocr_s"]    = sum(p.ocr_s for p in result.pages)
+    result.timings["total_s"]  = time.perf_counter() - started
     if verbose:
-        print(f"\n{'='*80}", flush=True)
-        print(f"🔍 OCR EXTRACTION: {os.path.basename(file_path)}", flush=True)
-        print(f"{'='*80}", flush=True)
+        if result.text:
+            print(
+                f"\n  ✅ {len(result.text)} chars from {result.page_count} page(s) via {result.engine} "
+                f"({result.ocr_page_count} OCR'd, mean conf {result.mean_confidence}, "
+                f"{result.timings['total_s']:.2f}s)\n{'='*80}\n",
+                flush=True,
+            )
+        else:
+            print(f"\n  ❌ No text extracted\n{'='*80}\n", flush=True)
+    return result
+
+
+_IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.webp')
 
-    image_exts = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.webp')
-    if file_path.lower().endswith(image_exts):
-        if verbose:
-            print("📸 Image file detected", flush=True)
-        try:
-            img       = Image.open(file_path).convert("RGB")
-            img_array = np.array(img)
-            del img; gc.collect()
-            text = _ocr_best_from_array(img_array, use_preprocessing, verbose)
-            del img_array; gc.collect()
-            if text:
-                cleaned = postprocess_text(text)
-                if verbose:
-                    print(f"  ✅ Final text: {len(cleaned)} chars\n{'='*80}\n", flush=True)
-                return cleaned
-            if verbose:
-                print(f"\n  ❌ No text extracted\n{'='*80}\n", flush=True)
-            return ""
-        except Exception as e:
-            if verbose:
-                print(f"\n  ❌ Image processing failed: {e}\n{'='*80}\n", flush=True)
-            return ""
 
-    elif file_path.lower().endswith('.pdf'):
+def _normalize_ext(file_extension: str) -> str:
+    ext = file_extension.lower()
+    return ext if ext.startswith('.') else '.' + ext
+
+
+def _mark_pending(result: ExtractionResult, wanted: list, verbose=False) -> None:
+    done    = {p.page for p in result.pages}
+    pending = [p for p in wanted if p not in done]
+    if pending:
+        result.partial       = True
+        result.pending_pages = pending
         if verbose:
-            print("📄 PDF file detected", flush=True)
+            print(f"  ⏳ Time budget exhausted — {len(pending)} page(s) pending: {pending}", flush=True)
+
 
+def _extract_result(file_bytes, ext, use_preprocessing=True, verbose=False, page_workers=None,
+                    deadline=None) -> ExtractionResult:
+    started = time.perf_counter()
+
+    if ext == '.pdf':
+        if verbose:
+            print("📄 PDF detected", flush=True)
+        result = ExtractionResult(text="", file_type="pdf")
         try:
-            if verbose:
-                print("  → Trying pdfplumber...", flush=True)
-            with pdfplumber.open(file_path) as pdf:
-                text = "".join(
-                    (p.extract_text() or "") + "\n\n" for p in pdf.pages
+            t0 = time.perf_counter()
+            text_pages, ocr_pages = _classify_pdf_pages(file_bytes, verbose)
+            result.timings["text_layer_s"] = time.perf_counter() - t0
+            result.pages = text_pages
+            if ocr_pages:
+                result.pages += _ocr_pdf_pages(
+                    file_bytes, ocr_pages, use_preprocessing, verbose, page_workers, deadline
                 )
-                if text.strip() and len(text.strip()) > 100:
-                    if verbose:
-                        print(f"  ✅ pdfplumber: {len(text)} chars\n{'='*80}\n", flush=True)
-                    return text.strip()
-                if verbose:
-                    print(f"  ⚠️ pdfplumber: {len(text.strip())} chars, switching to OCR", flush=True)
+                _mark_pending(result, ocr_pages, verbose)
         except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
             if verbose:
-                print(f"  ⚠️ pdfplumber failed: {e}", flush=True)
+                print(f"\n  ❌ PDF extraction failed: {e}", flush=True)
+        return _finish(result, started, verbose)
 
+    if ext in _IMAGE_EXTS:
         if verbose:
-            print("  → Image-based PDF — OCR one page at a time...", flush=True)
+            print("📸 Image detected", flush=True)
+        result = ExtractionResult(text="", file_type="image")
+        if _expired(deadline):
+            _mark_pending(result, [1], verbose)
+            return _finish(result, started, verbose)
         try:
-            from pdf2image import convert_from_path, pdfinfo_from_path
-            try:
-                num_pages = pdfinfo_from_path(file_path)["Pages"]
-            except Exception:
-                probe = convert_from_path(file_path, dpi=20)
-                num_pages = len(probe); del probe; gc.collect()
-
-            if verbose:
-                print(f"     {num_pages} page(s) detected", flush=True)
-
-            all_text = []
-            for i in range(1, num_pages + 1):
-                if verbose:
-                    print(f"\n  📄 Page {i}/{num_pages}...", flush=True)
-                pages = convert_from_path(file_path, dpi=150, first_page=i, last_page=i)
-                if not pages:
-                    continue
-                img_array = np.array(pages.convert("RGB"))
-                del pages; gc.collect()
-                if verbose:
-                    print(f"     raw shape: {img_array.shape}", flush=True)
-                page_text = _ocr_best_from_array(img_array, use_preprocessing, verbose)
-                del img_array; gc.collect()
-                if page_text:
-                    all_text.append(page_text)
-
-            combined = "\n\n".join(all_text)
-            if combined.strip():
-                cleaned = postprocess_text(combined)
-                if verbose:
-                    print(f"\n  ✅ {len(cleaned)} chars from {len(all_text)}/{num_pages} pages\n{'='*80}\n", flush=True)
-                return cleaned
-            if verbose:
-                print(f"\n  ❌ No text extracted\n{'='*80}\n", flush=True)
-            return ""
+            t0        = time.perf_counter()
+            img       = Image.open(io.BytesIO(file_bytes)).convert("RGB")
+            img_array = np.array(img); del img
+            result.pages = [_ocr_page(1, img_array, time.perf_counter() - t0, use_preprocessing, verbose)]
+            del img_array; gc.collect()
         except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
             if verbose:
-                print(f"\n  ❌ PDF OCR failed: {e}\n{'='*80}\n", flush=True)
-            return ""
+                print(f"\n  ❌ Image processing failed: {e}", flush=True)
+        return _finish(result, started, verbose)
 
-    else:
+    raise ValueError(f"Unsupported file extension: {ext}")
+
+
+# --- Main Extraction Entry Points ---
+
+def extract_result_universal(file_path, use_preprocessing=True, verbose=False, page_workers=None) -> ExtractionResult:
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext != '.pdf' and ext not in _IMAGE_EXTS:
         raise ValueError(f"Unsupported file type: {file_path}")
 
+    if verbose:
+        print(f"\n{'='*80}", flush=True)
+        print(f"🔍 OCR EXTRACTION: {os.path.basename(file_path)}", flush=True)
+        print(f"{'='*80}", flush=True)
+
+    with open(file_path, "rb") as fh:
+        file_bytes = fh.read()
+    return _extract_result(file_bytes, ext, use_preprocessing, verbose, page_workers)
+
+
+def extract_text_universal(file_path, use_preprocessing=True, verbose=False, page_workers=None):
+    return extract_result_universal(file_path, use_preprocessing, verbose, page_workers).text
 
-def extract_text_from_bytes(file_bytes, file_extension, use_preprocessing=True, verbose=False):
-    ext = file_extension.lower()
-    if not ext.startswith('.'):
-        ext = '.' + ext
+
+def extract_result_from_bytes(file_bytes, file_extension, use_preprocessing=True, verbose=False,
+                              page_workers=None, deadline=None) -> ExtractionResult:
+    """
+    In-memory extraction returning an ExtractionResult (text, per-page results,
+    path taken, stage timings, confidence). Consults the OCR cache first; a
+    cache hit carries the text only.
+
+    deadline is an absolute time.time() value (comparable across processes),
+    tightened by OCR_FILE_BUDGET_S. Past it, no further pages are OCR'd and
+    the result comes back partial; partial results are never cached — finish
+    them with complete_extraction().
+    """
+    ext    = _normalize_ext(file_extension)
+    key    = cache_key(file_bytes, f"{EXTRACTOR_VERSION}-{'pre' if use_preprocessing else 'raw'}")
+    cached = cache_get(key)
+    if cached is not None:
+        if verbose:
+            print(f"\n♻️  OCR cache hit ({key[:12]}…): {len(cached)} chars", flush=True)
+        return _cached_result(cached, ext)
 
     if verbose:
         print(f"\n{'='*80}\n🔍 OCR EXTRACTION (in-memory, {ext})\n{'='*80}", flush=True)
 
-    if ext == '.pdf':
-        if verbose:
-            print("📄 PDF (bytes) detected", flush=True)
-        try:
-            if verbose:
-                print("  → Trying pdfplumber...", flush=True)
-            with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                text = "".join((p.extract_text() or "") + "\n\n" for p in pdf.pages)
-                if text.strip() and len(text.strip()) > 50:
-                    if verbose:
-                        print(f"  ✅ pdfplumber: {len(text)} chars\n{'='*80}\n", flush=True)
-                    return text.strip()
-                if verbose:
-                    print(f"  ⚠️ pdfplumber: {len(text.strip())} chars, switching to OCR", flush=True)
-        except Exception as e:
-            if verbose:
-                print(f"  ⚠️ pdfplumber failed: {e}", flush=True)
+    result = _extract_result(
+        file_bytes, ext, use_preprocessing, verbose, page_workers, _file_deadline(deadline)
+    )
+    if not result.error and not result.partial:
+        cache_put(key, result.text)
+    return result
 
-        if verbose:
-            print("  → Image-based PDF — OCR one page at a time...", flush=True)
-        try:
-            from pdf2image import convert_from_bytes
-            probe = convert_from_bytes(file_bytes, dpi=20)
-            num_pages = len(probe); del probe; gc.collect()
-            if verbose:
-                print(f"     {num_pages} page(s) detected", flush=True)
 
-            all_text = []
-            for i in range(1, num_pages + 1):
-                if verbose:
-                    print(f"\n  📄 Page {i}/{num_pages}...", flush=True)
-                pages = convert_from_bytes(file_bytes, dpi=150, first_page=i, last_page=i)
-                if not pages:
+def complete_extraction(file_bytes, file_extension, partial: ExtractionResult,
+                        use_preprocessing=True, verbose=False) -> ExtractionResult:
+    """
+    Finish a partial result without a deadline: OCR only its pending pages,
+    merge them in page order, and cache the now-complete text.
+    """
+    if not partial.partial:
+        return partial
+    ext = _normalize_ext(file_extension)
+    if ext != '.pdf':
+        return extract_result_from_bytes(file_bytes, ext, use_preprocessing, verbose)
+
+    # Continue the clock from the partial run so total_s covers both passes.
+    started = time.perf_counter() - partial.timings.get("total_s", 0.0)
+    try:
+        partial.pages += _ocr_pdf_pages(file_bytes, partial.pending_pages, use_preprocessing, verbose)
+    except Exception as e:
+        partial.error = f"{type(e).__name__}: {e}"
+        return partial
+    partial.partial, partial.pending_pages = False, []
+    _finish(partial, started, verbose)
+    cache_put(
+        cache_key(file_bytes, f"{EXTRACTOR_VERSION}-{'pre' if use_preprocessing else 'raw'}"),
+        partial.text,
+    )
+    return partial
+
+
+def extract_text_from_bytes(file_bytes, file_extension, use_preprocessing=True, verbose=False,
+                            page_workers=None):
+    """Text only. A string cannot say "partial", so budgeted-out pages are finished here."""
+    result = extract_result_from_bytes(
+        file_bytes, file_extension, use_preprocessing, verbose, page_workers
+    )
+    return complete_extraction(file_bytes, file_extension, result, use_preprocessing, verbose).text
+
+
+def extract_results_from_bytes_batch(items, use_preprocessing=True, verbose=False, deadline=None) -> list:
+    """
+    Extract several files in one pass so OCR recognition batches span files.
+    deadline / OCR_FILE_BUDGET_S behave as in extract_result_from_bytes, with
+    the file budget applied to the batch as a whole.
+
+    items: sequence of (file_bytes, file_extension). Returns a list of
+    (ExtractionResult, error) pairs in input order, exactly one of which is
+    set. Cache lookups, per-page text-layer routing and postprocessing match
+    extract_result_from_bytes; only OCR'd pages are pooled, OCR_BATCH_MAX_PAGES
+    at a time, and pages PaddleOCR leaves empty still get the EasyOCR fallback.
+    """
+    version = f"{EXTRACTOR_VERSION}-{'pre' if use_preprocessing else 'raw'}"
+
+    deadline = _file_deadline(deadline)
+    outcomes = [None] * len(items)
+    files    = {}   # index → (cache key, ExtractionResult, started, pages to OCR)
+    queued   = []   # ((index, page_no), img_array, render_s)
+
+    def _flush():
+        # Never raises: a failure fails every file with pages in this batch
+        # (not just the file whose page filled it), and the batch is dropped.
+        if not queued:
+            return
+        try:
+            started = time.perf_counter()
+            batch   = _paddle_lines_batch([img for _, img, _ in queued], verbose)
+            share   = (time.perf_counter() - started) / len(queued)
+            for ((idx, page_no), img, render_s), lines in zip(queued, batch):
+                if idx not in files:
                     continue
-                img_array = np.array(pages.convert("RGB"))
-                del pages; gc.collect()
-                if verbose:
-                    print(f"     raw shape: {img_array.shape}", flush=True)
-                page_text = _ocr_best_from_array(img_array, use_preprocessing, verbose)
-                del img_array; gc.collect()
-                if page_text:
-                    all_text.append(page_text)
-
-            combined = "\n\n".join(all_text)
-            if combined.strip():
-                cleaned = postprocess_text(combined)
-                if verbose:
-                    print(f"\n  ✅ {len(cleaned)} chars from {len(all_text)}/{num_pages} pages\n{'='*80}\n", flush=True)
-                return cleaned
-            if verbose:
-                print(f"\n  ❌ No text extracted\n{'='*80}\n", flush=True)
-            return ""
+                page = _ocr_page(page_no, img, render_s, use_preprocessing, verbose, paddle_lines=lines)
+                page.ocr_s += share
+                files[idx][1].pages.append(page)
         except Exception as e:
-            if verbose:
-                print(f"\n  ❌ PDF OCR failed: {e}\n{'='*80}\n", flush=True)
-            return ""
+            for idx in {idx for (idx, _), _, _ in queued}:
+                if files.pop(idx, None) is not None:
+                    outcomes[idx] = (None, e)
+        finally:
+            queued.clear()
+            gc.collect()
 
-    image_exts = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.webp')
-    if ext in image_exts:
-        if verbose:
-            print("📸 Image (bytes) detected", flush=True)
+    def _enqueue(idx, page_no, img, render_s):
+        queued.append(((idx, page_no), img, render_s))
+        if len(queued) >= _OCR_BATCH_MAX_PAGES:
+            _flush()
+
+    for idx, (file_bytes, file_extension) in enumerate(items):
+        ext    = _normalize_ext(file_extension)
+        key    = cache_key(file_bytes, version)
+        cached = cache_get(key)
+        if cached is not None:
+            outcomes[idx] = (_cached_result(cached, ext), None)
+            continue
+
+        started = time.perf_counter()
         try:
-            img       = Image.open(io.BytesIO(file_bytes)).convert("RGB")
-            img_array = np.array(img); del img; gc.collect()
-            text = _ocr_best_from_array(img_array, use_preprocessing, verbose)
-            del img_array; gc.collect()
-            if text:
-                cleaned = postprocess_text(text)
-                if verbose:
-                    print(f"  ✅ Final text: {len(cleaned)} chars\n{'='*80}\n", flush=True)
-                return cleaned
-            if verbose:
-                print(f"\n  ❌ No text extracted\n{'='*80}\n", flush=True)
-            return ""
+            if ext == '.pdf':
+                result = ExtractionResult(text="", file_type="pdf")
+                text_pages, ocr_pages = _classify_pdf_pages(file_bytes, verbose)
+                files[idx] = (key, result, started, ocr_pages)
+                result.timings["text_layer_s"] = time.perf_counter() - started
+                result.pages = text_pages
+                if ocr_pages:
+                    pages = _iter_pdf_pages(file_bytes, ocr_pages)
+                    while not _expired(deadline) and idx in files:
+                        item = next(pages, None)
+                        if item is None:
+                            break
+                        _enqueue(idx, *item)
+                        del item
+                    pages.close()
+            elif ext in _IMAGE_EXTS:
+                files[idx] = (key, ExtractionResult(text="", file_type="image"), started, [1])
+                if not _expired(deadline):
+                    img = np.array(Image.open(io.BytesIO(file_bytes)).convert("RGB"))
+                    _enqueue(idx, 1, img, time.perf_counter() - started)
+            else:
+                raise ValueError(f"Unsupported file extension: {file_extension}")
         except Exception as e:
-            if verbose:
-                print(f"\n  ❌ Image processing failed: {e}\n{'='*80}\n", flush=True)
-            return ""
+            files.pop(idx, None)
+            outcomes[idx] = (None, e)
+
+    _flush()
+
+    for idx, (key, result, started, ocr_pages) in files.items():
+        _mark_pending(result, ocr_pages, verbose)
+        _finish(result, started, verbose)
+        if not result.partial:
+            cache_put(key, result.text)
+        outcomes[idx] = (result, None)
+
+    return outcomes
+
 
-    raise ValueError(f"Unsupported file extension: {file_extension}")
+def extract_texts_from_bytes_batch(items, use_preprocessing=True, verbose=False) -> list:
+    """String form of extract_results_from_bytes_batch: (text, error) per file.
+    Partial results are completed first, as in extract_text_from_bytes."""
+    outcomes = []
+    for (file_bytes, file_extension), (result, exc) in zip(
+        items, extract_results_from_bytes_batch(items, use_preprocessing, verbose)
+    ):
+        if result is not None:
+            result = complete_extraction(file_bytes, file_extension, result, use_preprocessing, verbose)
+        outcomes.append((result.text if result is not None else None, exc))
+    return outcomes
 
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1:
-        test_file = sys.argv
+        test_file = sys.argv[1]
         print(f"\nTesting OCR on: {test_file}\n")
-        result = extract_text_universal(test_file, use_preprocessing=True, verbose=True)
-        print(f"\n{'='*80}\nEXTRACTED TEXT:\n{'='*80}\n{result}\n{'='*80}\n")
+        result = extract_result_universal(test_file, use_preprocessing=True, verbose=True)
+        print(f"\n{'='*80}\nEXTRACTED TEXT:\n{'='*80}\n{result.text}\n{'='*80}\n")
+        print(f"STATS: {result.to_stats()}")
     else:
-        print("Usage: python extractor_OCR.py <image_or_pdf_file>")
\ No newline at end of file
+        print("Usage: python extractor_OCR.py <image_or_pdf_file>")
@@ -0,0 +1,200 @@
+"""
+Process-wide gateway for OpenAI calls.
+
+Callers used to build a fresh ``AsyncOpenAI`` per call and drive it with
+``asyncio.run``, so every LLM request paid for a new event loop, a TCP + TLS
+handshake and a cold connection pool. The gateway instead owns, per process:
+
+  * one event loop running on a daemon thread ("llm-gateway");
+  * one ``httpx.AsyncClient`` with a bounded keep-alive pool, HTTP/2 when the
+    ``h2`` package is available, so concurrent calls multiplex over a few
+    long-lived connections;
+  * one ``AsyncOpenAI`` on top of it. Per-call timeouts / retries go through
+    ``client.with_options(...)``, which shares the same HTTP client.
+
+Sync code calls ``gateway.run(coro)``; async code calls ``await gateway.arun(coro)``.
+Coroutines must use ``gateway.client`` (bound to the gateway loop). Calling
+``run`` from the gateway loop itself raises RuntimeError instead of deadlocking.
+
+Connection reuse is tracked with httpcore trace events (new TCP connections,
+TLS handshakes, HTTP version per response) and exported via ``stats()`` for
+/api/metrics.
+
+Configuration (environment):
+  LLM_HTTP2              "1" (default) to negotiate HTTP/2; "0" forces HTTP/1.1
+  LLM_MAX_CONNECTIONS    connection pool size (default 20)
+  LLM_KEEPALIVE_S        idle keep-alive expiry in seconds (default 60)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Awaitable, Optional
+
+import httpx
+
+OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+LLM_HTTP2: bool            = os.getenv("LLM_HTTP2", "1") == "1"
+LLM_MAX_CONNECTIONS: int   = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_S: float     = float(os.getenv("LLM_KEEPALIVE_S", "60"))
+
+
+class LLMGateway:
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="llm-gateway", daemon=True
+        )
+        self._thread.start()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests":        0,
+            "errors":          0,
+            "in_flight":       0,
+            "new_connections": 0,
+            "tls_handshakes":  0,
+            "http2_responses": 0,
+            "total_s":         0.0,
+        }
+        self.http2  = False
+        self.client = self.run(self._build_client())
+
+    # --- Setup ---
+
+    async def _build_client(self):
+        from openai import AsyncOpenAI
+
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_S,
+        )
+        try:
+            transport = httpx.AsyncHTTPTransport(http2=LLM_HTTP2, limits=limits)
+            self.http2 = LLM_HTTP2
+        except ImportError:
+            print("⚠️ LLM gateway: h2 not installed — using HTTP/1.1 keep-alive", flush=True)
+            transport = httpx.AsyncHTTPTransport(limits=limits)
+
+        http_client = httpx.AsyncClient(
+            transport=_CountingTransport(transport, self), timeout=90.0
+        )
+        print(
+            f"✅ LLM gateway ready (HTTP/{'2' if self.http2 else '1.1'}, "
+            f"pool {LLM_MAX_CONNECTIONS}, pid {os.getpid()})",
+            flush=True,
+        )
+        return AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+
+    # --- Connection tracking ---
+
+    def _count(self, key: str, amount=1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    async def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self._count("new_connections")
+        elif event == "connection.start_tls.complete":
+            self._count("tls_handshakes")
+
+    # --- Call APIs ---
+
+    def run(self, coro: Awaitable):
+        """Run a coroutine on the gateway loop and block for its result."""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("LLMGateway.run() called from the gateway loop; use arun()")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def arun(self, coro: Awaitable):
+        """Await a coroutine on the gateway loop from any event loop."""
+        if threading.current_thread() is self._thread:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def submit(self, coro: Awaitable):
+        """Schedule a coroutine on the gateway loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # --- Metrics ---
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            s = dict(self._stats)
+        completed = s["requests"] - s["in_flight"]
+        return {
+            "pid":                os.getpid(),
+            "http2":              self.http2,
+            "max_connections":    LLM_MAX_CONNECTIONS,
+            "requests":           s["requests"],
+            "in_flight":          s["in_flight"],
+            "errors":             s["errors"],
+            "new_connections":    s["new_connections"],
+            "tls_handshakes":     s["tls_handshakes"],
+            "reused_connections": max(0, s["requests"] - s["new_connections"]),
+            "reuse_ratio":        round(1 - s["new_connections"] / s["requests"], 3) if s["requests"] else None,
+            "http2_responses":    s["http2_responses"],
+            "avg_latency_ms":     round(1000 * s["total_s"] / completed, 1) if completed else None,
+        }
+
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled httpx transport to count requests, failures and new connections."""
+
+    def __init__(self, inner, gateway: LLMGateway):
+        self._inner   = inner
+        self._gateway = gateway
+
+    async def handle_async_request(self, request):
+        gateway = self._gateway
+        request.extensions["trace"] = gateway._trace
+        gateway._count("requests")
+        gateway._count("in_flight")
+        started = time.perf_counter()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except Exception:
+            gateway._count("errors")
+            raise
+        finally:
+            gateway._count("in_flight", -1)
+            gateway._count("total_s", time.perf_counter() - started)
+        if response.extensions.get("http_version") == b"HTTP/2":
+            gateway._count("http2_responses")
+        if response.status_code >= 400:
+            gateway._count("errors")
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def _forget_gateway_in_child() -> None:
+    # The loop thread does not survive fork; children build their own gateway.
+    global _gateway, _gateway_lock
+    _gateway = None
+    _gateway_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_gateway_in_child)
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def gateway_stats() -> Optional[dict]:
+    """Stats of this process's gateway, or None if no LLM call has been made yet."""
+    return _gateway.stats() if _gateway is not None else None
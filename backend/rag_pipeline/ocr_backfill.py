@@ -0,0 +1,104 @@
+"""
+Background completion of partial OCR results.
+
+When a time budget cuts an extraction short (see OCR_FILE_BUDGET_S /
+OCR_REQUEST_BUDGET_S), the request keeps the pages recognised so far and
+hands the file here. A single daemon thread per process submits the
+pending pages to the OCR pool (``ocr_pool.complete_partial``, so the models
+stay in the memory-capped workers and out of the web process; the
+completion also stores the full text in the OCR cache) and then calls the
+job's ``on_complete(result)`` so the caller can update its own records.
+
+The queue is bounded so a burst of huge scans cannot pin unbounded file
+bytes in memory; jobs that do not fit are dropped with a warning and will
+simply be re-OCR'd the next time the file is processed.
+
+Configuration (environment):
+  OCR_BACKFILL_MAX_QUEUE  queued files per process (default 16)
+"""
+
+import os
+import queue
+import threading
+import traceback
+from typing import Callable, Optional
+
+OCR_BACKFILL_MAX_QUEUE: int = int(os.getenv("OCR_BACKFILL_MAX_QUEUE", "16"))
+
+_jobs: "queue.Queue" = queue.Queue(maxsize=OCR_BACKFILL_MAX_QUEUE)
+_pending: set = set()
+_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+_counters = {"queued": 0, "completed": 0, "failed": 0, "dropped": 0}
+
+
+def _run() -> None:
+    from rag_pipeline.ocr_pool import complete_partial
+
+    while True:
+        job_key, file_bytes, file_ext, partial, on_complete = _jobs.get()
+        try:
+            print(
+                f"🔁 OCR backfill: {job_key} ({len(partial.pending_pages)} pending page(s))",
+                flush=True,
+            )
+            result = complete_partial(file_bytes, file_ext, partial)
+            if result.partial or result.error:
+                raise RuntimeError(result.error or "extraction still partial")
+            if on_complete is not None:
+                on_complete(result)
+            with _lock:
+                _counters["completed"] += 1
+            print(f"✅ OCR backfill done: {job_key} ({len(result.text)} chars)", flush=True)
+        except Exception as e:
+            with _lock:
+                _counters["failed"] += 1
+            print(f"❌ OCR backfill failed: {job_key}: {e}", flush=True)
+            traceback.print_exc()
+        finally:
+            with _lock:
+                _pending.discard(job_key)
+            _jobs.task_done()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_run, name="ocr-backfill", daemon=True)
+        _worker.start()
+
+
+def schedule_backfill(
+    job_key: str,
+    file_bytes: bytes,
+    file_ext: str,
+    partial,
+    on_complete: Optional[Callable] = None,
+) -> bool:
+    """
+    Queue a partial ExtractionResult for completion. Returns False if the job
+    is already pending or the queue is full.
+    """
+    with _lock:
+        if job_key in _pending:
+            return False
+        _ensure_worker()
+        try:
+            _jobs.put_nowait((job_key, file_bytes, file_ext, partial, on_complete))
+        except queue.Full:
+            _counters["dropped"] += 1
+            print(f"⚠️ OCR backfill queue full — dropping {job_key}", flush=True)
+            return False
+        _pending.add(job_key)
+        _counters["queued"] += 1
+    return True
+
+
+def is_pending(job_key: str) -> bool:
+    with _lock:
+        return job_key in _pending
+
+
+def backfill_stats() -> dict:
+    with _lock:
+        return dict(_counters, pending=len(_pending))
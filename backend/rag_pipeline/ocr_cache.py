@@ -0,0 +1,261 @@
+"""
+Content-addressed cache for OCR output.
+
+Entries are keyed by SHA-256 of the raw file bytes plus the extractor version
+tag, so the same report re-uploaded under another name, shared across family
+profiles, or re-read by the lab / insurance / bills handlers is recognised
+once. Bumping ``EXTRACTOR_VERSION`` in ``extractor_OCR`` orphans old entries,
+which then age out through normal eviction.
+
+Only complete, non-empty extractions are stored; errors and empty results are
+never cached so a transient failure is retried on the next request.
+
+Configuration (environment):
+  OCR_CACHE_BACKEND    "disk" (default), "supabase" or "none"
+  OCR_CACHE_DIR        directory for the disk backend (default "ocr_cache")
+  OCR_CACHE_MAX_MB     disk budget; least-recently-read files are evicted (default 512)
+  OCR_CACHE_MAX_ROWS   row budget for the Supabase table "ocr_text_cache" (default 5000)
+  OCR_CACHE_SWEEP_EVERY  puts between eviction sweeps (directory walk / row count) (default 50)
+  OCR_CACHE_TOUCH_S      minimum seconds between last_accessed_at updates per Supabase row (default 3600)
+
+The disk backend keeps a running byte total and only walks the directory when
+that estimate exceeds the budget (then trims to 90% of it) or every
+OCR_CACHE_SWEEP_EVERY puts (other
+workers write to the same directory). The Supabase backend counts rows on the
+same sampled schedule, and refreshes last_accessed_at at most once per
+OCR_CACHE_TOUCH_S per key, so LRU order is approximate to that granularity.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+OCR_CACHE_BACKEND: str  = os.getenv("OCR_CACHE_BACKEND", "disk").lower()
+OCR_CACHE_DIR: str      = os.getenv("OCR_CACHE_DIR", "ocr_cache")
+OCR_CACHE_MAX_MB: int   = int(os.getenv("OCR_CACHE_MAX_MB", "512"))
+OCR_CACHE_MAX_ROWS: int = int(os.getenv("OCR_CACHE_MAX_ROWS", "5000"))
+OCR_CACHE_SWEEP_EVERY: int = max(1, int(os.getenv("OCR_CACHE_SWEEP_EVERY", "50")))
+OCR_CACHE_TOUCH_S: float   = float(os.getenv("OCR_CACHE_TOUCH_S", "3600"))
+
+_TABLE = "ocr_text_cache"
+
+
+def cache_key(file_bytes: bytes, version: str) -> str:
+    """sha256(file bytes) + extractor version → cache key."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    return f"{digest}:{version}"
+
+
+# --- Disk backend ---
+
+class DiskOCRCache:
+    """One UTF-8 text file per entry; mtime doubles as last-access time for LRU eviction."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root      = root
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+        self._total: Optional[int] = None   # bytes on disk as of the last sweep, plus our puts since
+        self._puts     = 0
+
+    def _path(self, key: str) -> str:
+        name = key.replace(":", "_")
+        return os.path.join(self.root, name[:2], f"{name}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                text = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            self._puts += 1
+            if self._total is not None:
+                self._total += os.path.getsize(path) - replaced
+            sweep = (
+                self._total is None
+                or self._total > self.max_bytes
+                or self._puts % OCR_CACHE_SWEEP_EVERY == 0
+            )
+        if sweep:
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries, total = [], 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for fn in filenames:
+                    if not fn.endswith(".txt"):
+                        continue
+                    fp = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(fp)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, fp))
+                    total += st.st_size
+            if total > self.max_bytes:
+                # evict down to 90% so a full cache is not re-walked on the very next put
+                target = self.max_bytes * 9 // 10
+                entries.sort()
+                for _, size, fp in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(fp)
+                        total -= size
+                    except FileNotFoundError:
+                        pass
+            self._total = total
+
+
+# --- Supabase backend ---
+
+class SupabaseOCRCache:
+    """Rows in public.ocr_text_cache; last_accessed_at drives LRU eviction."""
+
+    def __init__(self, max_rows: int):
+        from supabase_helper import supabase
+        self.client   = supabase
+        self.max_rows = max_rows
+        self._lock    = threading.Lock()
+        self._touched: dict = {}   # cache_key -> time.monotonic() of our last last_accessed_at update
+        self._puts    = 0
+
+    def get(self, key: str) -> Optional[str]:
+        result = (
+            self.client.table(_TABLE)
+            .select("extracted_text")
+            .eq("cache_key", key)
+            .limit(1)
+            .execute()
+        )
+        rows = result.data or []
+        if not rows:
+            return None
+        if self._should_touch(key):
+            try:
+                self.client.table(_TABLE).update(
+                    {"last_accessed_at": _utc_now()}
+                ).eq("cache_key", key).execute()
+            except Exception:
+                pass
+        return rows[0].get("extracted_text")
+
+    def _should_touch(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            last = self._touched.get(key)
+            if last is not None and now - last < OCR_CACHE_TOUCH_S:
+                return False
+            if len(self._touched) >= max(self.max_rows, 1000):
+                self._touched.clear()
+            self._touched[key] = now
+            return True
+
+    def put(self, key: str, text: str) -> None:
+        digest, _, version = key.partition(":")
+        now = _utc_now()
+        self.client.table(_TABLE).upsert(
+            {
+                "cache_key":         key,
+                "content_sha256":    digest,
+                "extractor_version": version,
+                "extracted_text":    text,
+                "char_count":        len(text),
+                "last_accessed_at":  now,
+            },
+            on_conflict="cache_key",
+        ).execute()
+        with self._lock:
+            self._touched[key] = time.monotonic()
+            self._puts += 1
+            sweep = (self._puts - 1) % OCR_CACHE_SWEEP_EVERY == 0
+        if sweep:
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.max_rows <= 0:
+            return
+        count = (
+            self.client.table(_TABLE).select("cache_key", count="exact").limit(1).execute().count
+            or 0
+        )
+        excess = count - self.max_rows
+        if excess <= 0:
+            return
+        oldest = (
+            self.client.table(_TABLE)
+            .select("cache_key")
+            .order("last_accessed_at")
+            .limit(excess)
+            .execute()
+        )
+        keys = [r["cache_key"] for r in (oldest.data or [])]
+        if keys:
+            self.client.table(_TABLE).delete().in_("cache_key", keys).execute()
+
+
+def _utc_now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+# --- Public API ---
+
+@lru_cache(maxsize=1)
+def get_ocr_cache():
+    """Return the configured cache backend, or None when caching is disabled."""
+    try:
+        if OCR_CACHE_BACKEND == "disk":
+            return DiskOCRCache(OCR_CACHE_DIR, OCR_CACHE_MAX_MB * 1024 * 1024)
+        if OCR_CACHE_BACKEND == "supabase":
+            return SupabaseOCRCache(OCR_CACHE_MAX_ROWS)
+    except Exception as e:
+        print(f"⚠️ OCR cache ({OCR_CACHE_BACKEND}) unavailable: {e}", flush=True)
+    return None
+
+
+def cache_get(key: str) -> Optional[str]:
+    """Cached text for key, or None. Backend errors are reported and treated as a miss."""
+    cache = get_ocr_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        print(f"⚠️ OCR cache read failed: {e}", flush=True)
+        return None
+
+
+def cache_put(key: str, text: str) -> None:
+    """Store a complete extraction. Empty text is skipped; errors never reach the caller."""
+    cache = get_ocr_cache()
+    if cache is None or not text:
+        return
+    try:
+        cache.put(key, text)
+    except Exception as e:
+        print(f"⚠️ OCR cache write failed: {e}", flush=True)
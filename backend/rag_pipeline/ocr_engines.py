@@ -0,0 +1,295 @@
+"""
+Lazy, fork-aware pool of OCR engines.
+
+PaddleOCR used to be constructed at import time of ``extractor_OCR``. That
+cost every Gunicorn worker a model load (and its memory) even when it never
+served an upload. It also left one predictor shared by every request thread.
+The manager here instead:
+
+  * builds engines on first checkout (nothing is loaded at import);
+  * keeps up to OCR_ENGINE_POOL_SIZE PaddleOCR engines, each used by one
+    thread at a time via ``with manager.paddle() as engine:`` — threads wait
+    for an idle engine once the pool is full;
+  * can ``preload()`` engines in the Gunicorn master before fork (see
+    gunicorn.conf.py / OCR_PRELOAD), so model weights are shared
+    copy-on-write by all workers;
+  * lazily builds a standalone text-detection / text-recognition pair for
+    cross-image batched recognition (``with manager.det_rec() as models:``);
+  * records per-engine load time and process RSS for /api/metrics.
+
+After a fork the child rebuilds its locks and keeps only the engines that
+were idle at fork time; any that were checked out belong to the parent.
+
+Configuration (environment):
+  OCR_ENGINE_POOL_SIZE  PaddleOCR engines per process (default 1)
+  OCR_PRELOAD           "1" to build engines in the Gunicorn master before fork
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+OCR_ENGINE_POOL_SIZE: int = max(1, int(os.getenv("OCR_ENGINE_POOL_SIZE", "1")))
+OCR_PRELOAD: bool         = os.getenv("OCR_PRELOAD", "0") == "1"
+
+_CHECKOUT_POLL_S = 0.5
+
+os.environ.setdefault("GLOG_minloglevel", "3")
+os.environ.setdefault("PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK", "True")
+
+# Use mobile_det to prevent OOM issues on limited RAM environments
+_PADDLE_KWARGS = {
+    "use_textline_orientation": True,
+    "lang": "en",
+    "text_det_thresh": 0.3,
+    "text_det_box_thresh": 0.5,
+    "text_det_unclip_ratio": 2.0,
+    "text_recognition_batch_size": 6,
+    "enable_mkldnn": False,
+    "text_detection_model_name": "PP-OCRv5_mobile_det",
+}
+_PADDLE_LEGACY_KWARGS = {
+    "use_angle_cls": True,
+    "lang": "en",
+    "det_db_thresh": 0.3,
+    "det_db_box_thresh": 0.5,
+    "det_db_unclip_ratio": 2.0,
+    "rec_batch_num": 6,
+}
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def _build_paddle():
+    from paddleocr import PaddleOCR
+
+    for kwargs in (_PADDLE_KWARGS, _PADDLE_LEGACY_KWARGS):
+        try:
+            return PaddleOCR(**kwargs)
+        except TypeError:
+            continue
+    raise RuntimeError(
+        "No compatible PaddleOCR API signature found. "
+        "Try: pip install --upgrade paddleocr"
+    )
+
+
+class OCREngineManager:
+    def __init__(self, pool_size: int = OCR_ENGINE_POOL_SIZE):
+        self.pool_size = pool_size
+        self._init_process_state(engines=[])
+        self._paddle_error: Optional[str] = None
+        self._easyocr_reader = None
+        self._easyocr_checked = False
+        self._det_rec = None
+        self._det_rec_checked = False
+        self._load_events: list[dict] = []
+
+    def _init_process_state(self, engines: list) -> None:
+        self._lock         = threading.Lock()
+        self._easyocr_lock = threading.Lock()
+        self._easyocr_run  = threading.Lock()
+        self._det_rec_lock = threading.Lock()
+        self._idle         = queue.LifoQueue()
+        for engine in engines:
+            self._idle.put(engine)
+        self._created   = len(engines)
+        self._in_use    = 0
+        self._checkouts = 0
+        self._wait_s    = 0.0
+
+    def _after_fork_in_child(self) -> None:
+        self._init_process_state(engines=list(self._idle.queue))
+
+    # --- Loading ---
+
+    def _record_load(self, engine: str, started: float, rss_before) -> None:
+        event = {
+            "engine":        engine,
+            "load_s":        round(time.perf_counter() - started, 2),
+            "rss_before_mb": rss_before,
+            "rss_after_mb":  _rss_mb(),
+            "pid":           os.getpid(),
+        }
+        self._load_events.append(event)
+        print(
+            f"✅ {engine} loaded in {event['load_s']}s "
+            f"(RSS {rss_before} → {event['rss_after_mb']} MB, pid {event['pid']})",
+            flush=True,
+        )
+
+    def _create_paddle(self):
+        started, rss_before = time.perf_counter(), _rss_mb()
+        engine = _build_paddle()
+        self._record_load("PaddleOCR", started, rss_before)
+        return engine
+
+    @property
+    def paddle_available(self) -> bool:
+        return self._paddle_error is None
+
+    def _checkout(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if not self.paddle_available:
+                return None   # the build this thread was waiting on failed
+
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                break
+            try:
+                # Bounded wait: a failed build puts nothing on the queue, so
+                # waiters re-check availability (and free slots) each pass.
+                return self._idle.get(timeout=_CHECKOUT_POLL_S)
+            except queue.Empty:
+                continue
+
+        try:
+            return self._create_paddle()
+        except Exception as e:
+            with self._lock:
+                self._created -= 1
+            self._paddle_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ PaddleOCR not available: {e}", flush=True)
+            return None
+
+    @contextmanager
+    def paddle(self):
+        """Check out a PaddleOCR engine for exclusive use; yields None if PaddleOCR is unavailable."""
+        if not self.paddle_available:
+            yield None
+            return
+
+        started = time.perf_counter()
+        engine  = self._checkout()
+        if engine is None:
+            yield None
+            return
+        with self._lock:
+            self._in_use    += 1
+            self._checkouts += 1
+            self._wait_s    += time.perf_counter() - started
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(engine)
+
+    def easyocr(self):
+        """Shared EasyOCR reader, built on first use (fallback engine; None if unavailable)."""
+        if self._easyocr_checked:
+            return self._easyocr_reader
+        with self._easyocr_lock:
+            if self._easyocr_checked:
+                return self._easyocr_reader
+            try:
+                import easyocr
+                print("🔄 Initializing EasyOCR fallback...", flush=True)
+                started, rss_before = time.perf_counter(), _rss_mb()
+                self._easyocr_reader = easyocr.Reader(['en'], gpu=False)
+                self._record_load("EasyOCR", started, rss_before)
+            except Exception as e:
+                self._easyocr_reader = None
+                print(f"⚠️ EasyOCR not available: {e}", flush=True)
+            self._easyocr_checked = True
+        return self._easyocr_reader
+
+    @contextmanager
+    def det_rec(self):
+        """
+        Exclusive use of the standalone (TextDetection, TextRecognition) pair used for
+        batched recognition. Yields None when these modules are unavailable (PaddleOCR 2.x).
+        """
+        with self._det_rec_lock:
+            if not self._det_rec_checked:
+                try:
+                    from paddleocr import TextDetection, TextRecognition
+                    started, rss_before = time.perf_counter(), _rss_mb()
+                    det = TextDetection(
+                        model_name="PP-OCRv5_mobile_det",
+                        thresh=0.3,
+                        box_thresh=0.5,
+                        unclip_ratio=2.0,
+                    )
+                    rec = TextRecognition()
+                    self._det_rec = (det, rec)
+                    self._record_load("PaddleOCR det+rec", started, rss_before)
+                except Exception as e:
+                    self._det_rec = None
+                    print(f"⚠️ Batched det/rec models not available: {e}", flush=True)
+                self._det_rec_checked = True
+            yield self._det_rec
+
+    @contextmanager
+    def easyocr_lock(self):
+        """EasyOCR readers are not thread-safe; hold this around readtext()."""
+        with self._easyocr_run:
+            yield
+
+    def preload(self, count: Optional[int] = None) -> int:
+        """Build engines up front (e.g. in the Gunicorn master). Returns engines now idle."""
+        target = min(count or self.pool_size, self.pool_size)
+        while self.paddle_available:
+            with self._lock:
+                if self._created >= target:
+                    break
+                self._created += 1
+            try:
+                self._idle.put(self._create_paddle())
+            except Exception as e:
+                with self._lock:
+                    self._created -= 1
+                self._paddle_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ PaddleOCR preload failed: {e}", flush=True)
+        return self._idle.qsize()
+
+    # --- Metrics ---
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "pid":              os.getpid(),
+                "rss_mb":           _rss_mb(),
+                "pool_size":        self.pool_size,
+                "engines_created":  self._created,
+                "engines_idle":     self._idle.qsize(),
+                "engines_in_use":   self._in_use,
+                "checkouts":        self._checkouts,
+                "avg_wait_ms":      round(1000 * self._wait_s / self._checkouts, 2) if self._checkouts else 0.0,
+                "paddle_available": self.paddle_available,
+                "paddle_error":     self._paddle_error,
+                "easyocr_loaded":   self._easyocr_reader is not None,
+                "det_rec_loaded":   self._det_rec is not None,
+                "loads":            list(self._load_events),
+            }
+
+
+_manager: Optional[OCREngineManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_engine_manager() -> OCREngineManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = OCREngineManager()
+                if hasattr(os, "register_at_fork"):
+                    os.register_at_fork(after_in_child=_manager._after_fork_in_child)
+    return _manager
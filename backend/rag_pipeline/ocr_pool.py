@@ -0,0 +1,213 @@
+"""
+Multi-process OCR stage for bulk uploads.
+
+Each worker process preloads its OCR engines once in its initializer and then
+serves ``extract_result_from_bytes`` calls for the
+lifetime of the pool. Model load cost is therefore paid once per worker, not
+once per file, and results are streamed back in completion order so callers
+can start downstream work (LLM metadata extraction) on the first texts while
+the remaining files are still being recognised.
+
+With OCR_BATCH_FILES > 1, files are handed out in groups and each group goes
+through ``extract_results_from_bytes_batch`` so text-line recognition batches
+span pages of several files.
+
+Configuration (environment):
+  OCR_POOL_WORKERS          worker processes; 0/1 keeps OCR in-process (default 1)
+  OCR_BATCH_FILES           files OCR'd together per task (default 1 = one at a time)
+  OCR_REQUEST_BUDGET_S      wall-clock OCR budget for one request (default 20; 0 = unlimited).
+                            Keep it well below the gunicorn worker timeout (30 s by
+                            default) so metadata, verification and saves still fit.
+                            Files still running when it expires come back partial
+                            (see OCR_FILE_BUDGET_S in extractor_OCR for the per-file cap)
+  OCR_WORKER_MAX_MEMORY_MB  address-space cap per worker in MB; 0 = unlimited
+  OCR_POOL_START_METHOD     multiprocessing start method (default "spawn")
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, Optional, Tuple
+
+OCR_POOL_WORKERS: int         = int(os.getenv("OCR_POOL_WORKERS", "1"))
+OCR_WORKER_MAX_MEMORY_MB: int = int(os.getenv("OCR_WORKER_MAX_MEMORY_MB", "0"))
+OCR_POOL_START_METHOD: str    = os.getenv("OCR_POOL_START_METHOD", "spawn")
+OCR_BATCH_FILES: int          = max(1, int(os.getenv("OCR_BATCH_FILES", "1")))
+OCR_REQUEST_BUDGET_S: float   = float(os.getenv("OCR_REQUEST_BUDGET_S", "20"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+# --- Worker side ---
+
+def _apply_memory_cap(max_memory_mb: int) -> None:
+    """Cap the worker's address space so one runaway scan cannot OOM the host."""
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"⚠️ OCR worker {os.getpid()}: memory cap not applied: {e}", flush=True)
+
+
+def _worker_init(max_memory_mb: int) -> None:
+    _apply_memory_cap(max_memory_mb)
+    from rag_pipeline.ocr_engines import get_engine_manager
+    get_engine_manager().preload()
+    print(f"✅ OCR worker {os.getpid()} ready", flush=True)
+
+
+def _ocr_unit(files: list, deadline: Optional[float] = None) -> list:
+    """OCR a group of (file_bytes, file_ext); returns (ExtractionResult, error) per file in order."""
+    if len(files) == 1:
+        from rag_pipeline.extractor_OCR import extract_result_from_bytes
+        file_bytes, file_ext = files[0]
+        try:
+            return [(extract_result_from_bytes(file_bytes, file_ext, deadline=deadline), None)]
+        except Exception as exc:
+            return [(None, exc)]
+
+    from rag_pipeline.extractor_OCR import extract_results_from_bytes_batch
+    return extract_results_from_bytes_batch(files, deadline=deadline)
+
+
+def _complete_unit(file_bytes: bytes, file_ext: str, partial):
+    from rag_pipeline.extractor_OCR import complete_extraction
+    return complete_extraction(file_bytes, file_ext, partial)
+
+
+# --- Pool management ---
+
+def get_ocr_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared process pool, creating it on first use. None = in-process mode."""
+    global _pool
+    if OCR_POOL_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            ctx = multiprocessing.get_context(OCR_POOL_START_METHOD)
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_POOL_WORKERS,
+                mp_context=ctx,
+                initializer=_worker_init,
+                initargs=(OCR_WORKER_MAX_MEMORY_MB,),
+            )
+            print(
+                f"🔄 OCR process pool started: {OCR_POOL_WORKERS} workers "
+                f"(memory cap: {OCR_WORKER_MAX_MEMORY_MB or 'none'} MB)",
+                flush=True,
+            )
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_ocr_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# --- Public API ---
+
+def request_deadline() -> Optional[float]:
+    """Absolute time.time() deadline for a request starting now, or None if unbudgeted."""
+    return time.time() + OCR_REQUEST_BUDGET_S if OCR_REQUEST_BUDGET_S > 0 else None
+
+
+def iter_ocr_results(
+    items: Iterable[Tuple[object, bytes, str]],
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[object, Optional["ExtractionResult"], Optional[Exception]]]:
+    """
+    OCR every (key, file_bytes, file_ext) item and yield (key, result, error)
+    in completion order, where result is an extractor_OCR.ExtractionResult.
+    Exactly one of result / error is set per item.
+
+    deadline (time.time() epoch, shared with worker processes) stops OCR of
+    further pages once passed; affected files come back with result.partial
+    set and their pending pages listed.
+
+    Files caught in a worker crash (e.g. the memory cap was hit inside native
+    code) are retried once on a fresh pool before being reported as failed.
+
+    File bytes are dropped as soon as their unit's results are yielded, so a
+    caller that does not keep its own references frees each upload early.
+    """
+    items = list(items)
+    units = [items[i:i + OCR_BATCH_FILES] for i in range(0, len(items), OCR_BATCH_FILES)]
+    del items
+    pool  = get_ocr_pool()
+
+    if pool is None:
+        for unit in units:
+            outcomes = _ocr_unit([(file_bytes, file_ext) for _, file_bytes, file_ext in unit], deadline)
+            for (key, _, _), (result, exc) in zip(unit, outcomes):
+                yield key, result, exc
+            unit.clear()
+        return
+
+    pending = units
+    for attempt in (1, 2):
+        broken = []
+        futures = {
+            pool.submit(_ocr_unit, [(file_bytes, file_ext) for _, file_bytes, file_ext in unit], deadline): unit
+            for unit in pending
+        }
+        for future in as_completed(futures):
+            unit = futures[future]
+            try:
+                outcomes = future.result()
+            except BrokenProcessPool as exc:
+                if attempt == 1:
+                    broken.append(unit)
+                    continue
+                outcomes = [(None, exc)] * len(unit)
+            except Exception as exc:
+                outcomes = [(None, exc)] * len(unit)
+            for (key, _, _), (result, exc) in zip(unit, outcomes):
+                yield key, result, exc
+            unit.clear()
+
+        if not broken:
+            return
+        print(f"⚠️ OCR pool crashed — retrying {len(broken)} task(s) on a fresh pool", flush=True)
+        _reset_pool(pool)
+        pool    = get_ocr_pool()
+        pending = broken
+
+
+def complete_partial(file_bytes: bytes, file_ext: str, partial):
+    """
+    OCR the pending pages of a partial ExtractionResult on the pool (in-process
+    when there is none) and return the completed result. A worker crash is
+    retried once on a fresh pool.
+    """
+    pool = get_ocr_pool()
+    if pool is None:
+        return _complete_unit(file_bytes, file_ext, partial)
+
+    for attempt in (1, 2):
+        try:
+            return pool.submit(_complete_unit, file_bytes, file_ext, partial).result()
+        except BrokenProcessPool:
+            if attempt == 2:
+                raise
+            print("⚠️ OCR pool crashed — retrying backfill on a fresh pool", flush=True)
+            _reset_pool(pool)
+            pool = get_ocr_pool()
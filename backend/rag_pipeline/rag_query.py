@@ -2,21 +2,22 @@
 RAG query pipeline module for assembling contexts and querying OpenAI.
 """
 
-import asyncio
 import os
+import queue
 import re
-from typing import Optional
+import time
+from typing import Callable, Iterator, Optional
 
 import faiss
 import numpy as np
 import tiktoken
-from openai import AsyncOpenAI
 
 from rag_pipeline.embed_store import load_index_and_chunks, EMBEDDING_DIM
 from rag_pipeline.extract_metadata import (
     extract_metadata_with_llm,
     extract_metadata_fallback,
 )
+from rag_pipeline.llm_gateway import get_llm_gateway
 
 OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
 MODEL_NAME: str = "gpt-4.1-nano"
@@ -325,27 +326,63 @@ Focus on trends and important findings. Don't list every single value."""
 
     return system_prompt, user_prompt
 
-def _make_openai_client() -> AsyncOpenAI:
-    """Create a fresh AsyncOpenAI client bound to the current event loop."""
-    return AsyncOpenAI(
-        api_key=OPENAI_API_KEY,
-        timeout=90.0,
-        max_retries=1,
-    )
+def _openai_client():
+    """Shared gateway client with this module's timeout / retry policy."""
+    return get_llm_gateway().client.with_options(timeout=90.0, max_retries=1)
 
 async def _async_call_openai(
     system_prompt: str,
     user_prompt: str,
     max_tokens: int,
 ) -> str:
-    """Execute a chat completion call using AsyncOpenAI."""
-    client = _make_openai_client()
-    try:
-        print(f"🚀 Calling OpenAI API (async SDK)...", flush=True)
-        print(f"   Model: {MODEL_NAME}", flush=True)
-        print(f"   Max output tokens: {max_tokens}", flush=True)
+    """Execute a chat completion call on the LLM gateway loop."""
+    client = _openai_client()
+    print(f"🚀 Calling OpenAI API (async SDK)...", flush=True)
+    print(f"   Model: {MODEL_NAME}", flush=True)
+    print(f"   Max output tokens: {max_tokens}", flush=True)
+
+    response = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user",   "content": user_prompt},
+        ],
+        temperature=0.1,
+        max_tokens=max_tokens,
+    )
+
+    summary: str = response.choices[0].message.content
+
+    usage = response.usage
+    print(f"   ✅ Generated: {len(summary)} chars", flush=True)
+    if usage:
+        print(
+            f"   📊 Tokens: {usage.prompt_tokens} prompt + "
+            f"{usage.completion_tokens} completion = "
+            f"{usage.total_tokens} total",
+            flush=True,
+        )
+        prompt_cost     = usage.prompt_tokens     * 0.00015 / 1000
+        completion_cost = usage.completion_tokens * 0.0006  / 1000
+        print(
+            f"   💰 Estimated cost: ${prompt_cost + completion_cost:.6f}",
+            flush=True,
+        )
+
+    return summary
 
-        response = await client.chat.completions.create(
+_STREAM_END = object()
+
+async def _async_stream_openai(
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int,
+    out: "queue.Queue",
+) -> None:
+    """Stream a chat completion on the gateway loop, putting text deltas on *out*."""
+    client = _openai_client()
+    try:
+        stream = await client.chat.completions.create(
             model=MODEL_NAME,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -353,38 +390,62 @@ async def _async_call_openai(
             ],
             temperature=0.1,
             max_tokens=max_tokens,
+            stream=True,
         )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                out.put(chunk.choices[0].delta.content)
+    except Exception as exc:
+        out.put(exc)
+    finally:
+        out.put(_STREAM_END)
 
-        summary: str = response.choices[0].message.content
-
-        usage = response.usage
-        print(f"   ✅ Generated: {len(summary)} chars", flush=True)
-        if usage:
-            print(
-                f"   📊 Tokens: {usage.prompt_tokens} prompt + "
-                f"{usage.completion_tokens} completion = "
-                f"{usage.total_tokens} total",
-                flush=True,
-            )
-            prompt_cost     = usage.prompt_tokens     * 0.00015 / 1000
-            completion_cost = usage.completion_tokens * 0.0006  / 1000
-            print(
-                f"   💰 Estimated cost: ${prompt_cost + completion_cost:.6f}",
-                flush=True,
-            )
-
-        return summary
+def stream_llm(
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int = 1024,
+) -> Iterator[str]:
+    """
+    Streaming counterpart of call_llm: yields text deltas as the model
+    generates them. Time to first token is logged. Closing the generator early
+    cancels the request. Raises on failure, like call_llm.
+    """
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not set in environment")
 
+    print(f"🚀 Streaming OpenAI API ({MODEL_NAME}, max {max_tokens} tokens)...", flush=True)
+    deltas: "queue.Queue" = queue.Queue()
+    started = time.perf_counter()
+    future = get_llm_gateway().submit(
+        _async_stream_openai(system_prompt, user_prompt, max_tokens, deltas)
+    )
+    first_token_s, chars = None, 0
+    try:
+        while True:
+            item = deltas.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if first_token_s is None:
+                first_token_s = time.perf_counter() - started
+                print(f"   ⏱️ First token after {first_token_s:.3f}s", flush=True)
+            chars += len(item)
+            yield item
     finally:
-        await client.close()
+        future.cancel()
+    print(
+        f"   ✅ Streamed: {chars} chars in {time.perf_counter() - started:.3f}s",
+        flush=True,
+    )
 
 def _run_openai_call(
     system_prompt: str,
     user_prompt: str,
     max_tokens: int,
 ) -> str:
-    """Synchronous wrapper for _async_call_openai."""
-    return asyncio.run(_async_call_openai(system_prompt, user_prompt, max_tokens))
+    """Synchronous wrapper for _async_call_openai (runs on the shared gateway loop)."""
+    return get_llm_gateway().run(_async_call_openai(system_prompt, user_prompt, max_tokens))
 
 def call_openai_api(
     system_prompt: str,
@@ -418,32 +479,65 @@ def call_llm(
     system_prompt: str,
     user_prompt: str,
     max_tokens: int = 1024,
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> str:
     """
     General-purpose synchronous LLM call with a caller-specified token budget.
  
     Use this instead of call_openai_api when the caller owns the token budget
     (e.g. structured-data pipelines that do not scale by report count).
+    With *on_delta* the completion is streamed (see stream_llm) and each text
+    delta is passed to it as it arrives; the full text is still returned.
     Raises on failure so the caller can handle errors in context.
     """
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY not set in environment")
  
     try:
+        if on_delta is not None:
+            parts = []
+            for delta in stream_llm(system_prompt, user_prompt, max_tokens):
+                parts.append(delta)
+                on_delta(delta)
+            return "".join(parts)
         return _run_openai_call(system_prompt, user_prompt, max_tokens)
     except RuntimeError as exc:
         raise Exception(f"OpenAI call failed — event loop conflict: {exc}") from exc
     except Exception as exc:
         raise Exception(f"OpenAI API call failed: {exc}") from exc
+
+async def acall_llm(
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int = 1024,
+) -> str:
+    """Async counterpart of call_llm; safe to await from any event loop."""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not set in environment")
+
+    try:
+        return await get_llm_gateway().arun(
+            _async_call_openai(system_prompt, user_prompt, max_tokens)
+        )
+    except Exception as exc:
+        raise Exception(f"OpenAI API call failed: {exc}") from exc
     
 def ask_rag_improved(
     question: str,
-    temp_dir: str,
+    temp_dir: str = None,
     folder_type: str  = None,
     num_reports: int  = 1,
     patient_metadata: dict = None,
+    index=None,
+    chunks: list = None,
+    vectorizer=None,
 ) -> str:
-    """Execute RAG query for medical reports."""
+    """
+    Execute RAG query for medical reports.
+
+    Pass the (index, chunks, vectorizer) returned by build_faiss_index to use
+    them directly; otherwise they are loaded from temp_dir.
+    """
     print(f"\n{'='*80}", flush=True)
     print(f"🤖 IMPROVED RAG QUERY (Medical Reports Only)", flush=True)
     print(f"{'='*80}", flush=True)
@@ -451,20 +545,21 @@ def ask_rag_improved(
     print(f"Folder:   {folder_type or 'ALL'}", flush=True)
     print(f"Reports:  {num_reports}", flush=True)
     print(f"Model:    {MODEL_NAME}", flush=True)
-    print(f"Temp dir: {temp_dir}", flush=True)
+    print(f"Index:    {'in memory' if index is not None else temp_dir}", flush=True)
 
     if folder_type and folder_type not in ("reports", "medical", "tests"):
         error = f"❌ This summariser only processes medical reports, not {folder_type}"
         print(error, flush=True)
         return error
 
-    try:
-        print("\n📂 Loading from temp directory...", flush=True)
-        index, chunks, vectorizer = load_index_and_chunks(temp_dir)
-    except Exception as exc:
-        error = f"❌ Failed to load from temp: {exc}"
-        print(error, flush=True)
-        return error
+    if index is None or chunks is None or vectorizer is None:
+        try:
+            print("\n📂 Loading from temp directory...", flush=True)
+            index, chunks, vectorizer = load_index_and_chunks(temp_dir)
+        except Exception as exc:
+            error = f"❌ Failed to load from temp: {exc}"
+            print(error, flush=True)
+            return error
 
     if patient_metadata:
         patient_info = {
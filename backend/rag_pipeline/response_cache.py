@@ -0,0 +1,277 @@
+"""
+Semantic cache for chat-handler LLM answers.
+
+The chat handlers (medications, appointments, user card, lab reports,
+insurance, bills) build a prompt from a profile's rows and call the LLM on
+every question, even when neither the data nor the question has changed —
+e.g. the user re-opens the chat and asks "show my appointments" again.
+
+Answers are cached per (handler, profile, context hash). The context hash is
+computed by the handler from the source rows (or vault document signatures)
+it would put into the prompt, so any change to those rows produces a new hash
+and the old answers are simply never matched again; they age out via TTL /
+LRU. Within a bucket a question hits if its normalised text matches exactly
+or if its sentence embedding (all-MiniLM-L6-v2, the model already used for
+the vault indexes) has cosine similarity >= RESPONSE_CACHE_SIMILARITY with a
+cached question. If the embedding model cannot be loaded, only exact matches
+hit.
+
+Sentence embeddings barely separate questions that differ in one lab marker,
+drug or number ("what is my LDL" / "what is my HDL", "dose of metformin" /
+"dose of metoprolol" score above the threshold), so a semantic hit also
+requires both questions to carry the same key tokens: every number and
+every word outside a small list of question / filler words. Embeddings only
+bridge phrasing ("show my LDL" / "what's my LDL?"), never a different
+subject.
+
+Only successful answers are stored; handlers skip ``store`` when the LLM call
+fails. The cache is in-process, so each gunicorn worker keeps its own.
+
+Configuration (environment):
+  RESPONSE_CACHE_ENABLED      "1" (default) or "0" to bypass the cache
+  RESPONSE_CACHE_TTL_S        seconds an answer stays valid (default 900)
+  RESPONSE_CACHE_MAX_ENTRIES  answers kept per process, LRU-evicted (default 2000)
+  RESPONSE_CACHE_SIMILARITY   cosine threshold for a semantic hit (default 0.93)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+RESPONSE_CACHE_ENABLED: bool     = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_TTL_S: float      = float(os.getenv("RESPONSE_CACHE_TTL_S", "900"))
+RESPONSE_CACHE_MAX_ENTRIES: int  = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.93"))
+
+# Devanagari vowel signs are not \w, so the block is kept explicitly.
+_PUNCT_RE = re.compile(r"[^\w\s\u0900-\u097F]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+# Words that may differ between two phrasings of the same question. Anything
+# else (lab markers, drug names, dates, numbers) must match for a semantic hit.
+_FILLER_WORDS = frozenset("""
+    a an the is are was were be been am do does did can could will would should
+    what whats which who whom whose when where why how s
+    i me my mine we our you your it its this that these those there
+    of in on at for to from with about by as and or
+    show tell give list get find see check display explain please pls kindly
+    all any some much many latest last current recent
+    value values level levels result results detail details info information
+    kya hai hain mera meri mere mujhe batao dikhao ka ki ke
+""".split())
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, strip punctuation and collapse whitespace."""
+    text = _PUNCT_RE.sub(" ", (question or "").lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def key_tokens(norm: str) -> frozenset:
+    """Numbers and non-filler words of a normalised question (plurals folded)."""
+    keys = set()
+    for token in norm.split():
+        if token in _FILLER_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.isdigit():
+            token = token[:-1]
+        keys.add(token)
+    return frozenset(keys)
+
+
+def context_hash(*parts) -> str:
+    """Stable SHA-256 over JSON-serialisable source data (rows, signatures, dates)."""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _get_vectorizer():
+    try:
+        from rag_pipeline.embed_store import create_vectorizer
+        return create_vectorizer()
+    except Exception as e:
+        print(f"⚠️ Response cache: embeddings unavailable, exact matches only ({e})", flush=True)
+        return None
+
+
+def _embed(text: str) -> Optional[np.ndarray]:
+    vectorizer = _get_vectorizer()
+    if vectorizer is None:
+        return None
+    try:
+        vec = vectorizer.transform([text]).toarray()[0]
+    except Exception as e:
+        print(f"⚠️ Response cache: embedding failed: {e}", flush=True)
+        return None
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else None
+
+
+class _Entry:
+    __slots__ = ("bucket", "question", "keys", "vector", "answer", "expires_at")
+
+    def __init__(self, bucket, question, vector, answer, expires_at):
+        self.bucket     = bucket
+        self.question   = question
+        self.keys       = key_tokens(question)
+        self.vector     = vector
+        self.answer     = answer
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_s: float = RESPONSE_CACHE_TTL_S,
+        similarity: float = RESPONSE_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s       = ttl_s
+        self.similarity  = similarity
+        self._lock = threading.Lock()
+        # (bucket, normalised question) -> _Entry, in LRU order (oldest first)
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        # bucket -> set of entry keys, for the similarity scan
+        self._buckets: dict[tuple, set] = {}
+        self._counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0,
+                          "evictions": 0, "expired": 0, "invalidated": 0}
+
+    # --- Internal (caller holds the lock) ---
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._buckets.get(entry.bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._buckets[entry.bucket]
+
+    def _live(self, key: tuple, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._drop(key)
+            self._counters["expired"] += 1
+            return None
+        return entry
+
+    # --- Public API ---
+
+    def lookup(self, handler: str, scope: str, ctx_hash: str, question: str) -> Optional[str]:
+        """Cached answer for a question in this handler/profile/context, or None."""
+        bucket = (handler, str(scope), ctx_hash)
+        norm   = normalize_question(question)
+        keys   = key_tokens(norm)
+        now    = time.time()
+
+        with self._lock:
+            entry = self._live((bucket, norm), now)
+            if entry is not None:
+                self._entries.move_to_end((bucket, norm))
+                self._counters["hits"] += 1
+                return entry.answer
+            has_candidates = any(
+                self._entries[key].keys == keys for key in self._buckets.get(bucket, ())
+            )
+            if not has_candidates:
+                self._counters["misses"] += 1
+                return None
+
+        # Embed outside the lock; the model call dominates lookup cost.
+        vector = _embed(norm)
+
+        with self._lock:
+            best_key, best_score = None, self.similarity
+            if vector is not None:
+                for key in list(self._buckets.get(bucket, ())):
+                    entry = self._live(key, now)
+                    if entry is None or entry.vector is None or entry.keys != keys:
+                        continue
+                    score = float(np.dot(vector, entry.vector))
+                    if score >= best_score:
+                        best_key, best_score = key, score
+            if best_key is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._counters["hits"] += 1
+            self._counters["semantic_hits"] += 1
+            return self._entries[best_key].answer
+
+    def store(self, handler: str, scope: str, ctx_hash: str, question: str, answer: str) -> None:
+        bucket = (handler, str(scope), ctx_hash)
+        norm   = normalize_question(question)
+        if not norm or not answer:
+            return
+        vector = _embed(norm)
+
+        with self._lock:
+            key = (bucket, norm)
+            self._drop(key)
+            self._entries[key] = _Entry(bucket, norm, vector, answer, time.time() + self.ttl_s)
+            self._buckets.setdefault(bucket, set()).add(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate(self, scope: str, handler: Optional[str] = None) -> int:
+        """Drop every answer for a profile (optionally just one handler)."""
+        scope = str(scope)
+        with self._lock:
+            doomed = [
+                key for bucket, keys in self._buckets.items()
+                if bucket[1] == scope and (handler is None or bucket[0] == handler)
+                for key in keys
+            ]
+            for key in doomed:
+                self._drop(key)
+            self._counters["invalidated"] += len(doomed)
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._counters, entries=len(self._entries), buckets=len(self._buckets))
+        lookups = s["hits"] + s["misses"]
+        s["hit_ratio"] = round(s["hits"] / lookups, 3) if lookups else None
+        return s
+
+
+_cache = ResponseCache()
+
+
+def lookup_response(handler: str, scope: str, ctx_hash: str, question: str) -> Optional[str]:
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    started = time.perf_counter()
+    answer = _cache.lookup(handler, scope, ctx_hash, question)
+    if answer is not None:
+        print(
+            f"   ⚡ Response cache hit [{handler}] ({1000 * (time.perf_counter() - started):.1f} ms)",
+            flush=True,
+        )
+    return answer
+
+
+def store_response(handler: str, scope: str, ctx_hash: str, question: str, answer: str) -> None:
+    if RESPONSE_CACHE_ENABLED:
+        _cache.store(handler, scope, ctx_hash, question, answer)
+
+
+def invalidate_responses(scope: str, handler: Optional[str] = None) -> int:
+    return _cache.invalidate(scope, handler)
+
+
+def response_cache_stats() -> dict:
+    return dict(_cache.stats(), enabled=RESPONSE_CACHE_ENABLED)
@@ -0,0 +1,1232 @@
+"""
+vault_index.py
+==============
+Vault RAG engine shared by the lab report, insurance and medical bills handlers.
+
+Each domain used to carry its own copy of this module (manifest handling,
+delta computation, index persistence, embedding, search, prompting) plus a
+copy of the handler's download helpers. They now differ only in
+configuration — Storage folder, vector directory, chunk size, top-k, score
+threshold, system prompt and user-facing messages — so each domain module
+builds one ``VaultIndex`` and re-exports its methods under the old names.
+
+Storage layout  (one directory per domain, see each domain's *_VECTOR_DIR)
+----------------------------------------------------------------------------
+  {vector_dir}/{profile_id}/
+    ├── CURRENT            ← name of the published generation, e.g. "gen-7"
+    ├── .lock              ← fcntl lock file serialising writers across processes
+    └── gen-{N}/           ← one complete, immutable generation
+        ├── index.faiss        ← FAISS IndexIDMap2(IndexFlatIP(384-d)), L2-normalised
+        ├── chunks.idx.npy     ← chunk id → (offset, length, doc) rows, sorted by id
+        ├── chunks.blob        ← UTF-8 chunk texts, concatenated
+        ├── chunks.docs.json   ← doc_id table (see ``rag_pipeline.chunk_store``)
+        └── manifest.json      ← per-doc signatures, vector-ID ranges, embedding model
+                                 {
+                                   "docs": {
+                                     "<file_path>": {
+                                       "sig":       "<file_path>:<etag>",
+                                       "chunk_ids": [0, 1, 2, ...]
+                                     }
+                                   },
+                                   "next_id":   <int>,
+                                   "version":   <N>,
+                                   "embedding": {"model": "all-MiniLM-L6-v2",
+                                                 "dim": 384, "normalize": "l2"}
+                                 }
+
+  The vectorizer is not stored: the manifest's embedding model name is
+  resolved through ``embed_store.get_vectorizer`` (one model per process).
+  Older indexes — the files directly in the profile directory, a pickled
+  ``vectorizer.pkl`` without an "embedding" entry, and/or a pickled
+  ``chunks_dict.pkl`` — are read as all-MiniLM-L6-v2 without unpickling the
+  vectorizer, and replaced on their next update; ``migrate_vault_indexes.py``
+  converts them up front. An index whose recorded dimension or normalisation
+  does not match the current model is rebuilt from scratch.
+
+Incremental update logic
+------------------------
+  1. ``get_docs_delta(profile_id, docs)`` compares a per-document fingerprint
+     (file_path + etag) against ``manifest.json`` and returns the minimal
+     (to_add, to_remove) sets.
+  2. ``update_index()`` copies the current FAISS index, removes stale vectors
+     via ``IndexIDMap2.remove_ids()``, adds only new embeddings with
+     contiguous integer IDs, then publishes a new generation. With no index
+     yet, a full build is performed.
+  3. ``handle_query()`` downloads only the documents in ``to_add``, so
+     unchanged documents incur zero network, OCR, or embedding cost.
+
+Writers for one (domain, profile) are serialised by an in-process lock plus
+an fcntl lock on ``.lock`` (so across gunicorn workers too): two concurrent
+questions for the same vault no longer both embed the same new document or
+interleave writes. A writer builds the next generation in a temp directory,
+renames it into place and then atomically replaces CURRENT; readers take no
+lock and keep using the generation they resolved, so a question is never
+answered from a manifest that names chunk ids missing from the index. The
+previous generation is kept until the next one is published. Answers go
+through the shared response cache (``rag_pipeline.response_cache``) keyed by
+the domain name.
+
+Loaded indexes are kept in a byte-bounded LRU per (domain, profile) together
+with the manifest they were loaded with, so a follow-up question reads
+neither ``index.faiss`` nor the manifest again. Chunk texts are not loaded at
+all: the chunk store is memory-mapped and a search copies out only the chunks
+it returns, so a cached profile costs its vectors plus a few bytes per chunk.
+Every published generation bumps ``manifest["version"]``; a cached entry is
+dropped as soon as the published manifest (CURRENT checked with a stat, the
+manifest re-read only when it changed) carries another version — e.g. after
+another worker updated the same vault. Counters are reported by
+``index_cache_stats()`` (see /api/metrics).
+
+Configuration (environment):
+  VAULT_INDEX_CACHE_MB  memory budget for loaded indexes + chunks per process (default 256)
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import gc
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: the in-process lock is all there is
+    fcntl = None
+
+from rag_pipeline.chunk_store import ChunkStore, has_chunk_store, write_chunk_store
+from rag_pipeline.clean_chunk import chunk_text_with_metadata, clean_text
+from rag_pipeline.embed_store import EMBEDDING_DIM, embed_texts, embedding_identity, get_vectorizer
+from rag_pipeline.rag_query import call_llm
+from rag_pipeline.response_cache import context_hash, lookup_response, store_response
+
+logger = logging.getLogger(__name__)
+
+VAULT_INDEX_CACHE_MB: float = float(os.getenv("VAULT_INDEX_CACHE_MB", "256"))
+
+_LEGACY_FILES = ("index.faiss", "chunks_dict.pkl", "manifest.json", "vectorizer.pkl")
+_POINTER_FILE = "CURRENT"
+_LOCK_FILE    = ".lock"
+_GEN_PREFIX   = "gen-"
+
+_locks_guard = threading.Lock()
+_profile_locks: dict[tuple, threading.Lock] = {}
+
+
+def _profile_lock(domain: str, profile_id: str) -> threading.Lock:
+    key = (domain, str(profile_id))
+    with _locks_guard:
+        lock = _profile_locks.get(key)
+        if lock is None:
+            lock = _profile_locks[key] = threading.Lock()
+        return lock
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Loaded-index cache
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _Loaded:
+    __slots__ = ("index", "chunks_dict", "vectorizer", "manifest", "stamp", "nbytes")
+
+    def __init__(self, index, chunks_dict, vectorizer, manifest, stamp):
+        self.index       = index
+        self.chunks_dict = chunks_dict
+        self.vectorizer  = vectorizer
+        self.manifest    = manifest
+        self.stamp       = stamp
+        self.nbytes      = _estimate_bytes(index, chunks_dict)
+
+    @property
+    def version(self):
+        return self.manifest.get("version")
+
+
+def _estimate_bytes(index, chunks_dict) -> int:
+    # Flat IP vectors + the IDMap2 id array and reverse map; for a chunk store
+    # its mapped columns, for a legacy dict the chunk text plus a rough
+    # per-entry overhead. The vectorizer only wraps the process-wide model
+    # and is not counted.
+    ntotal = int(getattr(index, "ntotal", 0))
+    vectors = ntotal * (EMBEDDING_DIM * 4 + 8 + 32)
+    if isinstance(chunks_dict, ChunkStore):
+        return vectors + chunks_dict.nbytes
+    chunks = sum(len(c.get("text", "")) + 200 for c in chunks_dict.values())
+    return vectors + chunks
+
+
+def _chunks_to_dict(chunks_dict) -> dict:
+    """A private, mutable copy of a chunk store or legacy dict."""
+    if isinstance(chunks_dict, ChunkStore):
+        return chunks_dict.to_dict()
+    return dict(chunks_dict)
+
+
+class IndexCache:
+    """LRU of loaded indexes keyed by (domain, profile), bounded by estimated bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, _Loaded]" = OrderedDict()
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                          "stale": 0, "invalidated": 0, "too_large": 0}
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def peek(self, key: tuple) -> Optional[_Loaded]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key: tuple) -> Optional[_Loaded]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, key: tuple, entry: _Loaded) -> None:
+        with self._lock:
+            self._drop(key)
+            if entry.nbytes > self.max_bytes:
+                self._counters["too_large"] += 1
+                return
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._counters["stores"] += 1
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def discard(self, key: tuple, stale: bool = False) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self._counters["stale" if stale else "invalidated"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._counters, entries=len(self._entries), bytes=self._bytes,
+                     max_bytes=self.max_bytes)
+        lookups = s["hits"] + s["misses"]
+        s["hit_ratio"] = round(s["hits"] / lookups, 3) if lookups else None
+        return s
+
+
+_index_cache = IndexCache(int(VAULT_INDEX_CACHE_MB * 1024 * 1024))
+
+
+def index_cache_stats() -> dict:
+    return _index_cache.stats()
+
+
+def _file_stamp(path: str) -> Optional[tuple]:
+    # st_ino: CURRENT is replaced with os.replace, so every publish gives it a
+    # new inode, even within one mtime tick and with an equal-length name.
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Per-document fingerprint
+# ─────────────────────────────────────────────────────────────────────────────
+
+def doc_sig(doc: dict) -> str:
+    """
+    Return a deterministic per-document fingerprint string.
+    Incorporates both the logical path and the storage etag / content hash so
+    that a re-upload of a same-named file with changed contents is detected.
+    """
+    return "{path}:{hash}".format(
+        path=doc.get("file_path", ""),
+        hash=doc.get("source_file_hash") or doc.get("id", ""),
+    )
+
+
+def compute_docs_signature(docs: list[dict]) -> str:
+    """Whole-set SHA-256 signature; keys the response cache."""
+    fingerprints = sorted(doc_sig(d) for d in docs)
+    raw = "|".join(fingerprints).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Embedding helper
+# ─────────────────────────────────────────────────────────────────────────────
+
+def embed_to_matrix(texts: list[str], vectorizer) -> tuple[np.ndarray, object]:
+    """
+    Embed *texts* and return a L2-normalised float32 matrix ready for FAISS,
+    together with the vectorizer used (the shared default when None).
+    """
+    if vectorizer is None:
+        vectorizer = get_vectorizer()
+
+    raw_embeddings, vectorizer = embed_texts(texts, vectorizer)
+    matrix = np.stack(raw_embeddings).astype("float32")
+    faiss.normalize_L2(matrix)
+    return matrix, vectorizer
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Temp-file download helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _download_one(doc: dict, get_file_bytes_fn) -> tuple[str, str]:
+    """
+    Download a single document to a named temp file on disk and return
+    (logical_file_path, temp_file_path). The caller removes the temp file
+    via ``temp_file_context``.
+    """
+    logical_path: str = doc["file_path"]
+    ext: str = os.path.splitext(doc.get("file_name", ""))[-1] or ".pdf"
+
+    raw_bytes: bytes = get_file_bytes_fn(logical_path)
+
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=ext)
+    try:
+        tmp.write(raw_bytes)
+    finally:
+        tmp.close()
+
+    logger.debug("Downloaded '%s' → temp '%s' (%d bytes)", logical_path, tmp.name, len(raw_bytes))
+    return logical_path, tmp.name
+
+
+@contextmanager
+def temp_file_context(temp_paths: list[str]) -> Iterator[None]:
+    """Remove every path in *temp_paths* on exit, whether the block succeeded or raised."""
+    try:
+        yield
+    finally:
+        for path in temp_paths:
+            try:
+                os.unlink(path)
+                logger.debug("Deleted temp file: %s", path)
+            except OSError:
+                pass  # Already gone or permission issue — not fatal
+
+
+def concurrent_download(
+    docs_to_fetch: list[dict],
+    get_file_bytes_fn,
+    max_workers: int,
+) -> dict[str, str]:
+    """
+    Download *docs_to_fetch* in parallel to temp files.
+
+    Returns
+    -------
+    dict[logical_file_path, temp_file_path]
+        Only successfully downloaded documents appear in the result.
+        Failed downloads are logged and skipped so that the pipeline can
+        still use any documents that did succeed.
+    """
+    file_paths: dict[str, str] = {}
+
+    if not docs_to_fetch:
+        return file_paths
+
+    workers = max(1, min(max_workers, len(docs_to_fetch)))
+    logger.info("Downloading %d file(s) with up to %d worker(s)…", len(docs_to_fetch), workers)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        future_to_doc = {
+            pool.submit(_download_one, doc, get_file_bytes_fn): doc
+            for doc in docs_to_fetch
+        }
+        for future in concurrent.futures.as_completed(future_to_doc):
+            doc = future_to_doc[future]
+            try:
+                logical, tmp = future.result()
+                file_paths[logical] = tmp
+            except Exception as exc:
+                logger.error("Failed to download '%s': %s", doc.get("file_name"), exc)
+
+    logger.info("Concurrent download complete: %d/%d succeeded.", len(file_paths), len(docs_to_fetch))
+    return file_paths
+
+
+@lru_cache(maxsize=1)
+def _load_storage() -> dict:
+    """Import the Supabase helpers once; the first call may raise ImportError."""
+    from supabase_helper import list_user_files, get_file_bytes, get_profile_info
+
+    return {
+        "list_user_files":  list_user_files,
+        "get_file_bytes":   get_file_bytes,
+        "get_profile_info": get_profile_info,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Engine
+# ─────────────────────────────────────────────────────────────────────────────
+
+class VaultIndex:
+    """
+    Incremental per-profile FAISS index and RAG pipeline for one vault folder.
+
+    Parameters
+    ----------
+    domain:
+        Short name used in logs and as the response-cache handler key
+        (``"lab_report"``, ``"insurance"``, ``"medical_bills"``).
+    folder:
+        Supabase Storage folder listed for the profile (``"reports"`` …).
+    vector_dir:
+        Base directory for the per-profile index artefacts.
+    system_prompt:
+        ``user_name -> str`` building the LLM system prompt.
+    excerpt_label:
+        Heading placed above the retrieved excerpts in the user prompt.
+    messages:
+        User-facing strings: ``empty_question``, ``list_failed``, ``no_files``,
+        ``unprepared``, ``no_docs``, ``no_match``, ``unexpected``,
+        ``pipeline_error`` (formatted with ``exc``) and ``no_chunks``
+        (formatted with ``count``).
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        folder: str,
+        vector_dir: str,
+        system_prompt: Callable[[str], str],
+        excerpt_label: str,
+        messages: dict,
+        top_k: int = 6,
+        min_score: float = 0.28,
+        chunk_max_words: int = 300,
+        chunk_overlap_words: int = 50,
+        max_tokens: int = 1500,
+        download_workers: int = 4,
+    ):
+        self.domain              = domain
+        self.folder              = folder
+        self.vector_dir          = vector_dir
+        self.system_prompt       = system_prompt
+        self.excerpt_label       = excerpt_label
+        self.messages            = messages
+        self.top_k               = top_k
+        self.min_score           = min_score
+        self.chunk_max_words     = chunk_max_words
+        self.chunk_overlap_words = chunk_overlap_words
+        self.max_tokens          = max_tokens
+        self.download_workers    = download_workers
+
+    # --- Paths, generations & locking ---
+
+    def profile_dir(self, profile_id: str) -> str:
+        return os.path.join(self.vector_dir, str(profile_id))
+
+    def _pointer_path(self, profile_id: str) -> str:
+        return os.path.join(self.profile_dir(profile_id), _POINTER_FILE)
+
+    def _generation_dir(self, profile_id: str) -> Optional[str]:
+        """
+        Directory of the generation named by CURRENT; the profile directory
+        itself for an index written before generations existed; None if the
+        profile has no index.
+        """
+        p = self.profile_dir(profile_id)
+        try:
+            with open(self._pointer_path(profile_id), "r", encoding="utf-8") as fh:
+                name = fh.read().strip()
+        except OSError:
+            name = ""
+        if name:
+            return os.path.join(p, name)
+        if os.path.exists(os.path.join(p, "manifest.json")):
+            return p
+        return None
+
+    def _stamp(self, profile_id: str) -> Optional[tuple]:
+        """Stat-only change detector for the published generation."""
+        return (
+            _file_stamp(self._pointer_path(profile_id))
+            or _file_stamp(os.path.join(self.profile_dir(profile_id), "manifest.json"))
+        )
+
+    @contextmanager
+    def _write_lock(self, profile_id: str) -> Iterator[None]:
+        """
+        Exclusive writer lock for one profile: the in-process lock plus an
+        fcntl lock on ``.lock``, so gunicorn workers serialise too. Readers
+        never take it.
+        """
+        with _profile_lock(self.domain, profile_id):
+            p = self.profile_dir(profile_id)
+            Path(p).mkdir(parents=True, exist_ok=True)
+            with open(os.path.join(p, _LOCK_FILE), "a+") as fh:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    # --- Manifest ---
+
+    def _load_manifest(self, profile_id: str) -> dict:
+        """Manifest of the published generation, or an empty one if absent or unreadable."""
+        gen_dir = self._generation_dir(profile_id)
+        if gen_dir is not None:
+            try:
+                with open(os.path.join(gen_dir, "manifest.json"), "r", encoding="utf-8") as fh:
+                    return json.load(fh)
+            except Exception as exc:
+                logger.warning("_load_manifest [%s]: failed for profile %s: %s", self.domain, profile_id, exc)
+        return {"docs": {}, "next_id": 0}
+
+    def _cache_key(self, profile_id: str) -> tuple:
+        return (self.domain, str(profile_id))
+
+    def _fresh_entry(self, profile_id: str) -> Optional[_Loaded]:
+        """
+        The cached index for *profile_id* if it is still the published
+        generation, else None (a stale entry is dropped). Only re-reads the
+        manifest when CURRENT changed on disk since the entry was cached.
+        """
+        key   = self._cache_key(profile_id)
+        entry = _index_cache.peek(key)
+        if entry is None:
+            return None
+        stamp = self._stamp(profile_id)
+        if stamp == entry.stamp:
+            return entry
+        if stamp is not None and self._load_manifest(profile_id).get("version") == entry.version:
+            entry.stamp = stamp
+            return entry
+        _index_cache.discard(key, stale=True)
+        logger.info("index cache [%s]: dropped stale index for profile %s.", self.domain, profile_id)
+        return None
+
+    def artifacts_exist(self, profile_id: str) -> bool:
+        """True only if the published generation has the index, manifest and chunks."""
+        gen_dir = self._generation_dir(profile_id)
+        if gen_dir is None:
+            return False
+        return (
+            all(os.path.exists(os.path.join(gen_dir, f)) for f in ("index.faiss", "manifest.json"))
+            and (has_chunk_store(gen_dir) or os.path.exists(os.path.join(gen_dir, "chunks_dict.pkl")))
+        )
+
+    # --- Embedding model ---
+
+    @staticmethod
+    def _compatible(manifest: dict) -> bool:
+        """False when the stored vectors cannot be searched with the current model setup."""
+        ident = manifest.get("embedding")
+        if not ident:
+            return True   # pre-"embedding" manifests: all-MiniLM-L6-v2, 384-d, L2
+        return ident.get("dim") == EMBEDDING_DIM and ident.get("normalize") == "l2"
+
+    @staticmethod
+    def _vectorizer_for(manifest: dict):
+        """The vectorizer for the model recorded in *manifest* (the default if none)."""
+        model_name = (manifest.get("embedding") or {}).get("model")
+        return get_vectorizer(model_name) if model_name else get_vectorizer()
+
+    # --- Delta computation ---
+
+    def get_docs_delta(
+        self,
+        profile_id: str,
+        docs: list[dict],
+        manifest: Optional[dict] = None,
+    ) -> tuple[list[dict], list[str]]:
+        """
+        Compare *docs* (current vault listing) against the stored manifest
+        (or *manifest*, when the caller already holds it).
+
+        Returns
+        -------
+        to_add : list[dict]
+            Documents that need (re-)embedding (new or changed).
+        to_remove : list[str]
+            Logical file paths whose vectors must be purged (deleted or changed).
+        """
+        if manifest is None:
+            entry    = self._fresh_entry(profile_id)
+            manifest = entry.manifest if entry is not None else self._load_manifest(profile_id)
+        stored_docs   = manifest.get("docs", {})
+        current_paths = {d["file_path"] for d in docs}
+
+        if stored_docs and not self._compatible(manifest):
+            logger.warning(
+                "get_docs_delta [%s | profile=%s]: index built with %s; re-embedding all %d doc(s).",
+                self.domain, profile_id, manifest.get("embedding"), len(docs),
+            )
+            return list(docs), list(stored_docs)
+
+        to_remove: list[str] = list(set(stored_docs) - current_paths)
+        to_add: list[dict]   = []
+        for doc in docs:
+            fp = doc["file_path"]
+            if fp not in stored_docs or stored_docs[fp]["sig"] != doc_sig(doc):
+                to_add.append(doc)
+                if fp in stored_docs:
+                    # Content changed — old vectors will be purged then replaced
+                    to_remove.append(fp)
+
+        logger.info(
+            "get_docs_delta [%s | profile=%s]: %d to_add, %d to_remove, %d unchanged.",
+            self.domain, profile_id, len(to_add), len(to_remove), len(docs) - len(to_add),
+        )
+        return to_add, to_remove
+
+    # --- Persistence ---
+
+    def _publish(self, profile_id: str, index: faiss.Index, chunks_dict: dict, manifest: dict) -> str:
+        """
+        Write the next generation and point CURRENT at it; caller holds the
+        write lock. Returns the generation directory.
+
+        The artefacts go to a temp directory that is renamed to
+        ``gen-{version}`` once complete, then CURRENT is replaced atomically:
+        a reader sees the old generation or the new one, never a mix. The
+        previous generation is kept for readers still loading it; older ones
+        (and leftovers of writers that died mid-write) are removed.
+        """
+        p        = self.profile_dir(profile_id)
+        previous = self._generation_dir(profile_id)
+
+        manifest["version"] = int(manifest.get("version", 0)) + 1
+        name  = f"{_GEN_PREFIX}{manifest['version']}"
+        final = os.path.join(p, name)
+        tmp   = os.path.join(p, f".{name}.tmp-{os.getpid()}")
+
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            faiss.write_index(index, os.path.join(tmp, "index.faiss"))
+            write_chunk_store(tmp, chunks_dict)
+            with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as fh:
+                json.dump(manifest, fh, indent=2)
+            shutil.rmtree(final, ignore_errors=True)   # never published: CURRENT did not name it
+            os.rename(tmp, final)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        pointer = self._pointer_path(profile_id)
+        with open(pointer + ".tmp", "w", encoding="utf-8") as fh:
+            fh.write(name)
+        os.replace(pointer + ".tmp", pointer)   # the commit point
+
+        logger.info(
+            "_publish [%s]: generation %d with %d vector(s) for profile %s.",
+            self.domain, manifest["version"], index.ntotal, profile_id,
+        )
+
+        keep = {name, os.path.relpath(previous, p) if previous else None}
+        for entry in os.listdir(p):
+            if (entry.startswith(_GEN_PREFIX) and entry not in keep) or entry.startswith(f".{_GEN_PREFIX}"):
+                shutil.rmtree(os.path.join(p, entry), ignore_errors=True)
+        if "." not in keep:
+            # Artefacts of the pre-generation layout, once no reader can need them.
+            for fname in _LEGACY_FILES:
+                try:
+                    os.unlink(os.path.join(p, fname))
+                except OSError:
+                    pass
+        if previous:
+            # Nothing reads a pickled vectorizer any more.
+            try:
+                os.unlink(os.path.join(previous, "vectorizer.pkl"))
+            except OSError:
+                pass
+        return final
+
+    def _load_index(self, gen_dir: str) -> tuple:
+        """
+        (index, chunks) from one generation directory: a memory-mapped
+        ``ChunkStore``, or the unpickled dict of a pre-chunk-store generation.
+        """
+        index = faiss.read_index(os.path.join(gen_dir, "index.faiss"))
+        if has_chunk_store(gen_dir):
+            chunks_dict = ChunkStore(gen_dir)
+        else:
+            with open(os.path.join(gen_dir, "chunks_dict.pkl"), "rb") as fh:
+                chunks_dict = pickle.load(fh)
+
+        logger.info("_load_index [%s]: %d vector(s) loaded from %s.", self.domain, index.ntotal, gen_dir)
+        return index, chunks_dict
+
+    def _load_snapshot(self, profile_id: str) -> Optional[_Loaded]:
+        """
+        Load the published generation without the write lock, or None if
+        there is no index. Retries once if a writer pruned the generation
+        while it was being read.
+        """
+        for attempt in (1, 2):
+            stamp   = self._stamp(profile_id)
+            gen_dir = self._generation_dir(profile_id)
+            if gen_dir is None:
+                return None
+            try:
+                with open(os.path.join(gen_dir, "manifest.json"), "r", encoding="utf-8") as fh:
+                    manifest = json.load(fh)
+                index, chunks_dict = self._load_index(gen_dir)
+                return _Loaded(index, chunks_dict, self._vectorizer_for(manifest), manifest, stamp)
+            except (OSError, RuntimeError) as exc:   # faiss raises RuntimeError for a missing file
+                if attempt == 2:
+                    raise
+                logger.info("_load_snapshot [%s]: generation changed while loading (%s); retrying.", self.domain, exc)
+        return None
+
+    # --- Indexing ---
+
+    @staticmethod
+    def _extract_text_for_doc(doc: dict, file_paths: dict[str, str]) -> Optional[str]:
+        """
+        Fast path: use ``extracted_text`` already in the DB record.
+        Slow path: OCR the temp file on disk, so peak heap usage stays
+        proportional to a single document, not the entire vault.
+
+        Returns "" when the document has no extractable text, None when it
+        could not be read this time (no download, OCR error) and is worth
+        retrying.
+        """
+        from rag_pipeline.extractor_OCR import extract_text_from_bytes
+
+        stored_text = (doc.get("extracted_text") or "").strip()
+        if stored_text:
+            return stored_text
+
+        temp_path: Optional[str] = file_paths.get(doc.get("file_path", ""))
+        if not temp_path or not os.path.exists(temp_path):
+            logger.warning("_extract_text_for_doc: no temp file for '%s'. Skipping.", doc.get("file_name"))
+            return None
+
+        file_name: str = doc.get("file_name", "")
+        ext = os.path.splitext(file_name)[-1] or ".pdf"
+        try:
+            with open(temp_path, "rb") as fh:
+                raw_bytes = fh.read()
+            text = extract_text_from_bytes(raw_bytes, ext, use_preprocessing=True, verbose=False)
+            return (text or "").strip()
+        except Exception as exc:
+            logger.error("_extract_text_for_doc: OCR failed for '%s': %s", file_name, exc)
+            return None
+
+    def _embed_and_add_docs(
+        self,
+        docs_to_add: list[dict],
+        file_paths: dict[str, str],
+        index: Optional[faiss.Index],
+        chunks_dict: dict[int, dict],
+        vectorizer,
+        manifest: dict,
+    ) -> tuple:
+        """
+        Extract → clean → chunk → embed each doc and insert its vectors into
+        *index* under stable integer IDs drawn from ``manifest["next_id"]``.
+        The ``IndexIDMap2`` is created on the first batch of embeddings.
+
+        A document without any text (e.g. an unreadable scan) is recorded with
+        no chunk ids, so it is not downloaded and OCR'd again on every
+        question; it is retried once its signature changes. A document that
+        could not be read this time is left out of the manifest.
+
+        Returns (index, chunks_dict, vectorizer, manifest).
+        """
+        for doc in docs_to_add:
+            file_name = doc.get("file_name", "<unknown>")
+
+            raw_text = self._extract_text_for_doc(doc, file_paths)
+            if raw_text is None:
+                continue
+            doc_chunks = []
+            cleaned = clean_text(raw_text) if raw_text else ""
+            if cleaned:
+                doc_chunks = chunk_text_with_metadata(
+                    cleaned,
+                    doc_id=str(doc["id"]),
+                    max_words=self.chunk_max_words,
+                    overlap_words=self.chunk_overlap_words,
+                )
+            if not doc_chunks:
+                logger.warning("No extractable text for '%s'; recorded without chunks.", file_name)
+                manifest["docs"][doc["file_path"]] = {"sig": doc_sig(doc), "chunk_ids": []}
+                continue
+
+            matrix, vectorizer = embed_to_matrix([c["text"] for c in doc_chunks], vectorizer)
+
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatIP(EMBEDDING_DIM))
+
+            next_id = manifest["next_id"]
+            ids     = np.arange(next_id, next_id + len(doc_chunks), dtype=np.int64)
+            index.add_with_ids(matrix, ids)
+
+            for i, chunk in enumerate(doc_chunks):
+                chunks_dict[int(ids[i])] = chunk
+
+            manifest["docs"][doc["file_path"]] = {
+                "sig":       doc_sig(doc),
+                "chunk_ids": ids.tolist(),
+            }
+            manifest["next_id"] = int(next_id + len(doc_chunks))
+
+            logger.info(
+                "Indexed '%s': %d chunk(s), IDs %d–%d.",
+                file_name, len(doc_chunks), next_id, manifest["next_id"] - 1,
+            )
+            gc.collect()
+
+        return index, chunks_dict, vectorizer, manifest
+
+    def update_index(self, profile_id: str, docs: list[dict], file_paths: dict[str, str]) -> tuple:
+        """
+        Bring the published FAISS index up-to-date with the current document set.
+
+        1. Compute delta (added/changed/removed) from the manifest, without
+           any lock. If nothing changed → return the cached index, or load
+           the published generation and cache it.
+        2. Otherwise take the profile's write lock and recompute the delta —
+           another worker may have applied it meanwhile.
+        3. Copy the cached index (searches may still be reading it) or load it
+           from disk (or start fresh), purge vectors of deleted / changed
+           documents, embed and add new / changed ones.
+        4. Publish a new generation; cache it.
+
+        Readers keep using the previous generation while a writer builds.
+
+        Returns
+        -------
+        (index, chunks_dict, vectorizer)
+        """
+        key = self._cache_key(profile_id)
+
+        to_add, to_remove = self.get_docs_delta(profile_id, docs)
+        if not to_add and not to_remove:
+            entry = _index_cache.get(key)
+            if entry is not None:
+                logger.info("update_index [%s | profile=%s]: index up-to-date, served from memory.", self.domain, profile_id)
+                return entry.index, entry.chunks_dict, entry.vectorizer
+            entry = self._load_snapshot(profile_id)
+            if entry is not None:
+                logger.info("update_index [%s | profile=%s]: index up-to-date, loaded from disk.", self.domain, profile_id)
+                _index_cache.put(key, entry)
+                return entry.index, entry.chunks_dict, entry.vectorizer
+
+        with self._write_lock(profile_id):
+            entry    = self._fresh_entry(profile_id)
+            manifest = entry.manifest if entry is not None else self._load_manifest(profile_id)
+            to_add, to_remove = self.get_docs_delta(profile_id, docs, manifest)
+
+            if not to_add and not to_remove and self.artifacts_exist(profile_id):
+                if entry is None:
+                    entry = self._load_snapshot(profile_id)
+                    _index_cache.put(key, entry)
+                logger.info("update_index [%s | profile=%s]: already updated by another writer.", self.domain, profile_id)
+                return entry.index, entry.chunks_dict, entry.vectorizer
+
+            chunks_dict: dict[int, dict] = {}
+            index: Optional[faiss.Index] = None
+            rebuild = not self._compatible(manifest)
+
+            if rebuild:
+                # Different dimension / normalisation: start over with the current model.
+                manifest = {"docs": {}, "next_id": 0, "version": manifest.get("version", 0)}
+                to_remove = []
+            elif entry is not None:
+                manifest    = json.loads(json.dumps(entry.manifest))
+                index       = faiss.clone_index(entry.index)
+                chunks_dict = _chunks_to_dict(entry.chunks_dict)
+            elif self.artifacts_exist(profile_id):
+                index, chunks_dict = self._load_index(self._generation_dir(profile_id))
+                chunks_dict = _chunks_to_dict(chunks_dict)
+            vectorizer  = self._vectorizer_for(manifest)
+            docs_before = json.dumps(manifest["docs"], sort_keys=True)
+
+            # ── Remove stale / deleted document vectors ──────────────────────
+            for fp in to_remove:
+                doc_entry = manifest["docs"].get(fp)
+                if not doc_entry or index is None:
+                    manifest["docs"].pop(fp, None)
+                    continue
+
+                ids_to_purge = np.array(doc_entry["chunk_ids"], dtype=np.int64)
+                index.remove_ids(ids_to_purge)
+                for cid in doc_entry["chunk_ids"]:
+                    chunks_dict.pop(cid, None)
+                del manifest["docs"][fp]
+                logger.info("Purged %d vector(s) for removed/changed doc '%s'.", len(ids_to_purge), fp)
+
+            # ── Embed and insert new / changed documents ─────────────────────
+            if to_add:
+                logger.info("update_index [%s | profile=%s]: embedding %d new/changed doc(s).", self.domain, profile_id, len(to_add))
+                index, chunks_dict, vectorizer, manifest = self._embed_and_add_docs(
+                    to_add, file_paths, index, chunks_dict, vectorizer, manifest
+                )
+
+            if (
+                not rebuild
+                and json.dumps(manifest["docs"], sort_keys=True) == docs_before
+                and self.artifacts_exist(profile_id)
+            ):
+                # Every new doc failed to download / OCR: the published
+                # generation is still current, so keep it (and every worker's
+                # cached copy) instead of republishing identical content.
+                if entry is None:
+                    entry = self._load_snapshot(profile_id)
+                    _index_cache.put(key, entry)
+                logger.info("update_index [%s | profile=%s]: nothing indexable changed; not republished.", self.domain, profile_id)
+                return entry.index, entry.chunks_dict, entry.vectorizer
+
+            if index is None or index.ntotal == 0:
+                raise ValueError(self.messages["no_chunks"].format(count=len(docs)))
+
+            manifest["embedding"] = embedding_identity(vectorizer)
+            gen_dir = self._publish(profile_id, index, chunks_dict, manifest)
+            # Serve and cache the mapped store, not the dict it was written from.
+            chunks_dict = ChunkStore(gen_dir)
+            _index_cache.put(key, _Loaded(index, chunks_dict, vectorizer, manifest, self._stamp(profile_id)))
+
+            logger.info("update_index [%s | profile=%s]: index now holds %d vector(s).", self.domain, profile_id, index.ntotal)
+            return index, chunks_dict, vectorizer
+
+    def invalidate(self, profile_id: str) -> None:
+        """Remove every generation for *profile_id* (forces a full rebuild); the lock file stays."""
+        p = self.profile_dir(profile_id)
+        if not os.path.exists(p):
+            logger.debug("invalidate [%s]: no directory to remove for profile %s.", self.domain, profile_id)
+            return
+        with self._write_lock(profile_id):
+            _index_cache.discard(self._cache_key(profile_id))
+            for entry in os.listdir(p):
+                if entry == _LOCK_FILE:
+                    continue   # other writers may be waiting on it
+                path = os.path.join(p, entry)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+        logger.info("invalidate [%s]: removed index for profile %s (%s).", self.domain, profile_id, p)
+
+    def profile_ids(self) -> list[str]:
+        """Profiles that have an index directory under ``vector_dir``."""
+        try:
+            return sorted(
+                e for e in os.listdir(self.vector_dir)
+                if os.path.isdir(os.path.join(self.vector_dir, e))
+            )
+        except FileNotFoundError:
+            return []
+
+    def needs_migration(self, profile_id: str) -> bool:
+        """
+        True for an index in an older on-disk format (flat layout,
+        vectorizer.pkl, chunks_dict.pkl, no embedding entry).
+        """
+        gen_dir = self._generation_dir(profile_id)
+        if gen_dir is None:
+            return False
+        return (
+            gen_dir == self.profile_dir(profile_id)
+            or os.path.exists(os.path.join(gen_dir, "vectorizer.pkl"))
+            or not has_chunk_store(gen_dir)
+            or "embedding" not in self._load_manifest(profile_id)
+        )
+
+    def migrate(self, profile_id: str) -> bool:
+        """
+        Republish an older-format index as a generation in the current format.
+        The pickled vectorizer is never loaded: every index written before the
+        manifest recorded its model used the default all-MiniLM-L6-v2.
+        Returns False when there was nothing to convert.
+        """
+        with self._write_lock(profile_id):
+            if not self.needs_migration(profile_id):
+                return False
+            manifest = self._load_manifest(profile_id)
+            index, chunks_dict = self._load_index(self._generation_dir(profile_id))
+            manifest.setdefault("embedding", embedding_identity())
+            self._publish(profile_id, index, chunks_dict, manifest)
+            _index_cache.discard(self._cache_key(profile_id))
+        logger.info("migrate [%s]: converted index for profile %s.", self.domain, profile_id)
+        return True
+
+    def is_index_valid(self, profile_id: str, current_sig: str = "") -> bool:
+        """Deprecated whole-set validity check; ``update_index`` handles deltas itself."""
+        to_add, to_remove = self.get_docs_delta(profile_id, [])
+        return self.artifacts_exist(profile_id) and not to_add and not to_remove
+
+    # --- Retrieval & generation ---
+
+    def search(
+        self,
+        index: faiss.Index,
+        chunks_dict,
+        vectorizer,
+        query: str,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> list[dict]:
+        """
+        Embed *query* and return the top-k chunks scoring at least *min_score*.
+        ``chunks_dict`` (a ``ChunkStore``, or a legacy dict) is keyed by the IDs
+        stored in the ``IndexIDMap2``, so lookups stay correct across
+        incremental additions and removals; only the hits are decoded.
+        """
+        if not query or not query.strip():
+            return []
+
+        top_k     = self.top_k if top_k is None else top_k
+        min_score = self.min_score if min_score is None else min_score
+        actual_k  = min(top_k, index.ntotal)
+        if actual_k == 0:
+            return []
+
+        query_matrix, _ = embed_to_matrix([query.strip()], vectorizer)
+        scores, indices = index.search(query_matrix, actual_k)
+
+        results: list[dict] = []
+        for score, idx in zip(scores[0], indices[0]):
+            if idx < 0 or float(score) < min_score:
+                continue
+            chunk = chunks_dict.get(int(idx))
+            if chunk is None:
+                continue
+            hit = dict(chunk)
+            hit["score"] = float(score)
+            results.append(hit)
+        return results
+
+    def build_user_prompt(self, user_question: str, context_chunks: list[dict]) -> str:
+        excerpt_blocks = "\n\n".join(
+            (
+                f"[Excerpt {i}  |  doc_id={c.get('doc_id', 'N/A')}  |  "
+                f"relevance={c.get('score', 0.0):.3f}]\n{c['text']}"
+            )
+            for i, c in enumerate(context_chunks, 1)
+        )
+        return (
+            f"{self.excerpt_label}:\n"
+            f"{excerpt_blocks}\n\n"
+            f"User Question: {user_question}\n\n"
+            "Please answer strictly based on the excerpts above."
+        )
+
+    def query_llm(
+        self,
+        user_question: str,
+        context_chunks: list[dict],
+        user_name: str,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        logger.info("query_llm [%s]: dispatching to call_llm with %d chunk(s).", self.domain, len(context_chunks))
+        return call_llm(
+            system_prompt=self.system_prompt(user_name),
+            user_prompt=self.build_user_prompt(user_question, context_chunks),
+            max_tokens=self.max_tokens,
+            on_delta=on_delta,
+        )
+
+    # --- Pipeline entry points ---
+
+    def run(
+        self,
+        profile_id: str,
+        user_question: str,
+        docs: list[dict],
+        file_paths: dict[str, str],
+        user_name: str = "the user",
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """
+        Execute the full RAG pipeline for a single user query.
+
+        *file_paths* maps logical paths to temp files for the documents that
+        needed downloading; unchanged documents are absent, their text is
+        already in the index. With *on_delta* the LLM answer is streamed
+        (cached and canned answers are not).
+
+        Returns the LLM answer, or a descriptive error message string.
+        """
+        return self._answer(profile_id, user_question, docs, file_paths, user_name, on_delta)[1]
+
+    def _answer(
+        self,
+        profile_id: str,
+        user_question: str,
+        docs: list[dict],
+        file_paths: dict[str, str],
+        user_name: str,
+        on_delta: Optional[Callable[[str], None]],
+    ) -> tuple[bool, str]:
+        """``run`` as (ok, message): ok is False when the message reports a failure."""
+        logger.info("run [%s | profile=%s]: question='%.100s'", self.domain, profile_id, user_question)
+
+        if not docs:
+            return False, self.messages["no_docs"]
+
+        # Unchanged documents + an equivalent question → cached answer, without
+        # loading the index, retrieving or calling the LLM.
+        ctx_hash = context_hash(compute_docs_signature(docs), user_name)
+        cached = lookup_response(self.domain, profile_id, ctx_hash, user_question)
+        if cached is not None:
+            return True, cached
+
+        try:
+            index, chunks_dict, vectorizer = self.update_index(profile_id, docs, file_paths)
+
+            context_chunks = self.search(index, chunks_dict, vectorizer, user_question)
+            if not context_chunks:
+                return True, self.messages["no_match"]
+
+            logger.info("Generating answer from %d retrieved chunk(s).", len(context_chunks))
+            answer = self.query_llm(user_question, context_chunks, user_name, on_delta=on_delta)
+
+            logger.info("run [%s | profile=%s]: answer generated (%d chars).", self.domain, profile_id, len(answer))
+            store_response(self.domain, profile_id, ctx_hash, user_question, answer)
+            return True, answer
+
+        except Exception as exc:
+            logger.exception("run [%s | profile=%s]: pipeline error: %s", self.domain, profile_id, exc)
+            return False, self.messages["pipeline_error"].format(exc=exc)
+
+    def list_docs(self, profile_id: str, storage_files: list[dict]) -> list[dict]:
+        """Doc metadata for a Storage listing of this domain's folder."""
+        docs: list[dict] = []
+        for f in storage_files:
+            file_name = (f.get("name") or "").strip()
+            if not file_name:
+                continue
+            file_path = f"{profile_id}/{self.folder}/{file_name}".replace("//", "/")
+            metadata  = f.get("metadata")
+            docs.append({
+                "id":               file_path,
+                "file_path":        file_path,
+                "file_name":        file_name,
+                "extracted_text":   "",
+                "source_file_hash": metadata.get("etag") if isinstance(metadata, dict) else "",
+            })
+        return docs
+
+    def handle_query(
+        self,
+        profile_id: str,
+        user_question: str,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> dict:
+        """
+        Handler entry point: list the vault folder, download only new /
+        changed documents to temp files, run the pipeline, clean up.
+
+        Returns ``{"success": bool, "message": str}``; the message is always
+        safe to display to the user.
+        """
+        log_prefix = f"[{self.domain}_handler | profile={profile_id}]"
+        logger.info("%s Received query: %.120s", log_prefix, user_question)
+
+        if not profile_id or not str(profile_id).strip():
+            logger.error("%s profile_id is empty or None", log_prefix)
+            return {
+                "success": False,
+                "message": (
+                    "An internal error occurred: the profile identifier is missing. "
+                    "Please refresh and try again."
+                ),
+            }
+
+        if not user_question or not user_question.strip():
+            logger.warning("%s Received empty user_question", log_prefix)
+            return {"success": False, "message": self.messages["empty_question"]}
+
+        profile_id    = str(profile_id).strip()
+        user_question = user_question.strip()
+
+        try:
+            storage = _load_storage()
+        except ImportError as exc:
+            logger.critical("%s Critical import failure: %s", log_prefix, exc, exc_info=True)
+            return {
+                "success": False,
+                "message": (
+                    "An internal configuration error occurred. "
+                    "Please contact support if this persists."
+                ),
+            }
+
+        # ── Fetch user display name ───────────────────────────────────────────
+        user_name = "the user"
+        try:
+            info = storage["get_profile_info"](profile_id)
+            if info:
+                user_name = info.get("display_name") or info.get("name") or "the user"
+        except Exception as exc:
+            logger.warning("%s Failed to fetch profile info: %s", log_prefix, exc)
+
+        # ── List storage files ────────────────────────────────────────────────
+        try:
+            storage_files = storage["list_user_files"](profile_id, folder_type=self.folder) or []
+        except Exception as exc:
+            logger.error("%s Failed to list storage files: %s", log_prefix, exc, exc_info=True)
+            return {"success": False, "message": self.messages["list_failed"]}
+
+        if not storage_files:
+            return {"success": False, "message": self.messages["no_files"]}
+
+        docs = self.list_docs(profile_id, storage_files)
+        if not docs:
+            return {"success": False, "message": self.messages["unprepared"]}
+
+        # ── Incremental delta check — download only what actually changed ─────
+        try:
+            to_add, _to_remove = self.get_docs_delta(profile_id, docs)
+        except Exception as exc:
+            logger.warning("%s get_docs_delta failed (%s); falling back to full fetch.", log_prefix, exc)
+            to_add = docs
+
+        file_paths: dict[str, str] = {}
+        if to_add:
+            file_paths = concurrent_download(to_add, storage["get_file_bytes"], self.download_workers)
+        else:
+            logger.info("%s All documents unchanged. No downloads required.", log_prefix)
+
+        # ── Run RAG pipeline; clean up temp files regardless of outcome ───────
+        with temp_file_context(list(file_paths.values())):
+            try:
+                ok, answer = self._answer(
+                    profile_id=profile_id,
+                    user_question=user_question,
+                    docs=docs,
+                    file_paths=file_paths,
+                    user_name=user_name,
+                    on_delta=on_delta,
+                )
+                return {"success": ok, "message": answer}
+            except Exception as exc:
+                logger.exception("%s Unexpected RAG pipeline error: %s", log_prefix, exc)
+                return {"success": False, "message": self.messages["unexpected"]}
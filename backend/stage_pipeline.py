@@ -0,0 +1,205 @@
+"""
+Bounded-queue stage pipeline.
+
+Items flow through a fixed list of stages connected by bounded queues; each
+stage runs its own pool of worker threads, so an item moves on as soon as the
+stage it is in finishes with it instead of waiting for the slowest item of a
+phase. The bounded queues give backpressure: a fast stage (e.g. downloads)
+can run at most ``queue_size`` items ahead of the stage after it.
+
+A stage function takes one item and returns True to pass it on or False to
+finish it early (the item records its own outcome). A stage with
+``batch_size > 1`` instead receives a list of up to that many items that were
+ready together and returns one bool-or-Exception per item. An exception ends
+that item's trip through the pipeline; ``on_error`` is called straight away.
+
+Every item's queue wait and run time per stage and its end-to-end latency are
+recorded; ``PipelineRun.latency_stats()`` summarises them as percentiles.
+"""
+
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable
+    workers: int = 1
+    batch_size: int = 1
+
+    def __post_init__(self):
+        self.workers    = max(1, self.workers)
+        self.batch_size = max(1, self.batch_size)
+
+
+@dataclass
+class ItemOutcome:
+    item: Any
+    stage: str                        # stage the item finished in
+    error: Optional[BaseException]
+    latency_s: float
+    timings: dict = field(default_factory=dict)   # stage -> {"wait_s", "run_s"}
+
+
+@dataclass
+class PipelineRun:
+    outcomes: list
+    wall_s: float
+    stages: list
+
+    def latency_stats(self) -> dict:
+        per_stage = {}
+        for stage in self.stages:
+            timings = [o.timings[stage.name] for o in self.outcomes if stage.name in o.timings]
+            per_stage[stage.name] = {
+                "workers": stage.workers,
+                "wait_s":  latency_summary([t["wait_s"] for t in timings]),
+                "run_s":   latency_summary([t["run_s"] for t in timings]),
+            }
+        return {
+            "wall_s":       round(self.wall_s, 3),
+            "end_to_end_s": latency_summary([o.latency_s for o in self.outcomes]),
+            "stages":       per_stage,
+        }
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def latency_summary(values: list) -> dict:
+    """count / mean / p50 / p90 / p99 / max of a list of seconds (nearest-rank percentiles)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean":  round(sum(ordered) / len(ordered), 3),
+        "p50":   round(_percentile(ordered, 50), 3),
+        "p90":   round(_percentile(ordered, 90), 3),
+        "p99":   round(_percentile(ordered, 99), 3),
+        "max":   round(ordered[-1], 3),
+    }
+
+
+class _Tracked:
+    __slots__ = ("item", "started", "enqueued", "timings")
+
+    def __init__(self, item):
+        self.item     = item
+        self.started  = time.perf_counter()
+        self.enqueued = self.started
+        self.timings  = {}
+
+
+def run_pipeline(
+    items: Iterable,
+    stages: list,
+    queue_size: int = 4,
+    on_error: Optional[Callable[[Any, str, BaseException], None]] = None,
+) -> PipelineRun:
+    """Push every item through the stages and block until all have finished."""
+    started  = time.perf_counter()
+    queues   = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    outcomes = []
+    lock     = threading.Lock()
+    alive    = [stage.workers for stage in stages]
+
+    def finish(tracked: _Tracked, stage: Stage, error: Optional[BaseException]) -> None:
+        outcome = ItemOutcome(
+            item=tracked.item,
+            stage=stage.name,
+            error=error,
+            latency_s=time.perf_counter() - tracked.started,
+            timings=tracked.timings,
+        )
+        with lock:
+            outcomes.append(outcome)
+        if error is not None and on_error is not None:
+            try:
+                on_error(tracked.item, stage.name, error)
+            except Exception as e:
+                print(f"⚠️ Pipeline on_error hook failed: {e}", flush=True)
+
+    def worker(index: int) -> None:
+        stage, inbox = stages[index], queues[index]
+        last = index == len(stages) - 1
+        exiting = False
+        while not exiting:
+            first = inbox.get()
+            if first is _DONE:
+                break
+            batch = [first]
+            while len(batch) < stage.batch_size:
+                try:
+                    nxt = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _DONE:
+                    exiting = True
+                    break
+                batch.append(nxt)
+
+            began = time.perf_counter()
+            try:
+                if stage.batch_size > 1:
+                    verdicts = list(stage.fn([t.item for t in batch]))
+                else:
+                    verdicts = [stage.fn(batch[0].item)]
+            except Exception as exc:
+                verdicts = [exc] * len(batch)
+            if len(verdicts) < len(batch):
+                # Never drop items silently: those left without a verdict fail.
+                missing = RuntimeError(
+                    f"stage '{stage.name}' returned {len(verdicts)} verdict(s) for {len(batch)} item(s)"
+                )
+                verdicts += [missing] * (len(batch) - len(verdicts))
+            ended = time.perf_counter()
+
+            for tracked, verdict in zip(batch, verdicts):
+                tracked.timings[stage.name] = {
+                    "wait_s": began - tracked.enqueued,
+                    "run_s":  ended - began,
+                }
+                if isinstance(verdict, BaseException):
+                    finish(tracked, stage, verdict)
+                elif not verdict or last:
+                    finish(tracked, stage, None)
+                else:
+                    tracked.enqueued = time.perf_counter()
+                    queues[index + 1].put(tracked)
+
+        with lock:
+            alive[index] -= 1
+            closing = alive[index] == 0
+        if closing and not last:
+            for _ in range(stages[index + 1].workers):
+                queues[index + 1].put(_DONE)
+
+    threads = [
+        threading.Thread(target=worker, args=(i,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+        for i, stage in enumerate(stages)
+        for n in range(stage.workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Latency is measured from here, so time spent waiting to enter the first
+    # (bounded) queue counts as that stage's wait.
+    for tracked in [_Tracked(item) for item in items]:
+        queues[0].put(tracked)
+    for _ in range(stages[0].workers):
+        queues[0].put(_DONE)
+
+    for thread in threads:
+        thread.join()
+
+    return PipelineRun(outcomes=outcomes, wall_s=time.perf_counter() - started, stages=stages)
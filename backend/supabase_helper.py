@@ -137,10 +137,12 @@ def save_extracted_data(profile_id: str, file_path: str, file_name: str,
                        report_type: str = None, doctor_name: str = None,
                        hospital_name: str = None,
                        name_match_status: str = 'pending',
-                       name_match_confidence: float = None):
+                       name_match_confidence: float = None,
+                       processing_status: str = 'completed'):
     """
     Save extracted metadata.
     Maintains legacy schema compatibility by populating 'user_id' with 'profile_id'.
+    processing_status='partial' marks text cut short by the OCR time budget.
     """
     print(f"\n💾 Saving to database: {file_name}")
     
@@ -163,7 +165,7 @@ def save_extracted_data(profile_id: str, file_path: str, file_name: str,
             'hospital_name': hospital_name,
             'name_match_status': name_match_status,
             'name_match_confidence': name_match_confidence,
-            'processing_status': 'completed'
+            'processing_status': processing_status
         }
         
         try:
@@ -196,6 +198,51 @@ def save_extracted_data(profile_id: str, file_path: str, file_name: str,
         raise
 
 
+def save_extraction_stats(profile_id: str, folder_type: str, stats_list: list) -> int:
+    """
+    Persist per-file OCR/extraction stats (engine, pages, timings, confidence)
+    for capacity planning. Best-effort: errors are logged, never raised.
+    """
+    if not stats_list:
+        return 0
+
+    try:
+        profile_id_str = str(profile_id)
+        rows = []
+        for stats in stats_list:
+            timings = stats.get('timings') or {}
+            rows.append({
+                'profile_id': profile_id_str,
+                'folder_type': folder_type,
+                'file_path': stats.get('file_path'),
+                'file_name': stats.get('file_name'),
+                'file_type': stats.get('file_type'),
+                'engine': stats.get('engine'),
+                'page_count': stats.get('page_count'),
+                'ocr_page_count': stats.get('ocr_page_count'),
+                'text_chars': stats.get('text_chars'),
+                'mean_confidence': stats.get('mean_confidence'),
+                'cache_hit': stats.get('cache_hit', False),
+                'error': stats.get('error'),
+                'partial': stats.get('partial', False),
+                'pending_page_count': len(stats.get('pending_pages') or []),
+                'text_layer_s': timings.get('text_layer_s'),
+                'render_s': timings.get('render_s'),
+                'ocr_s': timings.get('ocr_s'),
+                'total_s': timings.get('total_s'),
+                'pages': stats.get('pages') or [],
+                'extractor_version': stats.get('extractor_version'),
+            })
+
+        supabase.table('ocr_extraction_stats').insert(rows).execute()
+        print(f"📊 Saved extraction stats for {len(rows)} file(s)")
+        return len(rows)
+
+    except Exception as e:
+        print(f"⚠️  Failed to save extraction stats: {e}")
+        return 0
+
+
 def get_processed_reports(profile_id: str, folder_type: str = None):
     """Retrieve strictly profile-scoped processed reports."""
     print(f"\n📊 Fetching processed reports for profile: {profile_id}")
@@ -207,7 +254,7 @@ def get_processed_reports(profile_id: str, folder_type: str = None):
             .table('medical_reports_processed')
             .select('*')
             .eq('profile_id', profile_id_str)
-            .eq('processing_status', 'completed')
+            .in_('processing_status', ['completed', 'partial'])
         )
 
         if folder_type:
@@ -0,0 +1,52 @@
+"""
+Semantic hits in the response cache must never cross to another lab marker,
+drug or number. Embeddings are replaced by one constant vector, i.e. every
+pair of questions looks identical to the model (worse than MiniLM, which
+already scores these pairs above RESPONSE_CACHE_SIMILARITY).
+
+Run from backend/:  python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from rag_pipeline import response_cache
+from rag_pipeline.response_cache import ResponseCache, key_tokens, normalize_question
+
+NEAR_MISSES = [
+    ("what is my LDL", "what is my HDL"),
+    ("dose of metformin", "dose of metoprolol"),
+    ("what was my HbA1c in 2023", "what was my HbA1c in 2024"),
+    ("is 500 mg paracetamol safe", "is 650 mg paracetamol safe"),
+    ("show my vitamin D", "show my vitamin B12"),
+]
+
+PARAPHRASES = [
+    ("what is my LDL", "What's my LDL?"),
+    ("show my LDL levels", "please tell me my ldl level"),
+    ("dose of metformin", "What is the dose of metformin"),
+]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "_embed", lambda text: np.ones(4) / 2.0)
+    return ResponseCache(max_entries=100, ttl_s=60, similarity=0.93)
+
+
+@pytest.mark.parametrize("stored, asked", NEAR_MISSES)
+def test_near_miss_is_not_a_semantic_hit(cache, stored, asked):
+    cache.store("lab_report", "p1", "ctx", stored, f"answer for {stored}")
+    assert cache.lookup("lab_report", "p1", "ctx", asked) is None
+    assert cache.stats()["semantic_hits"] == 0
+
+
+@pytest.mark.parametrize("stored, asked", PARAPHRASES)
+def test_paraphrase_is_a_semantic_hit(cache, stored, asked):
+    cache.store("lab_report", "p1", "ctx", stored, "cached")
+    assert cache.lookup("lab_report", "p1", "ctx", asked) == "cached"
+
+
+def test_key_tokens_keep_markers_drugs_and_numbers():
+    assert key_tokens(normalize_question("What's my LDL?")) == {"ldl"}
+    assert key_tokens(normalize_question("dose of metformin 500 mg")) == {"dose", "metformin", "500", "mg"}
@@ -11,10 +11,11 @@ Orchestrator entry point: answer_user_card_query()
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import Optional
+from typing import Callable, Optional
 
 from supabase_helper import get_user_card_data
 from rag_pipeline.rag_query import call_llm
+from rag_pipeline.response_cache import context_hash, lookup_response, store_response
 
 _MAX_LLM_TOKENS: int = 512
 
@@ -88,33 +89,51 @@ def _build_prompts(user_query: str, formatted_context: str) -> tuple[str, str]:
     return system_prompt, user_prompt
 
 
-def answer_user_card_query(profile_id: str, user_query: str) -> str:
+def answer_user_card_query(
+    profile_id: str,
+    user_query: str,
+    card: Optional[dict] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> dict:
     """
     Full user card query pipeline.
 
     Fetches card fields for the given profile, formats them into a structured
     context document, constructs prompts, and returns the LLM-generated answer.
-    Always returns a string — never raises — so the orchestrator can pass the
-    result through without additional error handling.
+    Always returns ``{"success": bool, "message": str}`` — never raises on an
+    LLM failure — so the orchestrator can pass the result through; failures
+    carry a user-safe message with success=False.
 
     Args:
         profile_id: UUID of the profile to query.
         user_query:  The user's natural-language question.
+        card:        Already-fetched card fields (e.g. prefetched by the
+                     /api/assistant orchestrator); fetched here when None.
+        on_delta:    Optional callback; when set the answer is streamed and
+                     each text delta is passed to it as it is generated.
 
     Returns:
-        LLM-generated answer in the same language as the user's query.
+        {"success", "message"}; the message is the LLM-generated answer in the
+        same language as the user's query.
     """
     if not profile_id or not str(profile_id).strip():
-        return "Unable to retrieve user card: profile ID is missing."
+        return {"success": False, "message": "Unable to retrieve user card: profile ID is missing."}
 
     if not user_query or not user_query.strip():
-        return "Please provide a question about your profile or health card."
+        return {"success": False, "message": "Please provide a question about your profile or health card."}
 
     print(f"\n🪪 User card query pipeline — profile: {profile_id}", flush=True)
 
-    card = get_user_card_data(str(profile_id).strip())
+    profile_id = str(profile_id).strip()
+    if card is None:
+        card = get_user_card_data(profile_id)
     print(f"   Card data fetched: {'yes' if card else 'empty'}", flush=True)
 
+    ctx_hash = context_hash(card, date.today())
+    cached = lookup_response("user_card", profile_id, ctx_hash, user_query)
+    if cached is not None:
+        return {"success": True, "message": cached}
+
     formatted_context = _format_user_card(card)
     system_prompt, user_prompt = _build_prompts(user_query, formatted_context)
 
@@ -123,12 +142,14 @@ def answer_user_card_query(profile_id: str, user_query: str) -> str:
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             max_tokens=_MAX_LLM_TOKENS,
+            on_delta=on_delta,
         )
         print(f"   ✅ Answer generated ({len(answer)} chars)", flush=True)
-        return answer
+        store_response("user_card", profile_id, ctx_hash, user_query, answer)
+        return {"success": True, "message": answer}
     except Exception as exc:
         print(f"   ❌ LLM call failed: {exc}", flush=True)
-        return "Sorry, I was unable to answer your question right now. Please try again."
+        return {"success": False, "message": "Sorry, I was unable to answer your question right now. Please try again."}
     
 if __name__ == "__main__":
     print(answer_user_card_query(user_query='kya mere body details ke hisaab se mera bmi healthy hai unhealthy, detail me batao',profile_id='e18af8f2-9c0e-4a92-b6b5-84e8ad019186'))
\ No newline at end of file
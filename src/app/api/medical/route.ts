@@ -223,6 +223,63 @@ async function callFlask(
   );
 }
 
+async function streamFlask(
+  endpoint: string,
+  disallowedHosts: Set<string>,
+  preferLocalBackend: boolean,
+  body: unknown,
+  signal: AbortSignal
+) {
+  if (!hasBackendInternalAuth()) {
+    throw createProxyError('Backend internal authentication is not configured.', 500);
+  }
+
+  const attemptErrors: string[] = [];
+
+  for (const baseUrl of getCandidateBackendUrls(preferLocalBackend)) {
+    let candidateHost = '';
+    try {
+      candidateHost = new URL(baseUrl).hostname.toLowerCase();
+    } catch {
+      attemptErrors.push(`invalid backend URL configuration: ${baseUrl}`);
+      continue;
+    }
+
+    if (disallowedHosts.has(candidateHost)) {
+      attemptErrors.push(`skipped self-referential backend URL ${baseUrl}`);
+      continue;
+    }
+
+    const url = `${baseUrl}${endpoint}`;
+    console.log(`📡 [Next.js API] Streaming from Flask: POST ${url}`);
+
+    try {
+      const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          ...getBackendInternalHeaders(),
+        },
+        body: JSON.stringify(body),
+        signal,
+      });
+      const contentType = response.headers.get('content-type') || '';
+      if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
+        attemptErrors.push(`unexpected response (${response.status}) from ${url}`);
+        continue;
+      }
+      return response.body;
+    } catch (error: unknown) {
+      attemptErrors.push(getErrorMessage(error));
+    }
+  }
+
+  throw createProxyError(
+    `Medical backend is unavailable or waking up. Attempts: ${attemptErrors.join(' | ')}`,
+    503
+  );
+}
+
 export async function POST(request: NextRequest) {
   try {
     console.log('📥 [Next.js API] POST /api/medical');
@@ -246,6 +303,7 @@ export async function POST(request: NextRequest) {
       max_new_structured_extractions,
       profile_id,
       user_id,
+      job_id,
     } = body;
 
     const normalizedProfileId =
@@ -284,6 +342,73 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    if (action === 'process-stream') {
+      const stream = await streamFlask(
+        '/api/process-files/stream',
+        disallowedHosts,
+        preferLocalBackend,
+        {
+          profile_id: normalizedProfileId,
+          user_id: normalizedProfileId,
+          folder_type: folder_type || 'reports',
+        },
+        request.signal
+      );
+      return new Response(stream, {
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache, no-transform',
+          Connection: 'keep-alive',
+        },
+      });
+    }
+
+    if (action === 'process-submit') {
+      const result = await callFlask('/api/process-files/jobs', 'POST', disallowedHosts, preferLocalBackend, {
+        profile_id: normalizedProfileId,
+        user_id: normalizedProfileId,
+        folder_type: folder_type || 'reports',
+      });
+      return NextResponse.json(
+        {
+          ...sanitizeBackendResponse(result.status, result.data),
+          backend_url: result.backendUrl,
+        },
+        { status: result.status }
+      );
+    }
+
+    if (action === 'process-status') {
+      const normalizedJobId = typeof job_id === 'string' ? job_id.trim() : '';
+      if (!/^[a-f0-9]{32}$/.test(normalizedJobId)) {
+        return NextResponse.json(
+          { success: false, error: 'job_id is required' },
+          { status: 400 }
+        );
+      }
+
+      const result = await callFlask(
+        `/api/process-files/jobs/${normalizedJobId}`,
+        'GET',
+        disallowedHosts,
+        preferLocalBackend
+      );
+      const data = sanitizeBackendResponse(result.status, result.data);
+      if (data.profile_id && data.profile_id !== normalizedProfileId) {
+        return NextResponse.json(
+          { success: false, error: 'Job not found' },
+          { status: 404 }
+        );
+      }
+      return NextResponse.json(
+        {
+          ...data,
+          backend_url: result.backendUrl,
+        },
+        { status: result.status }
+      );
+    }
+
     if (action === 'generate-summary') {
       const result = await callFlask('/api/generate-summary', 'POST', disallowedHosts, preferLocalBackend, {
         profile_id: normalizedProfileId,
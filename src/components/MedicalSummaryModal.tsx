@@ -18,6 +18,18 @@ interface SummaryResponse {
   cached?: boolean;
 }
 
+interface ProcessJobResponse {
+  success: boolean;
+  job_id?: string;
+  status?: 'queued' | 'running' | 'succeeded' | 'failed';
+  error?: string | null;
+  progress?: { total: number; finished: number };
+  result?: { success?: boolean; error?: string; processed_count?: number } | null;
+}
+
+const PROCESS_POLL_INTERVAL_MS = 2000;
+const PROCESS_POLL_TIMEOUT_MS = 30 * 60 * 1000;
+
 interface MedicalSummaryModalProps {
   isOpen: boolean;
   onClose: () => void;
@@ -94,6 +106,7 @@ export function MedicalSummaryModal({
   const [summary, setSummary] = useState<string>('');
   const [error, setError] = useState<string>('');
   const [reportCount, setReportCount] = useState<number>(0);
+  const [processProgress, setProcessProgress] = useState<{ total: number; finished: number } | null>(null);
   const [hasProcessed, setHasProcessed] = useState(false);
   const [userId, setUserId] = useState<string>('');
   const healthCheckUrl = `${getPublicBackendBaseUrl()}/api/health`;
@@ -159,24 +172,49 @@ export function MedicalSummaryModal({
         console.log('📋 [Frontend] Processing files...');
       }
       
-      const response = await fetch('/api/medical', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          action: 'process',
-          folder_type: folderType,
-          profile_id: userId,
-          user_id: userId
-        }),
-      });
-      
-      console.log('📡 [Frontend] Process response status:', response.status);
-      
-      const data = await response.json();
-      console.log('📦 [Frontend] Process response data:', data);
-      
-      if (!data.success) {
-        throw new Error(toUserFriendlyError(data.error || 'Failed to process files'));
+      const postMedical = async (payload: Record<string, unknown>): Promise<ProcessJobResponse> => {
+        const response = await fetch('/api/medical', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            ...payload,
+            folder_type: folderType,
+            profile_id: userId,
+            user_id: userId
+          }),
+        });
+        return response.json();
+      };
+
+      // Processing runs as a backend job; poll it instead of holding one long request open.
+      let job = await postMedical({ action: 'process-submit' });
+      console.log('📦 [Frontend] Process job submitted:', job);
+
+      if (!job.success || !job.job_id) {
+        throw new Error(toUserFriendlyError(job.error || 'Failed to process files'));
+      }
+
+      const jobId = job.job_id;
+      const pollDeadline = Date.now() + PROCESS_POLL_TIMEOUT_MS;
+      while (job.status !== 'succeeded' && job.status !== 'failed') {
+        if (Date.now() > pollDeadline) {
+          throw new Error('Processing is taking longer than expected. Please try again later.');
+        }
+        await new Promise((resolve) => setTimeout(resolve, PROCESS_POLL_INTERVAL_MS));
+        job = await postMedical({ action: 'process-status', job_id: jobId });
+        if (!job.success) {
+          throw new Error(toUserFriendlyError(job.error || 'Failed to process files'));
+        }
+        if (job.progress) {
+          setProcessProgress(job.progress);
+        }
+      }
+
+      const data = job.result || { success: false, error: job.error || undefined };
+      console.log('📦 [Frontend] Process job result:', data);
+
+      if (job.status === 'failed' || !data.success) {
+        throw new Error(toUserFriendlyError(data.error || job.error || 'Failed to process files'));
       }
       
       console.log('✅ [Frontend] Files processed:', data.processed_count);
@@ -188,6 +226,7 @@ export function MedicalSummaryModal({
       return false;
     } finally {
       setIsProcessing(false);
+      setProcessProgress(null);
     }
   }, [folderType, userId]);
 
@@ -335,6 +374,8 @@ export function MedicalSummaryModal({
               <Loader2 className="w-12 h-12 text-emerald-500 animate-spin mb-4" />
               <p className="text-lg font-medium text-slate-700">
                 {isProcessing && 'Processing your medical reports...'}
+                {isProcessing && processProgress && processProgress.total > 0 &&
+                  ` (${processProgress.finished}/${processProgress.total})`}
                 {isGenerating && 'Generating AI-powered summary...'}
               </p>
               <p className="text-sm text-slate-500 mt-2">
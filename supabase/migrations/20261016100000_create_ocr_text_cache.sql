@@ -0,0 +1,39 @@
+begin;
+
+-- Content-addressed OCR output shared by every profile that uploads the same file.
+-- Written and read only by the Python backend (service role).
+create table if not exists public.ocr_text_cache (
+  cache_key text primary key,
+  content_sha256 text not null,
+  extractor_version text not null,
+  extracted_text text not null,
+  char_count integer not null default 0,
+  created_at timestamp with time zone not null default now(),
+  last_accessed_at timestamp with time zone not null default now()
+);
+
+create index if not exists ocr_text_cache_last_accessed_at_idx
+  on public.ocr_text_cache (last_accessed_at);
+
+alter table public.ocr_text_cache enable row level security;
+
+do $$
+begin
+  if not exists (
+    select 1
+    from pg_policies
+    where schemaname = 'public'
+      and tablename = 'ocr_text_cache'
+      and policyname = 'service role can manage ocr text cache'
+  ) then
+    create policy "service role can manage ocr text cache"
+      on public.ocr_text_cache
+      for all
+      to service_role
+      using (true)
+      with check (true);
+  end if;
+end
+$$;
+
+commit;
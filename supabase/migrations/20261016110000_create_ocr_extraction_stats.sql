@@ -0,0 +1,56 @@
+begin;
+
+create extension if not exists pgcrypto;
+
+-- One row per file run through OCR by the Python backend; used for capacity planning.
+create table if not exists public.ocr_extraction_stats (
+  id uuid primary key default gen_random_uuid(),
+  profile_id text not null,
+  folder_type text null,
+  file_path text null,
+  file_name text null,
+  file_type text null,
+  engine text null,
+  page_count integer not null default 0,
+  ocr_page_count integer not null default 0,
+  text_chars integer not null default 0,
+  mean_confidence real null,
+  cache_hit boolean not null default false,
+  error text null,
+  text_layer_s real null,
+  render_s real null,
+  ocr_s real null,
+  total_s real null,
+  pages jsonb not null default '[]'::jsonb,
+  extractor_version text null,
+  created_at timestamp with time zone not null default now()
+);
+
+create index if not exists ocr_extraction_stats_created_at_idx
+  on public.ocr_extraction_stats (created_at desc);
+
+create index if not exists ocr_extraction_stats_engine_idx
+  on public.ocr_extraction_stats (engine);
+
+alter table public.ocr_extraction_stats enable row level security;
+
+do $$
+begin
+  if not exists (
+    select 1
+    from pg_policies
+    where schemaname = 'public'
+      and tablename = 'ocr_extraction_stats'
+      and policyname = 'service role can manage ocr extraction stats'
+  ) then
+    create policy "service role can manage ocr extraction stats"
+      on public.ocr_extraction_stats
+      for all
+      to service_role
+      using (true)
+      with check (true);
+  end if;
+end
+$$;
+
+commit;
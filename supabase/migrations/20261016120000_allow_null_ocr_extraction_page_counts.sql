@@ -0,0 +1,10 @@
+begin;
+
+-- OCR cache hits return text only; their page counts are unknown, not zero.
+alter table public.ocr_extraction_stats
+  alter column page_count drop not null,
+  alter column page_count drop default,
+  alter column ocr_page_count drop not null,
+  alter column ocr_page_count drop default;
+
+commit;
@@ -0,0 +1,8 @@
+begin;
+
+-- Extractions cut short by an OCR time budget; the pending pages are completed in the background.
+alter table public.ocr_extraction_stats
+  add column if not exists partial boolean not null default false,
+  add column if not exists pending_page_count integer not null default 0;
+
+commit;